@@ -1,14 +1,16 @@
 import os
 import logging
 
-from flask import Flask
-import os
-import logging
-
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlite_profile import is_sqlite, sqlite_engine_options, configure_sqlite_connection
+from tenancy import init_tenancy
+from read_replica import RoutingSession, DATABASE_REPLICA_URL, REPLICA_BIND, init_read_replica
+from static_assets import init_static_assets
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -16,25 +18,49 @@ logging.basicConfig(level=logging.DEBUG)
 class Base(DeclarativeBase):
     pass
 
-# Initialize SQLAlchemy with the Base class
-db = SQLAlchemy(model_class=Base)
+# Initialize SQLAlchemy with the Base class; sessions route to the current tenant's database
+# and, for GET requests, to the read replica
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 
 # Create the Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
+def normalize_database_url(url):
+    # Handle postgresql:// vs postgres:// in DATABASE_URL
+    if url and url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+def engine_options(url):
+    if is_sqlite(url):
+        # SQLite deployment profile: WAL, pragmas and a persistent connection pool (see sqlite_profile.py)
+        return sqlite_engine_options(url)
+    return {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+
 # Configure the SQLAlchemy database
-database_url = os.environ.get("DATABASE_URL")
-# Handle postgresql:// vs postgres:// in DATABASE_URL
-if database_url and database_url.startswith("postgres://"):
-    database_url = database_url.replace("postgres://", "postgresql://", 1)
+database_url = normalize_database_url(os.environ.get("DATABASE_URL"))
 
 app.config["SQLALCHEMY_DATABASE_URI"] = database_url or "sqlite:///timetable.db"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+
+# Optional read-only replica of the database, used for GET requests (see read_replica.py). Locally
+# a second SQLite file refreshed with `python backup_db.py sync-replica` stands in for one.
+replica_url = normalize_database_url(DATABASE_REPLICA_URL)
+if replica_url:
+    app.config["SQLALCHEMY_BINDS"] = {REPLICA_BIND: dict(engine_options(replica_url), url=replica_url)}
+
+# Time budget (seconds) for the optional local-search pass after generation
+app.config["TIMETABLE_OPTIMIZE_SECONDS"] = float(os.environ.get("TIMETABLE_OPTIMIZE_SECONDS", "2"))
+
+# Apply the SQLite pragmas to every new connection
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    configure_sqlite_connection(dbapi_connection)
 
 # Initialize the database with the app
 db.init_app(app)
@@ -50,6 +76,13 @@ def load_user(user_id):
     from models import User
     return User.query.get(int(user_id))
 
+# Route each request to its school's database when running multi-tenant (see tenancy.py)
+init_tenancy(app)
+init_read_replica(app)
+
+# Fingerprinted, long-cached static files and self-hosted third-party assets (see static_assets.py)
+init_static_assets(app)
+
 # Import and register routes after app is created
 from routes import register_routes
 register_routes(app)
@@ -59,3 +92,13 @@ with app.app_context():
     # Import models here to ensure they're registered with SQLAlchemy
     import models  # noqa: F401
     db.create_all()
+    models.add_missing_columns(db)
+    # ON DELETE actions for databases created before foreign keys declared them; SQLite
+    # enforces foreign keys on every connection, so deletes depend on them
+    models.upgrade_foreign_keys(db)
+    models.create_missing_indexes(db)
+    # Default days and time slots, once the tables exist
+    models.init_default_data(db)
+    # Workload summaries for timetables generated before the summary tables existed
+    from timetable_summary import ensure_summaries
+    ensure_summaries()
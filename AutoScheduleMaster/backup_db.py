@@ -0,0 +1,278 @@
+import argparse
+import base64
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import date, datetime, time
+
+from sqlalchemy import select, text
+from app import app, db
+from read_replica import REPLICA_BIND
+import models  # noqa: F401
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = "timetable-"
+# Pages copied per step of the SQLite online backup; the source is unlocked between steps
+BACKUP_PAGES_PER_STEP = 1024
+# Rows per INSERT batch when restoring a table export
+RESTORE_BATCH_SIZE = 1000
+# Chunk size used when compressing or decompressing files
+COPY_CHUNK_SIZE = 1024 * 1024
+
+def default_backup_dir():
+    return os.path.join(app.instance_path, "backups")
+
+def _open_compressed(path, mode):
+    """Open a .gz or .zst file for binary streaming ('rb' or 'wb')"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, compresslevel=6)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstd compression needs the 'zstandard' package")
+        raw = open(path, mode)
+        if "w" in mode:
+            return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    raise ValueError(f"Unknown backup compression for {path}")
+
+def _json_default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        # Compressed timetable archives
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _column_parser(column):
+    """Function turning an exported JSON value back into the column's Python value"""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return None
+    if python_type in (datetime, date, time):
+        return lambda value: None if value is None else python_type.fromisoformat(value)
+    if python_type is bytes:
+        return lambda value: None if value is None else base64.b64decode(value)
+    return None
+
+def _snapshot_sqlite(path):
+    """Copy the live SQLite database to path with the online backup API"""
+    raw = db.engine.raw_connection()
+    try:
+        target = sqlite3.connect(path)
+        try:
+            raw.driver_connection.backup(target, pages=BACKUP_PAGES_PER_STEP)
+        finally:
+            target.close()
+    finally:
+        raw.close()
+
+def _export_tables(stream):
+    """Write every model table to a text stream as JSON lines, streaming rows from the database"""
+    tables = db.metadata.sorted_tables
+    stream.write(json.dumps({"format": "timetable-backup", "version": 1,
+                             "tables": [table.name for table in tables]}) + "\n")
+    rows = 0
+    with db.engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, yield_per=RESTORE_BATCH_SIZE)
+        for table in tables:
+            columns = [column.name for column in table.columns]
+            stream.write(json.dumps({"table": table.name, "columns": columns}) + "\n")
+            for row in conn.execute(select(table)):
+                stream.write(json.dumps(list(row), default=_json_default) + "\n")
+                rows += 1
+    return rows
+
+def rotate_backups(backup_dir, keep):
+    """Delete all but the newest `keep` snapshots in backup_dir"""
+    snapshots = sorted(name for name in os.listdir(backup_dir) if name.startswith(BACKUP_PREFIX))
+    for name in snapshots[:-keep] if keep > 0 else []:
+        os.remove(os.path.join(backup_dir, name))
+        logger.info(f"Removed old backup {name}")
+
+def backup_database(backup_dir=None, compression="gzip", keep=7, table_export=False):
+    """
+    Write a compressed snapshot of the database and rotate old snapshots.
+
+    SQLite databases are copied page by page with the online backup API, so readers and
+    writers carry on while the snapshot is taken. Other databases (or table_export=True) are
+    streamed table by table into a dialect-neutral JSON lines export.
+
+    Args:
+        backup_dir: Directory for snapshots (defaults to instance/backups)
+        compression: 'gzip' or 'zstd'
+        keep: Number of snapshots to keep (0 keeps all)
+        table_export: Use the table export even for SQLite
+
+    Returns:
+        Path of the new snapshot
+    """
+    backup_dir = backup_dir or default_backup_dir()
+    os.makedirs(backup_dir, exist_ok=True)
+    extension = {"gzip": "gz", "zstd": "zst"}[compression]
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    use_sqlite_backup = db.engine.dialect.name == "sqlite" and not table_export
+
+    name = f"{BACKUP_PREFIX}{stamp}.{'sqlite3' if use_sqlite_backup else 'jsonl'}.{extension}"
+    path = os.path.join(backup_dir, name)
+    # Written under a temporary name so a failed backup never looks like a snapshot
+    partial = os.path.join(backup_dir, f".partial-{name}")
+    try:
+        if use_sqlite_backup:
+            with tempfile.TemporaryDirectory() as tmp:
+                snapshot = os.path.join(tmp, "snapshot.sqlite3")
+                _snapshot_sqlite(snapshot)
+                with open(snapshot, "rb") as source, _open_compressed(partial, "wb") as target:
+                    shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+        else:
+            with _open_compressed(partial, "wb") as target:
+                stream = io.TextIOWrapper(target, encoding="utf-8")
+                rows = _export_tables(stream)
+                stream.flush()
+                stream.detach()
+            logger.info(f"Exported {rows} rows")
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    logger.info(f"Backup written to {path} ({os.path.getsize(path)} bytes)")
+    rotate_backups(backup_dir, keep)
+    return path
+
+def _restore_sqlite_snapshot(path):
+    """Copy a compressed SQLite snapshot over the live SQLite database with the backup API"""
+    if db.engine.dialect.name != "sqlite":
+        raise RuntimeError("SQLite snapshots can only be restored into a SQLite database; use a table export")
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, "snapshot.sqlite3")
+        with _open_compressed(path, "rb") as source, open(snapshot, "wb") as target:
+            shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+        source = sqlite3.connect(snapshot)
+        raw = db.engine.raw_connection()
+        try:
+            source.backup(raw.driver_connection, pages=BACKUP_PAGES_PER_STEP)
+        finally:
+            raw.close()
+            source.close()
+    # Pooled connections may hold pages of the old database
+    db.engine.dispose()
+
+def _restore_table_export(path):
+    """Replace the contents of every model table from a compressed JSON lines export in one transaction"""
+    tables = {table.name: table for table in db.metadata.sorted_tables}
+    with _open_compressed(path, "rb") as raw, db.engine.begin() as conn:
+        stream = io.TextIOWrapper(raw, encoding="utf-8")
+        header = json.loads(stream.readline())
+        if header.get("format") != "timetable-backup":
+            raise ValueError(f"{path} is not a timetable backup")
+
+        for table in reversed(db.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+        table, columns, parsers, batch = None, [], {}, []
+
+        def flush():
+            if batch:
+                conn.execute(table.insert(), batch)
+                batch.clear()
+
+        for line in stream:
+            record = json.loads(line)
+            if isinstance(record, dict):
+                flush()
+                table = tables.get(record["table"])
+                if table is None:
+                    raise ValueError(f"Backup contains unknown table {record['table']}")
+                columns = [name for name in record["columns"] if name in table.columns]
+                parsers = {name: _column_parser(table.columns[name]) for name in columns}
+                positions = [record["columns"].index(name) for name in columns]
+                continue
+            row = {}
+            for name, position in zip(columns, positions):
+                value = record[position]
+                parser = parsers[name]
+                row[name] = parser(value) if parser else value
+            batch.append(row)
+            if len(batch) >= RESTORE_BATCH_SIZE:
+                flush()
+        flush()
+
+        # Move sequences past the restored IDs
+        if db.engine.dialect.name == "postgresql":
+            for name, restored in tables.items():
+                if "id" in restored.columns:
+                    conn.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('\"{name}\"', 'id'), "
+                        f"COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM \"{name}\""
+                    ))
+
+def restore_database(path):
+    """Restore the database from a snapshot made by backup_database"""
+    if ".sqlite3." in os.path.basename(path):
+        _restore_sqlite_snapshot(path)
+    else:
+        _restore_table_export(path)
+    logger.info(f"Database restored from {path}")
+
+def sync_replica():
+    """Refresh a SQLite stand-in for the read replica with a snapshot of the primary database"""
+    replica = db.engines.get(REPLICA_BIND)
+    if replica is None:
+        raise RuntimeError("No read replica configured (set DATABASE_REPLICA_URL)")
+    if db.engine.dialect.name != "sqlite" or replica.dialect.name != "sqlite":
+        raise RuntimeError("Only a SQLite replica of a SQLite database can be synced here; "
+                           "use the database server's replication otherwise")
+    _snapshot_sqlite(replica.url.database)
+    logger.info(f"Replica {replica.url.database} synced from the primary")
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up and restore the timetable database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backup = subparsers.add_parser("backup", help="Write a compressed snapshot")
+    backup.add_argument("--dir", help="Backup directory (default: instance/backups)")
+    backup.add_argument("--compression", choices=["gzip", "zstd"], default="gzip")
+    backup.add_argument("--keep", type=int, default=7, help="Snapshots to keep (0 keeps all)")
+    backup.add_argument("--table-export", action="store_true",
+                        help="Write a dialect-neutral table export even for SQLite")
+
+    restore = subparsers.add_parser("restore", help="Restore from a snapshot")
+    restore.add_argument("file")
+
+    listing = subparsers.add_parser("list", help="List snapshots")
+    listing.add_argument("--dir", help="Backup directory (default: instance/backups)")
+
+    subparsers.add_parser("sync-replica", help="Copy the database to its SQLite read replica")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with app.app_context():
+        if args.command == "backup":
+            backup_database(args.dir, compression=args.compression, keep=args.keep,
+                            table_export=args.table_export)
+        elif args.command == "restore":
+            restore_database(args.file)
+        elif args.command == "sync-replica":
+            sync_replica()
+        else:
+            backup_dir = args.dir or default_backup_dir()
+            if os.path.isdir(backup_dir):
+                for name in sorted(os.listdir(backup_dir)):
+                    if name.startswith(BACKUP_PREFIX):
+                        print(name, os.path.getsize(os.path.join(backup_dir, name)))
+
+if __name__ == "__main__":
+    main()
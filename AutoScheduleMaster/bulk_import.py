@@ -0,0 +1,359 @@
+import argparse
+import csv
+import json
+import logging
+
+from sqlalchemy import insert, update
+from app import app, db
+from models import Class, Section, Teacher, Course, CourseAssignment
+from timetable_summary import refresh_class_summary
+
+logger = logging.getLogger(__name__)
+
+# Entities in dependency order; each import file or JSON key uses one of these names
+ENTITY_KINDS = ['classes', 'sections', 'teachers', 'courses', 'assignments']
+
+# Number of rows sent per INSERT/UPDATE statement
+BATCH_SIZE = 500
+
+def read_csv(stream):
+    """Read CSV rows from a text stream into a list of dicts with stripped values"""
+    return [{key.strip(): (value or '').strip() for key, value in row.items() if key}
+            for row in csv.DictReader(stream)]
+
+def read_json(stream):
+    """Read a JSON document of the form {"classes": [...], "teachers": [...], ...}"""
+    data = json.load(stream)
+    if not isinstance(data, dict):
+        raise ValueError("JSON import must be an object keyed by entity type")
+    return data
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'n', 'off', '')
+
+def parse_bool(value):
+    """Read a yes/no value; anything not in TRUE_VALUES or FALSE_VALUES raises ValueError"""
+    if isinstance(value, bool):
+        return value
+    text = str('' if value is None else value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text not in FALSE_VALUES:
+        raise ValueError(f"'{value}' is not a yes/no value")
+    return False
+
+def _parse_hours(value):
+    """Read a whole number of hours (an integer or a string of digits); empty means 0"""
+    if value is None:
+        return 0
+    # bool is an int subclass, and int() would silently truncate floats such as 2.7
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"'{value}' is not a whole number of hours")
+    text = str(value).strip()
+    if text == '':
+        return 0
+    if not (text.isascii() and text.isdigit()):
+        raise ValueError(f"'{value}' is not a whole number of hours")
+    return int(text)
+
+def _chunks(rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        yield rows[start:start + BATCH_SIZE]
+
+def _insert(model, rows):
+    """Insert rows in batches and return their new IDs in order"""
+    ids = []
+    for chunk in _chunks(rows):
+        result = db.session.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=True), chunk
+        )
+        ids.extend(result.scalars().all())
+    return ids
+
+def _update(model, rows):
+    """Update rows (each with an 'id' key) in batches"""
+    for chunk in _chunks(rows):
+        db.session.execute(update(model), chunk)
+
+def import_data(data, dry_run=False):
+    """
+    Validate and upsert classes, sections, teachers, courses and assignments in one transaction.
+
+    The whole payload is validated in memory first, with names resolved against one lookup per
+    table; nothing is written if any row is invalid. Rows are matched on their natural keys
+    (class name, class + section name, teacher email or name, course name, class + teacher +
+    course) and only new or changed rows are written, in batched statements. Course columns
+    missing from a row keep their current values.
+
+    Args:
+        data: Dict mapping entity kinds from ENTITY_KINDS to lists of row dicts
+        dry_run: Validate and report what would change without writing anything
+
+    Returns:
+        Report dict with valid, dry_run, errors and per-kind created/updated/unchanged counts
+    """
+    report = {
+        'valid': True,
+        'dry_run': dry_run,
+        'errors': [],
+        'created': {kind: 0 for kind in ENTITY_KINDS},
+        'updated': {kind: 0 for kind in ENTITY_KINDS},
+        'unchanged': {kind: 0 for kind in ENTITY_KINDS}
+    }
+    errors = report['errors']
+
+    for kind in data:
+        if kind not in ENTITY_KINDS:
+            errors.append(f"Unknown entity type '{kind}'")
+    rows = {kind: list(data.get(kind) or []) for kind in ENTITY_KINDS}
+
+    # One lookup per table
+    class_ids = {name: class_id for class_id, name in db.session.query(Class.id, Class.name)}
+    section_keys = {(class_id, name) for class_id, name in db.session.query(Section.class_id, Section.name)}
+    existing_teachers = db.session.query(Teacher.id, Teacher.name, Teacher.email, Teacher.department).all()
+    existing_courses = {course.name: course for course in db.session.query(
+        Course.id, Course.name, Course.code, Course.is_lab, Course.is_lecture, Course.lab_hours, Course.lecture_hours
+    )}
+    assignment_keys = {tuple(row) for row in db.session.query(
+        CourseAssignment.class_id, CourseAssignment.teacher_id, CourseAssignment.course_id
+    )}
+
+    # Classes
+    new_classes = []
+    seen_classes = set()
+    for number, row in enumerate(rows['classes'], start=1):
+        name = str(row.get('name') or '').strip()
+        if not name or len(name) > 100:
+            errors.append(f"classes row {number}: name is required (max 100 characters)")
+        elif name in class_ids:
+            report['unchanged']['classes'] += 1
+        elif name not in seen_classes:
+            seen_classes.add(name)
+            new_classes.append(name)
+    known_classes = set(class_ids) | set(new_classes)
+
+    # Sections
+    new_sections = []
+    seen_sections = set()
+    for number, row in enumerate(rows['sections'], start=1):
+        class_name = str(row.get('class') or '').strip()
+        name = str(row.get('name') or '').strip()
+        if not name or len(name) > 50:
+            errors.append(f"sections row {number}: name is required (max 50 characters)")
+        elif class_name not in known_classes:
+            errors.append(f"sections row {number}: unknown class '{class_name}'")
+        elif class_name in class_ids and (class_ids[class_name], name) in section_keys:
+            report['unchanged']['sections'] += 1
+        elif (class_name, name) not in seen_sections:
+            seen_sections.add((class_name, name))
+            new_sections.append((class_name, name))
+
+    # Teachers, matched by email when given, otherwise by name
+    teachers_by_email = {t.email.lower(): t for t in existing_teachers if t.email}
+    teachers_by_name = {}
+    for teacher in existing_teachers:
+        teachers_by_name.setdefault(teacher.name, []).append(teacher)
+    new_teachers = []  # [{'name', 'email', 'department'}]
+    new_teachers_by_email = {}  # {email: index into new_teachers}
+    new_teachers_by_name = {}  # {name: [index into new_teachers, ...]}
+    teacher_updates = []  # [{'id', 'email', 'department'}]
+    for number, row in enumerate(rows['teachers'], start=1):
+        name = str(row.get('name') or '').strip()
+        email = str(row.get('email') or '').strip() or None
+        department = str(row.get('department') or '').strip() or None
+        if not name or len(name) > 100:
+            errors.append(f"teachers row {number}: name is required (max 100 characters)")
+            continue
+        if email and ('@' not in email or len(email) > 100):
+            errors.append(f"teachers row {number}: invalid email '{email}'")
+            continue
+        match = teachers_by_email.get(email.lower()) if email else None
+        if not match:
+            same_name = teachers_by_name.get(name, [])
+            if len(same_name) > 1:
+                errors.append(f"teachers row {number}: '{name}' matches {len(same_name)} teachers; add an email to disambiguate")
+                continue
+            if same_name and not (email and same_name[0].email):
+                match = same_name[0]
+        if match:
+            changes = {}
+            if email and email != match.email:
+                changes['email'] = email
+            if department and department != match.department:
+                changes['department'] = department
+            if changes:
+                teacher_updates.append(dict(changes, id=match.id))
+                report['updated']['teachers'] += 1
+            else:
+                report['unchanged']['teachers'] += 1
+        elif email and email.lower() in new_teachers_by_email:
+            continue
+        elif email or name not in new_teachers_by_name:
+            if email:
+                new_teachers_by_email[email.lower()] = len(new_teachers)
+            new_teachers_by_name.setdefault(name, []).append(len(new_teachers))
+            new_teachers.append({'name': name, 'email': email, 'department': department})
+
+    def resolve_teacher(name, email):
+        """Return ('id', teacher_id), ('new', index) or an error message"""
+        if email:
+            if email.lower() in teachers_by_email:
+                return ('id', teachers_by_email[email.lower()].id)
+            if email.lower() in new_teachers_by_email:
+                return ('new', new_teachers_by_email[email.lower()])
+            return f"unknown teacher email '{email}'"
+        matches = [('id', t.id) for t in teachers_by_name.get(name, [])]
+        matches += [('new', index) for index in new_teachers_by_name.get(name, [])]
+        if not matches:
+            return f"unknown teacher '{name}'"
+        if len(matches) > 1:
+            return f"teacher '{name}' is ambiguous; add teacher_email"
+        return matches[0]
+
+    # Courses
+    course_columns = {
+        'code': lambda value: str(value or '').strip() or None,
+        'is_lab': parse_bool,
+        'is_lecture': parse_bool,
+        'lab_hours': _parse_hours,
+        'lecture_hours': _parse_hours
+    }
+    new_courses = []
+    course_updates = []
+    seen_courses = set()
+    for number, row in enumerate(rows['courses'], start=1):
+        name = str(row.get('name') or '').strip()
+        if not name or len(name) > 100:
+            errors.append(f"courses row {number}: name is required (max 100 characters)")
+            continue
+        # Only the columns present in the row are compared and updated; missing ones take
+        # their defaults on insert and are left alone on existing courses
+        existing = existing_courses.get(name)
+        values = {}
+        invalid = []
+        for key, parse in course_columns.items():
+            if key in row or not existing:
+                try:
+                    values[key] = parse(row.get(key))
+                except ValueError as exc:
+                    invalid.append(f"{key}: {exc}")
+        if invalid:
+            errors.append(f"courses row {number}: " + "; ".join(invalid))
+            continue
+        if values.get('code') and len(values['code']) > 20:
+            errors.append(f"courses row {number}: code must be at most 20 characters")
+            continue
+        is_lab = values['is_lab'] if 'is_lab' in values else existing.is_lab
+        is_lecture = values['is_lecture'] if 'is_lecture' in values else existing.is_lecture
+        if not (is_lab or is_lecture):
+            errors.append(f"courses row {number}: select at least one course type (is_lab or is_lecture)")
+            continue
+        if existing:
+            changes = {key: value for key, value in values.items() if getattr(existing, key) != value}
+            if changes:
+                course_updates.append(dict(changes, id=existing.id))
+                report['updated']['courses'] += 1
+            else:
+                report['unchanged']['courses'] += 1
+        elif name not in seen_courses:
+            seen_courses.add(name)
+            new_courses.append(dict(values, name=name))
+    known_courses = set(existing_courses) | seen_courses
+
+    # Assignments
+    new_assignments = []  # [(class_name, teacher_ref, course_name)]
+    seen_assignments = set()
+    for number, row in enumerate(rows['assignments'], start=1):
+        class_name = str(row.get('class') or '').strip()
+        course_name = str(row.get('course') or '').strip()
+        teacher_ref = resolve_teacher(str(row.get('teacher') or '').strip(),
+                                      str(row.get('teacher_email') or '').strip() or None)
+        if class_name not in known_classes:
+            errors.append(f"assignments row {number}: unknown class '{class_name}'")
+        elif course_name not in known_courses:
+            errors.append(f"assignments row {number}: unknown course '{course_name}'")
+        elif isinstance(teacher_ref, str):
+            errors.append(f"assignments row {number}: {teacher_ref}")
+        elif (class_name in class_ids and teacher_ref[0] == 'id' and course_name in existing_courses and
+              (class_ids[class_name], teacher_ref[1], existing_courses[course_name].id) in assignment_keys):
+            report['unchanged']['assignments'] += 1
+        elif (class_name, teacher_ref, course_name) not in seen_assignments:
+            seen_assignments.add((class_name, teacher_ref, course_name))
+            new_assignments.append((class_name, teacher_ref, course_name))
+
+    report['created'].update({
+        'classes': len(new_classes),
+        'sections': len(new_sections),
+        'teachers': len(new_teachers),
+        'courses': len(new_courses),
+        'assignments': len(new_assignments)
+    })
+    report['valid'] = not errors
+    if errors or dry_run:
+        return report
+
+    try:
+        for class_id, name in zip(_insert(Class, [{'name': name} for name in new_classes]), new_classes):
+            class_ids[name] = class_id
+        _insert(Section, [{'class_id': class_ids[class_name], 'name': name} for class_name, name in new_sections])
+
+        new_teacher_ids = _insert(Teacher, new_teachers)
+        _update(Teacher, teacher_updates)
+
+        course_ids = {name: course.id for name, course in existing_courses.items()}
+        for course_id, course in zip(_insert(Course, new_courses), new_courses):
+            course_ids[course['name']] = course_id
+        _update(Course, course_updates)
+
+        _insert(CourseAssignment, [{
+            'class_id': class_ids[class_name],
+            'teacher_id': teacher_ref[1] if teacher_ref[0] == 'id' else new_teacher_ids[teacher_ref[1]],
+            'course_id': course_ids[course_name]
+        } for class_name, teacher_ref, course_name in new_assignments])
+
+        # Summaries of classes whose sections, assignments or course hours changed
+        changed_classes = {class_ids[class_name] for class_name, _ in new_sections}
+        changed_classes |= {class_ids[class_name] for class_name, _, _ in new_assignments}
+        updated_course_ids = [course['id'] for course in course_updates]
+        if updated_course_ids:
+            changed_classes |= {class_id for (class_id,) in db.session.query(CourseAssignment.class_id).filter(
+                CourseAssignment.course_id.in_(updated_course_ids)).distinct()}
+        for class_id in sorted(changed_classes):
+            refresh_class_summary(class_id)
+
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error importing data: {str(e)}")
+        report['valid'] = False
+        errors.append(f"Error: {str(e)}")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import classes, sections, teachers, courses and assignments.")
+    parser.add_argument('json_file', nargs='?', help="JSON file keyed by entity type")
+    for kind in ENTITY_KINDS:
+        parser.add_argument(f'--{kind}', metavar='CSV', help=f"CSV file of {kind}")
+    parser.add_argument('--dry-run', action='store_true', help="Validate and report without writing")
+    args = parser.parse_args()
+
+    data = {}
+    if args.json_file:
+        with open(args.json_file, encoding='utf-8') as f:
+            data.update(read_json(f))
+    for kind in ENTITY_KINDS:
+        path = getattr(args, kind)
+        if path:
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                data[kind] = read_csv(f)
+    if not data:
+        parser.error("Provide a JSON file or at least one CSV file")
+
+    logging.basicConfig(level=logging.INFO)
+    with app.app_context():
+        report = import_data(data, dry_run=args.dry_run)
+    print(json.dumps(report, indent=2))
+    return 0 if report['valid'] else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
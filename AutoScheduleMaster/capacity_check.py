@@ -0,0 +1,232 @@
+from sqlalchemy import func
+from app import db
+from models import Class, Section, Teacher, Course, Room, CourseAssignment
+from teacher_constraints import teacher_weekly_capacity
+from reference_data import get_days, get_time_slots
+
+def weekly_capacity():
+    """
+    Count the teaching periods and double-period lab blocks available in a week.
+
+    Returns:
+        (periods, lab_blocks): Non-break periods per week and disjoint consecutive period pairs per week
+    """
+    day_count = len(get_days())
+    time_slots = get_time_slots(is_break=False)
+
+    # Greedily pair consecutive periods (no break in between) to count disjoint lab blocks per day
+    blocks_per_day = 0
+    i = 0
+    while i < len(time_slots) - 1:
+        if time_slots[i].end_time == time_slots[i+1].start_time:
+            blocks_per_day += 1
+            i += 2
+        else:
+            i += 1
+
+    return day_count * len(time_slots), day_count * blocks_per_day
+
+def check_capacity(class_id=None, lecture_mode=None, lab_mode=None):
+    """
+    Check that assigned hours fit in the week before running the solver.
+
+    Runs in O(assignments) on data loaded with one query per table. Only reports inputs that
+    cannot be scheduled whatever the solver does:
+    - a class whose lecture hours plus 2 x lab hours exceed the weekly periods, or whose lab
+      sessions exceed the weekly lab blocks (every section attends all of them)
+    - a course whose own hours cannot fit in the week
+    - a class with common labs and more sections than there are lab rooms (each section needs its
+      own lab room while the class has a lab), and lab or lecture hours across all classes that
+      exceed the rooms' weekly capacity (only checked for room types that have rooms)
+    - a teacher whose periods across all classes exceed the week, less their unavailable periods
+      and capped by their load limits (lab periods for every assigned teacher, or for rotating
+      labs the sections every assigned teacher is sure to get, lecture periods
+      where the teacher is the only one assigned to the course in a class, or, for classes with
+      independent lectures, where every assigned teacher gets a section)
+
+    Args:
+        class_id: Optional class to restrict the report to (its courses and its teachers)
+        lecture_mode: Optional lecture mode to assume for class_id instead of its stored one
+        lab_mode: Optional lab mode to assume for class_id instead of its stored one
+
+    Returns:
+        List of problem dicts with type, id, name, required, available and message keys
+    """
+    periods, lab_blocks = weekly_capacity()
+    courses = {course.id: course for course in Course.query.all()}
+    assignments = CourseAssignment.query.all()
+
+    def lecture_periods(course):
+        return (course.lecture_hours or 0) if course.is_lecture else 0
+
+    def lab_sessions(course):
+        return (course.lab_hours or 0) if course.is_lab else 0
+
+    # Distinct courses and their teachers per class
+    class_courses = {}  # {class_id: {course_id: [teacher_id, ...]}}
+    for assignment in assignments:
+        class_courses.setdefault(assignment.class_id, {}).setdefault(assignment.course_id, []).append(assignment.teacher_id)
+
+    section_counts = dict(db.session.query(Section.class_id, func.count()).group_by(Section.class_id).all())
+    lecture_modes = dict(db.session.query(Class.id, Class.lecture_mode).all())
+    lab_modes = dict(db.session.query(Class.id, Class.lab_mode).all())
+    if class_id is not None and lecture_mode is not None:
+        lecture_modes[class_id] = lecture_mode
+    if class_id is not None and lab_mode is not None:
+        lab_modes[class_id] = lab_mode
+
+    class_load = {}  # {class_id: (periods, lab_sessions)}
+    lecture_load = {}  # {class_id: lecture room periods}
+    teacher_load = {}  # {teacher_id: periods}
+    for cid, course_teachers in class_courses.items():
+        independent = lecture_modes.get(cid) == 'independent'
+        rotating = lab_modes.get(cid) == 'rotation'
+        sections = section_counts.get(cid, 0)
+        lecture_load[cid] = 0
+        total_periods = 0
+        total_labs = 0
+        for course_id, teacher_ids in course_teachers.items():
+            course = courses.get(course_id)
+            if not course:
+                continue
+            total_periods += lecture_periods(course) + 2 * lab_sessions(course)
+            total_labs += lab_sessions(course)
+
+            # Every assigned teacher is blocked for a common lab, and teaches a rotating lab once
+            # per section; a common lecture needs one of them, independent lectures one per
+            # teacher that gets a section
+            lab_rounds = sections // len(teacher_ids) if rotating else 1
+            for teacher_id in teacher_ids:
+                teacher_load[teacher_id] = teacher_load.get(teacher_id, 0) + 2 * lab_sessions(course) * lab_rounds
+            if independent and len(teacher_ids) <= sections:
+                for teacher_id in set(teacher_ids):
+                    teacher_load[teacher_id] += lecture_periods(course)
+                lecture_load[cid] += lecture_periods(course) * len(set(teacher_ids))
+            else:
+                if len(teacher_ids) == 1:
+                    teacher_load[teacher_ids[0]] += lecture_periods(course)
+                lecture_load[cid] += lecture_periods(course)
+        class_load[cid] = (total_periods, total_labs)
+
+    # Restrict the report to one class and the courses and teachers it uses
+    if class_id is not None:
+        course_teachers = class_courses.get(class_id, {})
+        class_ids = {class_id}
+        course_ids = set(course_teachers)
+        teacher_ids = {teacher_id for ids in course_teachers.values() for teacher_id in ids}
+    else:
+        class_ids = set(class_courses)
+        course_ids = {course_id for ids in class_courses.values() for course_id in ids}
+        teacher_ids = set(teacher_load)
+
+    problems = []
+
+    over_classes = [cid for cid in class_ids
+                    if cid in class_load and (class_load[cid][0] > periods or class_load[cid][1] > lab_blocks)]
+    class_names = {}
+    if over_classes:
+        class_names = {c.id: c.name for c in Class.query.filter(Class.id.in_(over_classes)).all()}
+    for cid in over_classes:
+        total_periods, total_labs = class_load[cid]
+        if total_periods > periods:
+            problems.append({
+                'type': 'class',
+                'id': cid,
+                'name': class_names.get(cid),
+                'required': total_periods,
+                'available': periods,
+                'message': f"Class {class_names.get(cid)} needs {total_periods} periods per week but only {periods} are available"
+            })
+        if total_labs > lab_blocks:
+            problems.append({
+                'type': 'class',
+                'id': cid,
+                'name': class_names.get(cid),
+                'required': total_labs,
+                'available': lab_blocks,
+                'message': f"Class {class_names.get(cid)} needs {total_labs} lab sessions per week but only {lab_blocks} double periods are available"
+            })
+
+    room_counts = dict(db.session.query(Room.room_type, func.count()).group_by(Room.room_type).all())
+    lab_rooms = room_counts.get('lab', 0)
+    lecture_rooms = room_counts.get('lecture', 0)
+    if lab_rooms or lecture_rooms:
+        # Room-blocks needed per class: a lab block per section, a lecture room per lecture
+        lab_demand = {cid: labs * section_counts.get(cid, 0) for cid, (_, labs) in class_load.items()}
+        lecture_demand = lecture_load
+
+        if lab_rooms:
+            short_classes = [cid for cid in class_ids
+                             if class_load.get(cid, (0, 0))[1] and section_counts.get(cid, 0) > lab_rooms
+                             and lab_modes.get(cid) != 'rotation']
+            if short_classes:
+                class_names.update({c.id: c.name for c in Class.query.filter(Class.id.in_(short_classes)).all()})
+            for cid in short_classes:
+                problems.append({
+                    'type': 'class',
+                    'id': cid,
+                    'name': class_names.get(cid),
+                    'required': section_counts[cid],
+                    'available': lab_rooms,
+                    'message': f"Class {class_names.get(cid)} has {section_counts[cid]} sections sharing each lab but only {lab_rooms} lab rooms exist"
+                })
+            if any(lab_demand.get(cid) for cid in class_ids) and sum(lab_demand.values()) > lab_blocks * lab_rooms:
+                problems.append({
+                    'type': 'rooms',
+                    'id': None,
+                    'name': 'lab',
+                    'required': sum(lab_demand.values()),
+                    'available': lab_blocks * lab_rooms,
+                    'message': f"Labs need {sum(lab_demand.values())} lab room double periods per week across all classes but only {lab_blocks * lab_rooms} are available"
+                })
+
+        if lecture_rooms and any(lecture_demand.get(cid) for cid in class_ids) and \
+                sum(lecture_demand.values()) > periods * lecture_rooms:
+            problems.append({
+                'type': 'rooms',
+                'id': None,
+                'name': 'lecture',
+                'required': sum(lecture_demand.values()),
+                'available': periods * lecture_rooms,
+                'message': f"Lectures need {sum(lecture_demand.values())} lecture room periods per week across all classes but only {periods * lecture_rooms} are available"
+            })
+
+    for course_id in sorted(course_ids):
+        course = courses.get(course_id)
+        if not course:
+            continue
+        if lab_sessions(course) > lab_blocks:
+            problems.append({
+                'type': 'course',
+                'id': course.id,
+                'name': course.name,
+                'required': lab_sessions(course),
+                'available': lab_blocks,
+                'message': f"Course {course.name} needs {lab_sessions(course)} lab sessions per week but only {lab_blocks} double periods are available"
+            })
+        if lecture_periods(course) + 2 * lab_sessions(course) > periods:
+            problems.append({
+                'type': 'course',
+                'id': course.id,
+                'name': course.name,
+                'required': lecture_periods(course) + 2 * lab_sessions(course),
+                'available': periods,
+                'message': f"Course {course.name} needs {lecture_periods(course) + 2 * lab_sessions(course)} periods per week but only {periods} are available"
+            })
+
+    teacher_capacity = teacher_weekly_capacity(teacher_ids)
+    over_teachers = [teacher_id for teacher_id in teacher_ids
+                     if teacher_load.get(teacher_id, 0) > teacher_capacity.get(teacher_id, periods)]
+    if over_teachers:
+        teacher_names = {t.id: t.name for t in Teacher.query.filter(Teacher.id.in_(over_teachers)).all()}
+        for teacher_id in sorted(over_teachers):
+            problems.append({
+                'type': 'teacher',
+                'id': teacher_id,
+                'name': teacher_names.get(teacher_id),
+                'required': teacher_load[teacher_id],
+                'available': teacher_capacity.get(teacher_id, periods),
+                'message': f"Teacher {teacher_names.get(teacher_id)} is assigned {teacher_load[teacher_id]} periods per week but only {teacher_capacity.get(teacher_id, periods)} are available"
+            })
+
+    return problems
@@ -0,0 +1,243 @@
+from sqlalchemy import func, case, or_
+from app import db
+from models import Section, Teacher, Course, Room, CourseAssignment, TimetableEntry
+from reference_data import get_days, get_time_slots
+
+def find_conflicts(class_id=None, teacher_id=None):
+    """
+    Find scheduling conflicts in the published timetables with a few grouped queries.
+
+    Looks for:
+    - teacher clashes: a teacher placed in the same day and slot for more than one class or course
+      (a common lecture taught to every section of a class at once is not a clash)
+    - overloaded sections: sections whose assigned courses need more periods a week (lecture hours
+      plus 2 x lab hours) than the week has non-break periods, as in capacity_check
+    - room clashes: a room used in the same day and slot by more than one class, course or
+      teacher (a common lecture given to every section of a class in one room is not a clash)
+    - small lab rooms: sections placed in a lab room with fewer seats than their students (e.g.
+      after a room or section was edited since the timetable was generated)
+    - unplaced hours: sections with a generated timetable that have fewer periods of an assigned
+      course than its lecture hours plus 2 x lab hours
+
+    Args:
+        class_id: Optional class to restrict the report to
+        teacher_id: Optional teacher to restrict the report to
+
+    Returns:
+        Dict with teacher_clashes, overloaded_sections, room_clashes, small_rooms and unplaced lists,
+        plus a flat list of human-readable messages
+    """
+    days = {day.id: day.name for day in get_days()}
+    slots = {slot.id: f"{slot.start_time.strftime('%H:%M')}-{slot.end_time.strftime('%H:%M')}"
+             for slot in get_time_slots()}
+
+    # Teacher clashes: GROUP BY teacher, day, slot HAVING more than one class or course
+    class_count = func.count(func.distinct(Section.class_id))
+    course_count = func.count(func.distinct(TimetableEntry.course_id))
+    clash_query = db.session.query(
+        TimetableEntry.teacher_id,
+        TimetableEntry.day_id,
+        TimetableEntry.time_slot_id,
+        class_count,
+        course_count,
+        func.count()
+    ).join(
+        Section, TimetableEntry.section_id == Section.id
+    ).filter(
+        TimetableEntry.teacher_id.isnot(None)
+    ).group_by(
+        TimetableEntry.teacher_id, TimetableEntry.day_id, TimetableEntry.time_slot_id
+    )
+    clash_having = or_(class_count > 1, course_count > 1)
+    if teacher_id is not None:
+        clash_query = clash_query.filter(TimetableEntry.teacher_id == teacher_id)
+    if class_id is not None:
+        # Keep clashes with other classes, but only for groups that involve this class
+        clash_having = clash_having & (func.sum(case((Section.class_id == class_id, 1), else_=0)) > 0)
+    clash_rows = clash_query.having(clash_having).all()
+
+    # Overloaded sections: SUM of required periods of the class's courses per section
+    assigned_courses = db.session.query(
+        CourseAssignment.class_id, CourseAssignment.course_id
+    ).distinct().subquery()
+    required = (case((Course.is_lecture, func.coalesce(Course.lecture_hours, 0)), else_=0) +
+                case((Course.is_lab, 2 * func.coalesce(Course.lab_hours, 0)), else_=0))
+    week_periods = len(days) * len(get_time_slots(is_break=False))
+    overload_query = db.session.query(
+        Section.id, Section.name, func.sum(required)
+    ).join(
+        assigned_courses, assigned_courses.c.class_id == Section.class_id
+    ).join(
+        Course, Course.id == assigned_courses.c.course_id
+    ).group_by(
+        Section.id, Section.name
+    ).having(func.sum(required) > week_periods)
+    if class_id is not None:
+        overload_query = overload_query.filter(Section.class_id == class_id)
+    if teacher_id is not None:
+        teacher_classes = db.session.query(CourseAssignment.class_id).filter(
+            CourseAssignment.teacher_id == teacher_id
+        )
+        overload_query = overload_query.filter(Section.class_id.in_(teacher_classes))
+    overload_rows = overload_query.all()
+
+    # Room clashes: GROUP BY room, day, slot HAVING more than one class, course or teacher
+    teacher_count = func.count(func.distinct(TimetableEntry.teacher_id))
+    room_query = db.session.query(
+        TimetableEntry.room_id,
+        TimetableEntry.day_id,
+        TimetableEntry.time_slot_id,
+        class_count,
+        course_count,
+        func.count()
+    ).join(
+        Section, TimetableEntry.section_id == Section.id
+    ).filter(
+        TimetableEntry.room_id.isnot(None)
+    ).group_by(
+        TimetableEntry.room_id, TimetableEntry.day_id, TimetableEntry.time_slot_id
+    )
+    room_having = or_(class_count > 1, course_count > 1, teacher_count > 1)
+    if class_id is not None:
+        room_having = room_having & (func.sum(case((Section.class_id == class_id, 1), else_=0)) > 0)
+    if teacher_id is not None:
+        room_having = room_having & (func.sum(case((TimetableEntry.teacher_id == teacher_id, 1), else_=0)) > 0)
+    room_rows = room_query.having(room_having).all()
+
+    # Small lab rooms: each section has its own lab room, so its students must fit in it
+    small_room_query = db.session.query(
+        Section.id, Section.name, Section.student_count, Room.id, Room.name, Room.capacity, func.count()
+    ).join(
+        TimetableEntry, TimetableEntry.section_id == Section.id
+    ).join(
+        Room, TimetableEntry.room_id == Room.id
+    ).filter(
+        Room.room_type == 'lab',
+        Room.capacity.isnot(None),
+        Section.student_count > Room.capacity
+    ).group_by(
+        Section.id, Section.name, Section.student_count, Room.id, Room.name, Room.capacity
+    )
+    if class_id is not None:
+        small_room_query = small_room_query.filter(Section.class_id == class_id)
+    if teacher_id is not None:
+        small_room_query = small_room_query.filter(TimetableEntry.teacher_id == teacher_id)
+    small_room_rows = small_room_query.all()
+
+    # Unplaced hours: required periods per (section, course) against placed periods
+    class_courses = db.session.query(
+        CourseAssignment.class_id, CourseAssignment.course_id
+    )
+    if teacher_id is not None:
+        class_courses = class_courses.filter(CourseAssignment.teacher_id == teacher_id)
+    class_courses = class_courses.distinct().subquery()
+    placed = db.session.query(
+        TimetableEntry.section_id,
+        TimetableEntry.course_id,
+        func.count().label('placed')
+    ).filter(
+        TimetableEntry.course_id.isnot(None)
+    ).group_by(
+        TimetableEntry.section_id, TimetableEntry.course_id
+    ).subquery()
+    generated_sections = db.session.query(TimetableEntry.section_id).distinct()
+    placed_count = func.coalesce(placed.c.placed, 0)
+    unplaced_query = db.session.query(
+        Section.id, Section.name, Course.id, Course.name, required, placed_count
+    ).join(
+        class_courses, class_courses.c.class_id == Section.class_id
+    ).join(
+        Course, Course.id == class_courses.c.course_id
+    ).outerjoin(
+        placed, (placed.c.section_id == Section.id) & (placed.c.course_id == Course.id)
+    ).filter(
+        Section.id.in_(generated_sections),
+        placed_count < required
+    )
+    if class_id is not None:
+        unplaced_query = unplaced_query.filter(Section.class_id == class_id)
+    unplaced_rows = unplaced_query.all()
+
+    teacher_ids = {row[0] for row in clash_rows}
+    teachers = {}
+    if teacher_ids:
+        teachers = {t.id: t.name for t in Teacher.query.filter(Teacher.id.in_(teacher_ids)).all()}
+    room_ids = {row[0] for row in room_rows}
+    rooms = {}
+    if room_ids:
+        rooms = {r.id: r.name for r in Room.query.filter(Room.id.in_(room_ids)).all()}
+
+    report = {
+        'teacher_clashes': [],
+        'overloaded_sections': [],
+        'room_clashes': [],
+        'small_rooms': [],
+        'unplaced': [],
+        'messages': []
+    }
+
+    for row_teacher_id, day_id, slot_id, classes, courses, entries in clash_rows:
+        report['teacher_clashes'].append({
+            'teacher_id': row_teacher_id,
+            'teacher_name': teachers.get(row_teacher_id),
+            'day_id': day_id,
+            'time_slot_id': slot_id,
+            'classes': classes,
+            'courses': courses,
+            'entries': entries
+        })
+        report['messages'].append(
+            f"Teacher {teachers.get(row_teacher_id)} is double-booked on {days.get(day_id)} {slots.get(slot_id)} "
+            f"({classes} classes, {courses} courses)"
+        )
+
+    for section_id, section_name, required_periods in overload_rows:
+        report['overloaded_sections'].append({
+            'section_id': section_id,
+            'required': required_periods,
+            'available': week_periods
+        })
+        report['messages'].append(
+            f"Section {section_name} needs {required_periods} periods a week, but the week has {week_periods}"
+        )
+
+    for room_id, day_id, slot_id, classes, courses, entries in room_rows:
+        report['room_clashes'].append({
+            'room_id': room_id,
+            'room_name': rooms.get(room_id),
+            'day_id': day_id,
+            'time_slot_id': slot_id,
+            'classes': classes,
+            'courses': courses,
+            'entries': entries
+        })
+        report['messages'].append(
+            f"Room {rooms.get(room_id)} is double-booked on {days.get(day_id)} {slots.get(slot_id)} "
+            f"({classes} classes, {courses} courses)"
+        )
+
+    for section_id, section_name, students, room_id, room_name, capacity, periods in small_room_rows:
+        report['small_rooms'].append({
+            'section_id': section_id,
+            'room_id': room_id,
+            'room_name': room_name,
+            'students': students,
+            'capacity': capacity,
+            'periods': periods
+        })
+        report['messages'].append(
+            f"Section {section_name} ({students} students) has {periods} lab periods in {room_name} ({capacity} seats)"
+        )
+
+    for section_id, section_name, course_id, course_name, required_periods, placed_periods in unplaced_rows:
+        report['unplaced'].append({
+            'section_id': section_id,
+            'course_id': course_id,
+            'required': required_periods,
+            'placed': placed_periods
+        })
+        report['messages'].append(
+            f"Section {section_name}: {course_name} has {placed_periods} of {required_periods} periods placed"
+        )
+
+    return report
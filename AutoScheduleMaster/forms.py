@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, BooleanField, SubmitField, SelectMultipleField, PasswordField
-from wtforms.validators import DataRequired, Email, Optional, Length, EqualTo, ValidationError
+from wtforms import StringField, SelectField, BooleanField, SubmitField, SelectMultipleField, PasswordField, IntegerField
+from wtforms.validators import DataRequired, Email, Optional, Length, EqualTo, ValidationError, NumberRange
 from wtforms.widgets import CheckboxInput, ListWidget
 from models import User
 
@@ -10,6 +10,7 @@ class ClassForm(FlaskForm):
 
 class SectionForm(FlaskForm):
     name = StringField('Section Name', validators=[DataRequired(), Length(max=50)])
+    student_count = IntegerField('Number of Students', validators=[Optional(), NumberRange(min=0)])
     submit = SubmitField('Add Section')
 
 class TeacherForm(FlaskForm):
@@ -18,6 +19,17 @@ class TeacherForm(FlaskForm):
     department = StringField('Department', validators=[Optional(), Length(max=100)])
     submit = SubmitField('Add Teacher')
 
+class TeacherAvailabilityForm(FlaskForm):
+    max_periods_per_day = IntegerField('Max Periods per Day', validators=[Optional(), NumberRange(min=0)])
+    max_periods_per_week = IntegerField('Max Periods per Week', validators=[Optional(), NumberRange(min=0)])
+    submit = SubmitField('Save Availability')
+
+class RoomForm(FlaskForm):
+    name = StringField('Room Name', validators=[DataRequired(), Length(max=100)])
+    room_type = SelectField('Room Type', choices=[('lecture', 'Lecture Room'), ('lab', 'Lab')])
+    capacity = IntegerField('Capacity', validators=[Optional(), NumberRange(min=1)])
+    submit = SubmitField('Add Room')
+
 class CourseForm(FlaskForm):
     name = StringField('Course Name', validators=[DataRequired(), Length(max=100)])
     code = StringField('Course Code', validators=[Optional(), Length(max=20)])
@@ -0,0 +1,47 @@
+# Gunicorn settings for production: gunicorn -c gunicorn.conf.py
+# Every setting can be overridden with the environment variable named next to it.
+import multiprocessing
+import os
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Import the app once in the master (tables, migrations, reference data, templates) and fork
+# workers that share it copy-on-write
+preload_app = True
+
+# Threaded workers: each Server-Sent Events stream holds a thread for as long as a display is
+# connected, and a timetable generation holds one for up to a few seconds. Each worker accepts at
+# most TIMETABLE_EVENTS_MAX_STREAMS (default 8) streams and answers further ones with 503, so
+# the remaining threads stay free for other requests.
+#
+# For many always-on displays, run an async worker instead, where an idle stream costs a greenlet
+# rather than a thread: `pip install gevent`, then set GUNICORN_WORKER_CLASS=gevent,
+# GUNICORN_WORKER_CONNECTIONS (e.g. 1000) and TIMETABLE_EVENTS_MAX_STREAMS to a few hundred.
+# Timetable generation is CPU-bound and blocks a gevent worker while it runs, so keep several
+# workers.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("GUNICORN_WORKERS", str(multiprocessing.cpu_count() + 1)))
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+# Seconds a worker may go silent before it is restarted, and seconds in-flight requests (such
+# as an optimizing generation) get to finish on shutdown or reload
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers now and then to bound memory growth; jitter keeps them from restarting together
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+def post_fork(server, worker):
+    # Drop any pooled connections inherited from the master without closing them under it
+    from app import app, db
+    from tenancy import opened_tenant_engines
+    with app.app_context():
+        for engine in list(db.engines.values()) + opened_tenant_engines():
+            engine.dispose(close=False)
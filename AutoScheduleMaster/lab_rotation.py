@@ -0,0 +1,152 @@
+from teacher_constraints import within_limits
+from room_allocation import free_room
+
+def lab_blocks(time_slots):
+    """Consecutive (no break in between) pairs of teaching periods, as [slot_id, slot_id] lists"""
+    return [[time_slots[i].id, time_slots[i+1].id] for i in range(len(time_slots) - 1)
+            if time_slots[i].end_time == time_slots[i+1].start_time]
+
+def schedule_lab_rotation(sections, labs_by_course, days, time_slots, section_schedules,
+                          teacher_schedule, teacher_load, limits, rooms, room_schedule):
+    """
+    Place labs as rotations: sections take different lab courses in parallel in the same block.
+
+    Each section is taught a lab course by one of the course's teachers (rotating over them like
+    common labs) and needs the course's lab hours of double periods. In a block, the free
+    sections are matched to lab courses (every course at most once, so a course needs one
+    teacher and one lab room per block) with augmenting paths, preferring the courses with the
+    most sessions left. Matches whose teacher is already teaching another lab in the block, or
+    that cannot get a free lab room, sit the block out. Blocks are taken one at a time, always
+    the one that leaves the most sections in a lab in it, so labs use as few of the class's
+    periods as possible. With fewer lab courses than sections this is still more periods than
+    common labs use; generate_timetable then keeps common labs.
+
+    The schedules, teacher load and room schedule are updated in place.
+
+    Args:
+        labs_by_course: {course_id: [lab assignment dicts with teacher_id and hours]}
+
+    Returns:
+        (sessions, remaining): Placed sessions in generate_timetable's format (one per section
+        and block) and {course_id: lab sessions still missing for the section furthest behind}
+    """
+    teacher_of = {}
+    remaining = {}
+    for course_id, course_assignments in labs_by_course.items():
+        for section_index, section in enumerate(sections):
+            assignment = course_assignments[section_index % len(course_assignments)]
+            teacher_of[(section.id, course_id)] = assignment['teacher_id']
+            remaining[(section.id, course_id)] = assignment['hours']
+
+    students = {section.id: section.student_count for section in sections}
+    # Sections with a rotating lab in each (day_id, slot_id)
+    lab_sections = {}
+
+    def plan_block(day, slot_ids):
+        """[(course_id, section_id, teacher_id, room_id)] that can be placed in a block, without placing them"""
+        # Labs each free section could take in this block. Courses with the most sessions left
+        # across all sections come first: every block that leaves one out makes it harder to
+        # finish the rotation in as few blocks as common labs would use.
+        course_left = {course_id: sum(remaining[(section.id, course_id)] for section in sections)
+                       for course_id in labs_by_course}
+        options = {}
+        for section in sections:
+            if any(slot_id in section_schedules[section.id][day.id] for slot_id in slot_ids):
+                continue
+            candidates = []
+            for course_id in labs_by_course:
+                teacher_id = teacher_of[(section.id, course_id)]
+                if (remaining[(section.id, course_id)] > 0 and
+                        all(slot_id not in teacher_schedule[teacher_id][day.id] for slot_id in slot_ids) and
+                        within_limits(teacher_id, day.id, 2, teacher_load, limits)):
+                    candidates.append(course_id)
+            if candidates:
+                candidates.sort(key=lambda course_id: (-course_left[course_id], -remaining[(section.id, course_id)]))
+                options[section.id] = candidates
+        if not options:
+            return []
+
+        # Maximum matching of sections to lab courses
+        section_of = {}  # {course_id: section_id}
+
+        def assign(section_id, visited):
+            for course_id in options[section_id]:
+                if course_id in visited:
+                    continue
+                visited.add(course_id)
+                if course_id not in section_of or assign(section_of[course_id], visited):
+                    section_of[course_id] = section_id
+                    return True
+            return False
+
+        # Sections furthest behind pick first
+        for section_id in sorted(options, key=lambda section_id: -sum(
+                remaining[(section_id, course_id)] for course_id in labs_by_course)):
+            assign(section_id, set())
+
+        # Seat the matched sections, largest first, each with its own teacher and lab room
+        plan = []
+        busy_teachers = set()
+        taken_rooms = set()
+        for course_id, section_id in sorted(section_of.items(), key=lambda item: -(students[item[1]] or 0)):
+            teacher_id = teacher_of[(section_id, course_id)]
+            if teacher_id in busy_teachers:
+                continue
+            room_id = None
+            if rooms['lab']:
+                room_id = free_room(rooms['lab'], room_schedule, day.id, slot_ids, students[section_id],
+                                    taken=taken_rooms)
+                if room_id is None:
+                    continue
+                taken_rooms.add(room_id)
+            busy_teachers.add(teacher_id)
+            plan.append((course_id, section_id, teacher_id, room_id))
+        return plan
+
+    # Each round places the block that leaves the class's lab periods most packed: the most
+    # sections in a lab in it afterwards, counting those already there. Sections sitting out a
+    # rotation block cannot take a lecture shared with the others, so filling blocks already in
+    # use, and the same blocks rather than overlapping ones, keeps the most whole periods free
+    # for common lectures. Ties go to the earliest block.
+    sessions = []
+    blocks = [(day, slot_ids) for day in days for slot_ids in lab_blocks(time_slots)]
+    while any(remaining.values()):
+        best = None
+        best_score = None
+        for day, slot_ids in blocks:
+            plan = plan_block(day, slot_ids)
+            if not plan:
+                continue
+            in_labs = set()
+            for slot_id in slot_ids:
+                in_labs |= lab_sections.get((day.id, slot_id), set())
+            score = (len(plan) + len(in_labs), len(plan))
+            if best_score is None or score > best_score:
+                best, best_score = (day, slot_ids, plan), score
+        if best is None:
+            break
+
+        day, slot_ids, plan = best
+        for course_id, section_id, teacher_id, room_id in plan:
+            for slot_id in slot_ids:
+                section_schedules[section_id][day.id][slot_id] = True
+                teacher_schedule[teacher_id][day.id][slot_id] = True
+                lab_sections.setdefault((day.id, slot_id), set()).add(section_id)
+                if room_id is not None:
+                    room_schedule[room_id][day.id][slot_id] = True
+            teacher_load[teacher_id][day.id] += 2
+            remaining[(section_id, course_id)] -= 1
+            sessions.append({
+                'course_id': course_id,
+                'is_lab': True,
+                'day_id': day.id,
+                'slot_ids': list(slot_ids),
+                'teachers': {section_id: teacher_id},
+                'rooms': {section_id: room_id} if room_id is not None else {}
+            })
+
+    missing = {}
+    for (section_id, course_id), hours in remaining.items():
+        if hours > 0:
+            missing[course_id] = max(missing.get(course_id, 0), hours)
+    return sessions, missing
@@ -1,4 +1,9 @@
+import os
+
 from app import app  # noqa: F401
 
+# Development server; in production run gunicorn -c gunicorn.conf.py (see wsgi.py). The Werkzeug
+# debugger runs arbitrary code for anyone who can reach it, so it is only on with FLASK_DEBUG=1.
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    debug = os.environ.get('FLASK_DEBUG', '').strip().lower() in ('1', 'true', 'yes')
+    app.run(host='0.0.0.0', port=5000, debug=debug)
@@ -0,0 +1,34 @@
+from app import app, db
+from models import add_missing_columns, upgrade_foreign_keys, create_missing_indexes
+from tenancy import TENANTS, tenant_engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+def migrate_database(engine=None):
+    """
+    Bring an existing database up to date with the columns, foreign keys and indexes declared on the models.
+
+    Adds new nullable columns, adds ON DELETE CASCADE / SET NULL to existing foreign keys,
+    cleans up rows orphaned while foreign keys were not enforced, and creates missing indexes.
+    SQLite cannot alter foreign keys, so affected tables are rebuilt in a single transaction;
+    other databases drop and re-add the constraints. Safe to run more than once.
+
+    Args:
+        engine: Database to migrate; defaults to the configured one
+    """
+    with app.app_context():
+        engine = engine or db.engine
+        add_missing_columns(db, engine)
+        upgrade_foreign_keys(db, engine)
+        create_missing_indexes(db, engine)
+        logger.info("Database migrated successfully!")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate_database()
+    # Each school's database when running multi-tenant
+    for tenant in TENANTS:
+        with app.app_context():
+            logger.info(f"Migrating tenant {tenant}...")
+            migrate_database(tenant_engine(tenant))
@@ -3,6 +3,9 @@ from datetime import time, datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import AddConstraint
+import logging
 
 class User(UserMixin, db.Model):
     """User model for authentication"""
@@ -26,7 +29,16 @@ class Class(db.Model):
     """Represents a class (e.g., 'Class 10', 'Class 12')"""
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
-    sections = db.relationship('Section', backref='class_obj', lazy=True, cascade="all, delete-orphan")
+    # How lectures are scheduled: 'common' (one lecture for all sections) or 'independent'
+    # (sections taught by different teachers get their own lectures); unset means 'common'
+    lecture_mode = db.Column(db.String(20), nullable=True, default='common')
+    # How labs are scheduled: 'common' (every section takes the same lab at once) or 'rotation'
+    # (sections take different labs in the same block); unset means 'common'
+    lab_mode = db.Column(db.String(20), nullable=True, default='common')
+    sections = db.relationship('Section', backref='class_obj', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    
+    # Case-insensitive name search (pagination.prefix_filter)
+    __table_args__ = (db.Index('ix_class_name_lower', db.func.lower(name)),)
     
     def __repr__(self):
         return f"<Class {self.name}>"
@@ -35,8 +47,10 @@ class Section(db.Model):
     """Represents a section of a class (e.g., 'A', 'B', 'C')"""
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
-    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False)
-    timetable_entries = db.relationship('TimetableEntry', backref='section', lazy=True, cascade="all, delete-orphan")
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Number of students, used to pick rooms that fit (unknown sizes fit any room)
+    student_count = db.Column(db.Integer, nullable=True)
+    timetable_entries = db.relationship('TimetableEntry', backref='section', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
     
     __table_args__ = (db.UniqueConstraint('name', 'class_id', name='unique_section_per_class'),)
     
@@ -46,11 +60,16 @@ class Section(db.Model):
 class Teacher(db.Model):
     """Represents a teacher"""
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     email = db.Column(db.String(100), nullable=True)
-    department = db.Column(db.String(100), nullable=True)
-    timetable_entries = db.relationship('TimetableEntry', backref='teacher', lazy=True)
-    course_assignments = db.relationship('CourseAssignment', backref='teacher', lazy=True, cascade="all, delete-orphan")
+    department = db.Column(db.String(100), nullable=True, index=True)
+    timetable_entries = db.relationship('TimetableEntry', backref='teacher', lazy=True, passive_deletes=True)
+    course_assignments = db.relationship('CourseAssignment', backref='teacher', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    unavailability = db.relationship('TeacherAvailability', backref='teacher', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    load_limit = db.relationship('TeacherLoadLimit', backref='teacher', uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    
+    # Case-insensitive name search (pagination.prefix_filter)
+    __table_args__ = (db.Index('ix_teacher_name_lower', db.func.lower(name)),)
     
     def __repr__(self):
         return f"<Teacher {self.name}>"
@@ -59,16 +78,21 @@ class Course(db.Model):
     """Represents a course/subject"""
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    code = db.Column(db.String(20), nullable=True)
+    code = db.Column(db.String(20), nullable=True, index=True)
     is_lab = db.Column(db.Boolean, default=False)
     is_lecture = db.Column(db.Boolean, default=True)
     lab_hours = db.Column(db.Integer, default=0)
     lecture_hours = db.Column(db.Integer, default=0)
-    course_assignments = db.relationship('CourseAssignment', backref='course', lazy=True, cascade="all, delete-orphan")
-    timetable_entries = db.relationship('TimetableEntry', backref='course', lazy=True)
+    course_assignments = db.relationship('CourseAssignment', backref='course', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    timetable_entries = db.relationship('TimetableEntry', backref='course', lazy=True, passive_deletes=True)
     
-    # Changed the unique constraint to only use name
-    __table_args__ = (db.UniqueConstraint('name', name='unique_course_name'),)
+    # Changed the unique constraint to only use name; the lower() indexes serve case-insensitive
+    # name and code search (pagination.prefix_filter)
+    __table_args__ = (
+        db.UniqueConstraint('name', name='unique_course_name'),
+        db.Index('ix_course_name_lower', db.func.lower(name)),
+        db.Index('ix_course_code_lower', db.func.lower(code)),
+    )
     
     def __repr__(self):
         course_type = []
@@ -81,12 +105,12 @@ class Course(db.Model):
 class CourseAssignment(db.Model):
     """Represents assignment of a course to a class/section with a teacher"""
     id = db.Column(db.Integer, primary_key=True)
-    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=False)
-    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id', ondelete='CASCADE'), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id', ondelete='CASCADE'), nullable=False, index=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id', ondelete='CASCADE'), nullable=False, index=True)
     
-    # Reference to the Class
-    class_obj = db.relationship('Class', backref='course_assignments')
+    # Reference to the Class (class_id is covered by the leading column of the unique constraint)
+    class_obj = db.relationship('Class', backref=db.backref('course_assignments', cascade="all, delete-orphan", passive_deletes=True))
     
     __table_args__ = (
         db.UniqueConstraint('class_id', 'teacher_id', 'course_id', 
@@ -103,7 +127,7 @@ class TimeSlot(db.Model):
     end_time = db.Column(db.Time, nullable=False)
     is_break = db.Column(db.Boolean, default=False)
     
-    timetable_entries = db.relationship('TimetableEntry', backref='time_slot', lazy=True)
+    timetable_entries = db.relationship('TimetableEntry', backref='time_slot', lazy=True, passive_deletes=True)
     
     __table_args__ = (db.UniqueConstraint('start_time', 'end_time', name='unique_time_slot'),)
     
@@ -114,28 +138,141 @@ class Day(db.Model):
     """Represents a day of the week"""
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(20), nullable=False, unique=True)
-    timetable_entries = db.relationship('TimetableEntry', backref='day', lazy=True)
+    timetable_entries = db.relationship('TimetableEntry', backref='day', lazy=True, passive_deletes=True)
     
     def __repr__(self):
         return f"<Day {self.name}>"
 
+class Room(db.Model):
+    """Represents a room that lectures or labs are held in"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    room_type = db.Column(db.String(20), nullable=False, default='lecture', index=True)  # 'lecture' or 'lab'
+    # Number of seats; no capacity means the room fits any section
+    capacity = db.Column(db.Integer, nullable=True)
+    timetable_entries = db.relationship('TimetableEntry', backref='room', lazy=True, passive_deletes=True)
+    
+    def __repr__(self):
+        return f"<Room {self.name}>"
+
 class TimetableEntry(db.Model):
     """Represents an entry in the timetable"""
     id = db.Column(db.Integer, primary_key=True)
-    section_id = db.Column(db.Integer, db.ForeignKey('section.id'), nullable=False)
-    day_id = db.Column(db.Integer, db.ForeignKey('day.id'), nullable=False)
-    time_slot_id = db.Column(db.Integer, db.ForeignKey('time_slot.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=True)
-    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), nullable=True)
+    # section_id and teacher_id are covered by the leading columns of the composite indexes below
+    section_id = db.Column(db.Integer, db.ForeignKey('section.id', ondelete='CASCADE'), nullable=False)
+    day_id = db.Column(db.Integer, db.ForeignKey('day.id', ondelete='CASCADE'), nullable=False, index=True)
+    time_slot_id = db.Column(db.Integer, db.ForeignKey('time_slot.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Deleting a course or teacher leaves the slot empty, as the ORM did before
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id', ondelete='SET NULL'), nullable=True, index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id', ondelete='SET NULL'), nullable=True)
+    # Covered by the leading column of ix_timetable_entry_room_slot
+    room_id = db.Column(db.Integer, db.ForeignKey('room.id', ondelete='SET NULL'), nullable=True)
     
     __table_args__ = (
         db.UniqueConstraint('section_id', 'day_id', 'time_slot_id', 
                            name='unique_timetable_entry'),
+        # Supports teacher clash detection (GROUP BY teacher, day, slot)
+        db.Index('ix_timetable_entry_teacher_slot', 'teacher_id', 'day_id', 'time_slot_id'),
+        # Supports placed-hours counts per section and course
+        db.Index('ix_timetable_entry_section_course', 'section_id', 'course_id'),
+        # Supports room occupancy lookups and room clash detection
+        db.Index('ix_timetable_entry_room_slot', 'room_id', 'day_id', 'time_slot_id'),
     )
     
     def __repr__(self):
         return f"<TimetableEntry Section:{self.section_id} Day:{self.day_id} TimeSlot:{self.time_slot_id}>"
 
+class TimetableVersion(db.Model):
+    """Counts changes to a class's published timetable, so subscribers can tell when it changed"""
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id', ondelete='CASCADE'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    def __repr__(self):
+        return f"<TimetableVersion Class:{self.class_id} v{self.version}>"
+
+class TimetableArchive(db.Model):
+    """A past timetable of a class, kept as one compressed snapshot so TimetableEntry holds only the current one"""
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(40), nullable=False)
+    # Numbers the snapshots of a class within a term, from 1
+    version = db.Column(db.Integer, nullable=False)
+    # The class name is kept so archives outlive the class
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id', ondelete='SET NULL'), nullable=True)
+    class_name = db.Column(db.String(100), nullable=False)
+    reason = db.Column(db.String(20), nullable=False, default='manual')  # 'regenerated' or 'manual'
+    cell_count = db.Column(db.Integer, nullable=False, default=0)
+    # zlib-compressed JSON snapshot (see timetable_archive.build_snapshot), only loaded when read
+    data = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    data_size = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        db.UniqueConstraint('class_id', 'term', 'version', name='unique_timetable_archive'),
+        # Supports listing a term's archives across classes
+        db.Index('ix_timetable_archive_term', 'term'),
+    )
+
+    def __repr__(self):
+        return f"<TimetableArchive {self.class_name} {self.term} v{self.version}>"
+
+class TeacherDayLoad(db.Model):
+    """Summary: periods a teacher teaches a class on a day, kept up to date with the published timetable"""
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id', ondelete='CASCADE'), primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id', ondelete='CASCADE'), primary_key=True, index=True)
+    day_id = db.Column(db.Integer, db.ForeignKey('day.id', ondelete='CASCADE'), primary_key=True)
+    periods = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TeacherDayLoad Teacher:{self.teacher_id} Class:{self.class_id} Day:{self.day_id} {self.periods}>"
+
+class ClassDayFill(db.Model):
+    """Summary: taught periods against available periods, over a class's sections, on a day"""
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id', ondelete='CASCADE'), primary_key=True)
+    day_id = db.Column(db.Integer, db.ForeignKey('day.id', ondelete='CASCADE'), primary_key=True)
+    filled = db.Column(db.Integer, nullable=False, default=0)
+    capacity = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ClassDayFill Class:{self.class_id} Day:{self.day_id} {self.filled}/{self.capacity}>"
+
+class CoursePlacement(db.Model):
+    """Summary: periods of a course placed against required, over a class's sections"""
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id', ondelete='CASCADE'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id', ondelete='CASCADE'), primary_key=True, index=True)
+    required = db.Column(db.Integer, nullable=False, default=0)
+    placed = db.Column(db.Integer, nullable=False, default=0)
+    # Sections with fewer periods than required
+    short_sections = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CoursePlacement Class:{self.class_id} Course:{self.course_id} {self.placed}/{self.required}>"
+
+class TeacherAvailability(db.Model):
+    """A period, or a whole day, when a teacher cannot be scheduled"""
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id', ondelete='CASCADE'), nullable=False, index=True)
+    day_id = db.Column(db.Integer, db.ForeignKey('day.id', ondelete='CASCADE'), nullable=False)
+    # No time slot means the whole day
+    time_slot_id = db.Column(db.Integer, db.ForeignKey('time_slot.id', ondelete='CASCADE'), nullable=True)
+    reason = db.Column(db.String(200), nullable=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('teacher_id', 'day_id', 'time_slot_id', name='unique_teacher_availability'),
+    )
+    
+    def __repr__(self):
+        return f"<TeacherAvailability Teacher:{self.teacher_id} Day:{self.day_id} TimeSlot:{self.time_slot_id}>"
+
+class TeacherLoadLimit(db.Model):
+    """Maximum number of periods a teacher may teach, across all classes"""
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id', ondelete='CASCADE'), primary_key=True)
+    max_periods_per_day = db.Column(db.Integer, nullable=True)
+    max_periods_per_week = db.Column(db.Integer, nullable=True)
+    
+    def __repr__(self):
+        return f"<TeacherLoadLimit Teacher:{self.teacher_id} {self.max_periods_per_day}/day {self.max_periods_per_week}/week>"
+
 # Initialize default days and time slots
 def init_default_data(db):
     # Create days if they don't exist
@@ -182,3 +319,161 @@ def init_default_data(db):
     
     # Commit all changes
     db.session.commit()
+    
+    # Cached copies of the days and time slots are reloaded on next use
+    from reference_data import clear_reference_data
+    clear_reference_data()
+
+# Add nullable columns declared on the models that an existing database does not have yet,
+# with their foreign keys (ALTER TABLE ADD COLUMN works the same on SQLite and PostgreSQL)
+def add_missing_columns(db, engine=None):
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    dialect = engine.dialect
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(dialect=dialect)}'
+                for fk in column.foreign_keys:
+                    ddl += f' REFERENCES "{fk.column.table.name}" ("{fk.column.name}")'
+                    if fk.ondelete:
+                        ddl += f' ON DELETE {fk.ondelete}'
+                conn.execute(text(ddl))
+
+def _outdated_foreign_keys(inspector, table):
+    """Foreign keys of a model table whose ON DELETE action differs from (or is missing in) the database"""
+    existing = {}
+    for fk in inspector.get_foreign_keys(table.name):
+        existing[(tuple(fk['constrained_columns']), fk['referred_table'])] = fk
+
+    outdated = []
+    for constraint in table.foreign_key_constraints:
+        current = existing.get((tuple(constraint.column_keys), constraint.referred_table.name))
+        wanted = (constraint.ondelete or '').upper()
+        actual = ((current or {}).get('options', {}).get('ondelete') or '').upper()
+        if current is None or wanted != actual:
+            outdated.append((constraint, current))
+    return outdated
+
+def _remove_orphans(conn, table):
+    """Apply each foreign key's ON DELETE action to rows whose parent is already gone"""
+    removed = 0
+    for constraint in table.foreign_key_constraints:
+        column = constraint.column_keys[0]
+        parent = constraint.referred_table.name
+        parent_column = constraint.elements[0].column.name
+        orphaned = (f'"{column}" IS NOT NULL AND "{column}" NOT IN '
+                    f'(SELECT "{parent_column}" FROM "{parent}")')
+        if (constraint.ondelete or '').upper() == 'SET NULL':
+            result = conn.execute(text(f'UPDATE "{table.name}" SET "{column}" = NULL WHERE {orphaned}'))
+        else:
+            result = conn.execute(text(f'DELETE FROM "{table.name}" WHERE {orphaned}'))
+        removed += result.rowcount or 0
+    return removed
+
+def _tables_with_outdated_foreign_keys(db, inspector):
+    """[(table, outdated foreign keys)] for the existing model tables that need upgrading"""
+    result = []
+    for table in db.metadata.sorted_tables:
+        if inspector.has_table(table.name):
+            outdated = _outdated_foreign_keys(inspector, table)
+            if outdated:
+                result.append((table, outdated))
+    return result
+
+def _remove_all_orphans(db, conn):
+    inspector = inspect(conn)
+    for table in db.metadata.sorted_tables:
+        if inspector.has_table(table.name):
+            removed = _remove_orphans(conn, table)
+            if removed:
+                logging.info(f"Cleaned up {removed} orphaned rows in {table.name}")
+
+def _rebuild_sqlite_table(conn, table):
+    """Recreate a SQLite table from its model definition, keeping its rows"""
+    old_name = f"_{table.name}_old"
+    index_names = conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL"
+    ), {'table': table.name}).scalars().all()
+    for index_name in index_names:
+        conn.execute(text(f'DROP INDEX "{index_name}"'))
+
+    conn.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{old_name}"'))
+    table.create(conn)
+
+    old_columns = {column['name'] for column in inspect(conn).get_columns(old_name)}
+    columns = ', '.join(f'"{column.name}"' for column in table.columns if column.name in old_columns)
+    conn.execute(text(f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "{old_name}"'))
+    conn.execute(text(f'DROP TABLE "{old_name}"'))
+
+# Give foreign keys of an existing database the ON DELETE actions declared on the models. Deletes
+# rely on them once SQLite enforces foreign keys, so this runs on every start and does nothing once
+# the database is up to date. Rows orphaned while foreign keys were not enforced are cleaned up
+# first. SQLite cannot alter foreign keys, so affected tables are rebuilt in a single transaction;
+# other databases drop and re-add the constraints.
+def upgrade_foreign_keys(db, engine=None):
+    engine = engine or db.engine
+    if not _tables_with_outdated_foreign_keys(db, inspect(engine)):
+        return
+
+    if engine.dialect.name == 'sqlite':
+        conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            # Foreign keys must be off while tables are swapped, and renames must not
+            # rewrite references in other tables
+            conn.execute(text("PRAGMA foreign_keys=OFF"))
+            conn.execute(text("PRAGMA legacy_alter_table=ON"))
+            # Another process starting at the same time may have migrated it meanwhile
+            conn.execute(text("BEGIN IMMEDIATE"))
+            try:
+                to_migrate = _tables_with_outdated_foreign_keys(db, inspect(conn))
+                if to_migrate:
+                    _remove_all_orphans(db, conn)
+                    for table, _ in to_migrate:
+                        logging.info(f"Rebuilding {table.name} with ON DELETE actions...")
+                        _rebuild_sqlite_table(conn, table)
+                    problems = conn.execute(text("PRAGMA foreign_key_check")).all()
+                    if problems:
+                        raise RuntimeError(f"Foreign key check failed: {problems[:10]}")
+                conn.execute(text("COMMIT"))
+            except Exception:
+                conn.execute(text("ROLLBACK"))
+                raise
+        finally:
+            conn.execute(text("PRAGMA legacy_alter_table=OFF"))
+            conn.execute(text("PRAGMA foreign_keys=ON"))
+            conn.close()
+    else:
+        with engine.begin() as conn:
+            to_migrate = _tables_with_outdated_foreign_keys(db, inspect(conn))
+            _remove_all_orphans(db, conn)
+            for table, outdated in to_migrate:
+                logging.info(f"Updating foreign keys of {table.name}...")
+                for constraint, current in outdated:
+                    if current and current.get('name'):
+                        conn.execute(text(f'ALTER TABLE "{table.name}" DROP CONSTRAINT "{current["name"]}"'))
+                    conn.execute(AddConstraint(constraint))
+
+# Create indexes declared on the models that an existing database does not have yet
+def create_missing_indexes(db, engine=None):
+    engine = engine or db.engine
+    existing = _index_names(db, engine)
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+
+def _index_names(db, engine):
+    """Names of the indexes in a database, including expression indexes"""
+    if engine.dialect.name == 'sqlite':
+        # SQLAlchemy does not reflect SQLite expression indexes, such as the lower() ones
+        with engine.connect() as conn:
+            return set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+    inspector = inspect(engine)
+    return {index['name'] for table in db.metadata.sorted_tables if inspector.has_table(table.name)
+            for index in inspector.get_indexes(table.name)}
@@ -0,0 +1,118 @@
+import base64
+import json
+
+from sqlalchemy import or_, and_, func
+
+# Rows per page for list pages and list APIs
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(sort_value, row_id):
+    """Encode the sort value and ID of the last row on a page as an opaque URL-safe cursor"""
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor made by encode_cursor; returns (sort_value, row_id) or None if it is invalid"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+def list_args(args, sort_columns, default_sort):
+    """
+    Read the common list parameters from the request arguments.
+
+    Args:
+        args: request.args
+        sort_columns: Dict of allowed sort names to column expressions
+        default_sort: Sort name used when none (or an unknown one) is given
+
+    Returns:
+        Dict with q, sort, descending, cursor and limit keys
+    """
+    sort = args.get('sort', default_sort)
+    if sort not in sort_columns:
+        sort = default_sort
+    limit = args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    return {
+        'q': (args.get('q') or '').strip(),
+        'sort': sort,
+        'descending': args.get('order') == 'desc',
+        'cursor': args.get('cursor'),
+        'limit': max(1, min(limit, MAX_PAGE_SIZE))
+    }
+
+def attribute_key(attribute, index=None):
+    """
+    Build a keyset key function that reads the sort attribute and ID of a model instance.
+
+    Args:
+        attribute: Name of the attribute being sorted on (NULL values sort as '')
+        index: Position of the model instance when rows are tuples
+    """
+    def key(row):
+        obj = row[index] if index is not None else row
+        value = getattr(obj, attribute)
+        return ('' if value is None else value), obj.id
+    return key
+
+# Sorts after any character a prefix can be followed by
+PREFIX_END = chr(0x10FFFF)
+
+def prefix_filter(column, q):
+    """
+    Case-insensitive prefix match on a column, as a range on lower(column).
+
+    ILIKE (lower(column) LIKE ...) cannot use an index; a range on the same lower() expression
+    can use the lower() indexes declared on the models. The search text is lowered by the
+    database too, so both sides follow its case rules.
+    """
+    lowered = func.lower(column)
+    start = func.lower(q)
+    return and_(lowered >= start, lowered < start.concat(PREFIX_END))
+
+def keyset_page(query, sort_column, id_column, key, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    """
+    Fetch one page of a query ordered by (sort_column, id_column) using keyset pagination.
+
+    Seeks past the last row of the previous page instead of using OFFSET, so every page costs
+    the same however deep into the list it is.
+
+    Args:
+        query: Query to paginate (already filtered)
+        sort_column: Column expression to order by; must not be NULL (wrap in coalesce if needed)
+        id_column: Unique tie-breaker column
+        key: Function returning (sort_value, id) for a result row
+        cursor: Cursor returned with the previous page
+        limit: Page size
+        descending: Sort in descending order
+
+    Returns:
+        (items, next_cursor): Rows of the page and the cursor for the next one (None on the last page)
+    """
+    position = decode_cursor(cursor)
+    if position is not None:
+        sort_value, row_id = position
+        if descending:
+            query = query.filter(or_(sort_column < sort_value,
+                                     and_(sort_column == sort_value, id_column < row_id)))
+        else:
+            query = query.filter(or_(sort_column > sort_value,
+                                     and_(sort_column == sort_value, id_column > row_id)))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    items = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(*key(items[-1]))
+    return items, next_cursor
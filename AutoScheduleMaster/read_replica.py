@@ -0,0 +1,51 @@
+import os
+import time
+from contextvars import ContextVar
+
+from flask import g, request, session
+from sqlalchemy.sql.dml import UpdateBase
+from tenancy import TenantSession, current_tenant
+
+# Read-only replica of the configured database. When set, GET requests read from it and
+# everything else, including all writes, uses the primary.
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL")
+# After a client writes, its reads stay on the primary this long so it sees its own changes
+# while the replica catches up
+REPLICA_PIN_SECONDS = float(os.environ.get("REPLICA_PIN_SECONDS", "10"))
+
+REPLICA_BIND = "replica"
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_replica = ContextVar("read_replica", default=False)
+
+class RoutingSession(TenantSession):
+    """Session that reads from the replica bind during replica-routed requests"""
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and _read_replica.get() and current_tenant() is None
+                and not self._flushing and not isinstance(clause, UpdateBase)):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def init_read_replica(app):
+    """Route reads to the replica bind when one is configured (see DATABASE_REPLICA_URL)"""
+    if REPLICA_BIND not in app.config.get("SQLALCHEMY_BINDS", {}):
+        return
+
+    @app.before_request
+    def route_reads():
+        if request.method in READ_METHODS and session.get("primary_until", 0) < time.time():
+            g.replica_token = _read_replica.set(True)
+
+    @app.after_request
+    def pin_writer(response):
+        if request.method not in READ_METHODS:
+            session["primary_until"] = time.time() + REPLICA_PIN_SECONDS
+        return response
+
+    @app.teardown_request
+    def reset_reads(exc=None):
+        token = g.pop("replica_token", None)
+        if token is not None:
+            _read_replica.reset(token)
@@ -0,0 +1,40 @@
+from collections import namedtuple
+
+from models import Day, TimeSlot
+from tenancy import current_tenant
+
+# Read-only stand-ins for Day and TimeSlot rows, safe to share between requests and processes
+DayRow = namedtuple("DayRow", "id name")
+TimeSlotRow = namedtuple("TimeSlotRow", "id start_time end_time is_break")
+
+# {tenant: (days, time_slots)}. Days and time slots are only written by init_default_data, so
+# each process loads them once; when the app is preloaded (gunicorn.conf.py) that happens
+# before fork and the workers share the master's copy.
+_cache = {}
+
+def load_reference_data():
+    """Load the current tenant's days and time slots into the cache; call in an app context"""
+    days = tuple(DayRow(day.id, day.name) for day in Day.query.order_by(Day.id))
+    time_slots = tuple(TimeSlotRow(slot.id, slot.start_time, slot.end_time, slot.is_break)
+                       for slot in TimeSlot.query.order_by(TimeSlot.start_time))
+    _cache[current_tenant()] = (days, time_slots)
+    return days, time_slots
+
+def clear_reference_data():
+    """Forget the current tenant's cached rows, after init_default_data has added some"""
+    _cache.pop(current_tenant(), None)
+
+def _reference_data():
+    data = _cache.get(current_tenant())
+    return data if data is not None else load_reference_data()
+
+def get_days():
+    """Days ordered by ID"""
+    return list(_reference_data()[0])
+
+def get_time_slots(is_break=None):
+    """Time slots ordered by start time, optionally only breaks (True) or teaching periods (False)"""
+    time_slots = _reference_data()[1]
+    if is_break is None:
+        return list(time_slots)
+    return [slot for slot in time_slots if slot.is_break == is_break]
@@ -0,0 +1,76 @@
+from app import db
+from models import Room, Section, TimetableEntry
+
+ROOM_TYPES = ['lecture', 'lab']
+
+def load_rooms(day_ids, exclude_class_id=None):
+    """
+    Load rooms and their existing occupancy for the solver.
+
+    Args:
+        day_ids: Days being scheduled
+        exclude_class_id: Class being regenerated, whose current entries are ignored
+
+    Returns:
+        (rooms, room_schedule):
+        - rooms: {room_type: [(room_id, capacity), ...]} smallest first, so the first free room
+          that fits is the best fit (rooms without a capacity come last)
+        - room_schedule: {room_id: {day_id: {time_slot_id: True}}} with the periods other
+          classes already use
+    """
+    rooms = {room_type: [] for room_type in ROOM_TYPES}
+    room_schedule = {}
+    for room in Room.query.order_by(Room.capacity.is_(None), Room.capacity, Room.id):
+        rooms.setdefault(room.room_type, []).append((room.id, room.capacity))
+        room_schedule[room.id] = {day_id: {} for day_id in day_ids}
+    if not room_schedule:
+        return rooms, room_schedule
+
+    used = db.session.query(
+        TimetableEntry.room_id, TimetableEntry.day_id, TimetableEntry.time_slot_id
+    ).join(Section, TimetableEntry.section_id == Section.id).filter(
+        TimetableEntry.room_id.isnot(None)
+    )
+    if exclude_class_id is not None:
+        used = used.filter(Section.class_id != exclude_class_id)
+    for room_id, day_id, slot_id in used.distinct():
+        day_schedule = room_schedule.get(room_id, {}).get(day_id)
+        if day_schedule is not None:
+            day_schedule[slot_id] = True
+    return rooms, room_schedule
+
+def free_room(rooms, room_schedule, day_id, slot_ids, students=None, taken=()):
+    """
+    Smallest room from a sorted room list that seats `students` and is free in every slot.
+
+    Returns:
+        Room ID, or None if no room fits
+    """
+    for room_id, capacity in rooms:
+        if room_id in taken:
+            continue
+        if capacity is not None and students is not None and students > capacity:
+            continue
+        day_schedule = room_schedule[room_id][day_id]
+        if all(slot_id not in day_schedule for slot_id in slot_ids):
+            return room_id
+    return None
+
+def allocate_lab_rooms(rooms, room_schedule, day_id, slot_ids, sections):
+    """
+    Give every section its own free lab room for a lab block.
+
+    Sections are placed largest first into the smallest room that seats them, which finds an
+    allocation whenever one exists.
+
+    Returns:
+        {section_id: room_id}, or None if the sections cannot all be seated
+    """
+    allocation = {}
+    for section in sorted(sections, key=lambda section: section.student_count or 0, reverse=True):
+        room_id = free_room(rooms, room_schedule, day_id, slot_ids, section.student_count,
+                            taken=set(allocation.values()))
+        if room_id is None:
+            return None
+        allocation[section.id] = room_id
+    return allocation
@@ -1,20 +1,107 @@
-from flask import render_template, redirect, url_for, request, flash, jsonify
+import csv
+import io
+from flask import render_template, redirect, url_for, request, flash, jsonify, Response, current_app
+from sqlalchemy import func
 from app import db
-from models import User, Class, Section, Teacher, Course, CourseAssignment, TimeSlot, Day, TimetableEntry, init_default_data
-from forms import ClassForm, SectionForm, TeacherForm, CourseForm, CourseAssignmentForm, LoginForm, RegistrationForm
-from timetable_generator import generate_timetable
+from models import User, Class, Section, Teacher, Course, Room, CourseAssignment, TimetableEntry, TeacherAvailability, TeacherLoadLimit, TimetableArchive
+from forms import ClassForm, SectionForm, TeacherForm, TeacherAvailabilityForm, RoomForm, CourseForm, CourseAssignmentForm, LoginForm, RegistrationForm
+from timetable_generator import generate_timetable, LECTURE_MODES, LAB_MODES
+from capacity_check import check_capacity
+from conflict_check import find_conflicts
+from timetable_payload import compact_timetable
+from timetable_summary import refresh_class_summary, workload_report
+from timetable_archive import archive_class, archive_summary, load_archive, build_snapshot, decompress_snapshot, diff_snapshots
+from timetable_events import (publish_change, classes_using, class_event_stream, teacher_event_stream,
+                              acquire_stream, release_stream, BUSY_RETRY_SECONDS)
+from tenancy import current_tenant
+from reference_data import get_days, get_time_slots
+from bulk_import import ENTITY_KINDS, import_data, read_csv, read_json, parse_bool
+from pagination import list_args, keyset_page, attribute_key, prefix_filter
 from datetime import datetime
 from flask_login import login_user, logout_user, current_user, login_required
 
 def register_routes(app):
-    # Initialize default data (days and time slots)
-    # Using app.before_request instead of before_first_request (deprecated)
-    def setup_defaults():
-        init_default_data(db)
-    
-    # Register the setup_defaults function to run when the app starts
-    with app.app_context():
-        setup_defaults()
+    # Sort options for the management lists (nullable columns sort as '')
+    class_sorts = {'name': Class.name, 'id': Class.id}
+    teacher_sorts = {'name': Teacher.name, 'department': func.coalesce(Teacher.department, ''), 'id': Teacher.id}
+    course_sorts = {'name': Course.name, 'code': func.coalesce(Course.code, ''), 'id': Course.id}
+
+    def class_page(args):
+        """One keyset page of classes with their section counts"""
+        params = list_args(args, class_sorts, 'name')
+        query = db.session.query(
+            Class, func.count(Section.id)
+        ).outerjoin(
+            Section, Section.class_id == Class.id
+        ).group_by(Class.id)
+        if params['q']:
+            query = query.filter(prefix_filter(Class.name, params['q']))
+        items, next_cursor = keyset_page(query, class_sorts[params['sort']], Class.id,
+                                         key=attribute_key(params['sort'], index=0),
+                                         cursor=params['cursor'], limit=params['limit'],
+                                         descending=params['descending'])
+        return items, next_cursor, params
+
+    def teacher_page(args):
+        """One keyset page of teachers, filtered by name prefix and department"""
+        params = list_args(args, teacher_sorts, 'name')
+        query = Teacher.query
+        if params['q']:
+            query = query.filter(prefix_filter(Teacher.name, params['q']))
+        if args.get('department'):
+            query = query.filter(Teacher.department == args.get('department'))
+        items, next_cursor = keyset_page(query, teacher_sorts[params['sort']], Teacher.id,
+                                         key=attribute_key(params['sort']),
+                                         cursor=params['cursor'], limit=params['limit'],
+                                         descending=params['descending'])
+        return items, next_cursor, params
+
+    def course_page(args):
+        """One keyset page of courses, filtered by name or code prefix and type"""
+        params = list_args(args, course_sorts, 'name')
+        query = Course.query
+        if params['q']:
+            query = query.filter(prefix_filter(Course.name, params['q']) | prefix_filter(Course.code, params['q']))
+        if args.get('type') == 'lab':
+            query = query.filter(Course.is_lab.is_(True))
+        elif args.get('type') == 'lecture':
+            query = query.filter(Course.is_lecture.is_(True))
+        items, next_cursor = keyset_page(query, course_sorts[params['sort']], Course.id,
+                                         key=attribute_key(params['sort']),
+                                         cursor=params['cursor'], limit=params['limit'],
+                                         descending=params['descending'])
+        return items, next_cursor, params
+
+    def assignment_page(args):
+        """One keyset page of course assignments (newest first), filtered by class, teacher or course"""
+        params = list_args(args, {'id': CourseAssignment.id}, 'id')
+        if 'order' not in args:
+            params['descending'] = True
+        query = db.session.query(
+            CourseAssignment, Class, Teacher, Course
+        ).join(
+            Class, CourseAssignment.class_id == Class.id
+        ).join(
+            Teacher, CourseAssignment.teacher_id == Teacher.id
+        ).join(
+            Course, CourseAssignment.course_id == Course.id
+        )
+        for field, column in (('class_id', CourseAssignment.class_id),
+                              ('teacher_id', CourseAssignment.teacher_id),
+                              ('course_id', CourseAssignment.course_id)):
+            value = args.get(field, type=int)
+            if value:
+                query = query.filter(column == value)
+        items, next_cursor = keyset_page(query, CourseAssignment.id, CourseAssignment.id,
+                                         key=attribute_key('id', index=0),
+                                         cursor=params['cursor'], limit=params['limit'],
+                                         descending=params['descending'])
+        return items, next_cursor, params
+
+    def selected_choice(model, value, label):
+        """Choice list holding only the submitted option, so a SelectField can validate it"""
+        obj = db.session.get(model, value) if value else None
+        return [(obj.id, label(obj))] if obj else []
 
     # Authentication routes
     @app.route('/login', methods=['GET', 'POST'])
@@ -98,9 +185,10 @@ def register_routes(app):
             flash(f'Class {form.name.data} added successfully!', 'success')
             return redirect(url_for('classes'))
         
-        classes = Class.query.all()
+        classes, next_cursor, list_params = class_page(request.args)
         now = datetime.now()
-        return render_template('classes.html', classes=classes, form=form, now=now)
+        return render_template('classes.html', classes=classes, form=form,
+                              next_cursor=next_cursor, list_params=list_params, now=now)
 
     @app.route('/classes/<int:class_id>/delete', methods=['POST'])
     @login_required
@@ -126,7 +214,10 @@ def register_routes(app):
                 new_section = Section()
                 new_section.name = form.name.data
                 new_section.class_id = class_id
+                new_section.student_count = form.student_count.data
                 db.session.add(new_section)
+                # The new section adds to the class's available and required periods
+                refresh_class_summary(class_id)
                 db.session.commit()
                 flash(f'Section {form.name.data} added to {class_obj.name}!', 'success')
             return redirect(url_for('sections', class_id=class_id))
@@ -146,6 +237,8 @@ def register_routes(app):
         section = Section.query.get_or_404(section_id)
         class_id = section.class_id
         db.session.delete(section)
+        refresh_class_summary(class_id)
+        publish_change(class_id)
         db.session.commit()
         flash(f'Section {section.name} deleted successfully!', 'success')
         return redirect(url_for('sections', class_id=class_id))
@@ -166,19 +259,155 @@ def register_routes(app):
             flash(f'Teacher {form.name.data} added successfully!', 'success')
             return redirect(url_for('teachers'))
         
-        teachers = Teacher.query.all()
+        teachers, next_cursor, list_params = teacher_page(request.args)
         now = datetime.now()
-        return render_template('teachers.html', teachers=teachers, form=form, now=now)
+        return render_template('teachers.html', teachers=teachers, form=form,
+                              next_cursor=next_cursor, list_params=list_params, now=now)
 
     @app.route('/teachers/<int:teacher_id>/delete', methods=['POST'])
     @login_required
     def delete_teacher(teacher_id):
         teacher = Teacher.query.get_or_404(teacher_id)
+        class_ids = classes_using(teacher_id=teacher_id)
+        for class_id in class_ids:
+            publish_change(class_id)
+        # Deleting the teacher also deletes their course assignments
+        assigned_class_ids = {assignment.class_id for assignment in teacher.course_assignments}
         db.session.delete(teacher)
+        # The teacher's periods become empty slots
+        db.session.flush()
+        for class_id in set(class_ids) | assigned_class_ids:
+            refresh_class_summary(class_id)
         db.session.commit()
         flash(f'Teacher {teacher.name} deleted successfully!', 'success')
         return redirect(url_for('teachers'))
 
+    @app.route('/teachers/<int:teacher_id>/availability', methods=['GET', 'POST'])
+    @login_required
+    def teacher_availability(teacher_id):
+        teacher = Teacher.query.get_or_404(teacher_id)
+        form = TeacherAvailabilityForm(obj=teacher.load_limit)
+        days = get_days()
+        time_slots = get_time_slots()
+        
+        if form.validate_on_submit():
+            day_ids = {day.id for day in days}
+            slot_ids = {slot.id for slot in time_slots if not slot.is_break}
+            blocked_days = {int(value) for value in request.form.getlist('blocked_day')
+                            if value.isdigit() and int(value) in day_ids}
+            blocked_slots = set()
+            for value in request.form.getlist('blocked'):
+                day_id, _, slot_id = value.partition('-')
+                if day_id.isdigit() and slot_id.isdigit():
+                    if int(day_id) in day_ids and int(day_id) not in blocked_days and int(slot_id) in slot_ids:
+                        blocked_slots.add((int(day_id), int(slot_id)))
+            
+            # Replace the teacher's availability and limits in one transaction
+            TeacherAvailability.query.filter_by(teacher_id=teacher_id).delete(synchronize_session=False)
+            for day_id, slot_id in [(day_id, None) for day_id in sorted(blocked_days)] + sorted(blocked_slots):
+                unavailable = TeacherAvailability()
+                unavailable.teacher_id = teacher_id
+                unavailable.day_id = day_id
+                unavailable.time_slot_id = slot_id
+                db.session.add(unavailable)
+            
+            if form.max_periods_per_day.data is None and form.max_periods_per_week.data is None:
+                if teacher.load_limit:
+                    db.session.delete(teacher.load_limit)
+            else:
+                limit = teacher.load_limit
+                if limit is None:
+                    limit = TeacherLoadLimit()
+                    limit.teacher_id = teacher_id
+                limit.max_periods_per_day = form.max_periods_per_day.data
+                limit.max_periods_per_week = form.max_periods_per_week.data
+                db.session.add(limit)
+            
+            db.session.commit()
+            flash(f'Availability for {teacher.name} saved!', 'success')
+            return redirect(url_for('teacher_availability', teacher_id=teacher_id))
+        
+        rows = TeacherAvailability.query.filter_by(teacher_id=teacher_id).all()
+        blocked_days = {row.day_id for row in rows if row.time_slot_id is None}
+        blocked_slots = {(row.day_id, row.time_slot_id) for row in rows if row.time_slot_id is not None}
+        now = datetime.now()
+        return render_template('teacher_availability.html',
+                              teacher=teacher,
+                              form=form,
+                              days=days,
+                              time_slots=time_slots,
+                              blocked_days=blocked_days,
+                              blocked_slots=blocked_slots,
+                              now=now)
+
+    # Room routes
+    @app.route('/rooms', methods=['GET', 'POST'])
+    @login_required
+    def rooms():
+        form = RoomForm()
+        if form.validate_on_submit():
+            if Room.query.filter_by(name=form.name.data).first():
+                flash(f'Room {form.name.data} already exists!', 'danger')
+            else:
+                new_room = Room()
+                new_room.name = form.name.data
+                new_room.room_type = form.room_type.data
+                new_room.capacity = form.capacity.data
+                db.session.add(new_room)
+                db.session.commit()
+                flash(f'Room {form.name.data} added successfully!', 'success')
+            return redirect(url_for('rooms'))
+        
+        rooms = Room.query.order_by(Room.room_type, Room.name).all()
+        now = datetime.now()
+        return render_template('rooms.html', rooms=rooms, form=form, now=now)
+
+    @app.route('/rooms/<int:room_id>/delete', methods=['POST'])
+    @login_required
+    def delete_room(room_id):
+        room = Room.query.get_or_404(room_id)
+        for class_id in classes_using(room_id=room_id):
+            publish_change(class_id)
+        db.session.delete(room)
+        db.session.commit()
+        flash(f'Room {room.name} deleted successfully!', 'success')
+        return redirect(url_for('rooms'))
+
+    @app.route('/rooms/<int:room_id>/timetable', methods=['GET'])
+    @login_required
+    def room_timetable(room_id):
+        room = Room.query.get_or_404(room_id)
+        days = get_days()
+        time_slots = get_time_slots()
+        
+        # One query for the room's entries; sections sharing a period are listed together
+        rows = db.session.query(
+            TimetableEntry.day_id, TimetableEntry.time_slot_id, Class.name, Section.name, Course.name, Teacher.name
+        ).join(
+            Section, TimetableEntry.section_id == Section.id
+        ).join(
+            Class, Section.class_id == Class.id
+        ).outerjoin(
+            Course, TimetableEntry.course_id == Course.id
+        ).outerjoin(
+            Teacher, TimetableEntry.teacher_id == Teacher.id
+        ).filter(
+            TimetableEntry.room_id == room_id
+        ).order_by(Class.name, Section.name).all()
+        
+        occupancy = {}  # {(day_id, time_slot_id): {(class, course, teacher): [section names]}}
+        for day_id, slot_id, class_name, section_name, course_name, teacher_name in rows:
+            cell = occupancy.setdefault((day_id, slot_id), {})
+            cell.setdefault((class_name, course_name, teacher_name or 'N/A'), []).append(section_name)
+        
+        now = datetime.now()
+        return render_template('room_timetable.html',
+                              room=room,
+                              days=days,
+                              time_slots=time_slots,
+                              occupancy=occupancy,
+                              now=now)
+
     # Course routes
     @app.route('/courses', methods=['GET', 'POST'])
     @login_required
@@ -205,24 +434,35 @@ def register_routes(app):
             # Ensure at least one type is selected
             if not (new_course.is_lab or new_course.is_lecture):
                 flash('Please select at least one course type (Lab or Lecture)', 'danger')
-                courses = Course.query.all()
+                courses, next_cursor, list_params = course_page(request.args)
                 now = datetime.now()
-                return render_template('courses.html', courses=courses, form=form, now=now)
+                return render_template('courses.html', courses=courses, form=form,
+                                      next_cursor=next_cursor, list_params=list_params, now=now)
             
             db.session.add(new_course)
             db.session.commit()
             flash(f'Course {form.name.data} added successfully!', 'success')
             return redirect(url_for('courses'))
         
-        courses = Course.query.all()
+        courses, next_cursor, list_params = course_page(request.args)
         now = datetime.now()
-        return render_template('courses.html', courses=courses, form=form, now=now)
+        return render_template('courses.html', courses=courses, form=form,
+                              next_cursor=next_cursor, list_params=list_params, now=now)
 
     @app.route('/courses/<int:course_id>/delete', methods=['POST'])
     @login_required
     def delete_course(course_id):
         course = Course.query.get_or_404(course_id)
+        class_ids = classes_using(course_id=course_id)
+        for class_id in class_ids:
+            publish_change(class_id)
+        # Deleting the course also deletes its assignments
+        assigned_class_ids = {assignment.class_id for assignment in course.course_assignments}
         db.session.delete(course)
+        # The course's periods become empty slots
+        db.session.flush()
+        for class_id in set(class_ids) | assigned_class_ids:
+            refresh_class_summary(class_id)
         db.session.commit()
         flash(f'Course {course.name} deleted successfully!', 'success')
         return redirect(url_for('courses'))
@@ -232,10 +472,10 @@ def register_routes(app):
     @login_required
     def assign_courses():
         form = CourseAssignmentForm()
-        # Populate form choices
-        form.class_id.choices = [(c.id, c.name) for c in Class.query.all()]
-        form.teacher_id.choices = [(t.id, t.name) for t in Teacher.query.all()]
-        form.course_id.choices = [(c.id, f"{c.name} ({c.code})") for c in Course.query.all()]
+        # Only the submitted options are loaded here; the page fetches the rest on demand
+        form.class_id.choices = selected_choice(Class, form.class_id.data, lambda c: c.name)
+        form.teacher_id.choices = selected_choice(Teacher, form.teacher_id.data, lambda t: t.name)
+        form.course_id.choices = selected_choice(Course, form.course_id.data, lambda c: f"{c.name} ({c.code})")
         
         if form.validate_on_submit():
             course = Course.query.get(form.course_id.data)
@@ -274,26 +514,21 @@ def register_routes(app):
                     new_lab_assignment.course_id = form.course_id.data
                     db.session.add(new_lab_assignment)
             
+            refresh_class_summary(form.class_id.data)
             db.session.commit()
             flash('Course assignment(s) added successfully!', 'success')
             return redirect(url_for('assign_courses'))
         
-        # Get all existing assignments
-        assignments = db.session.query(
-            CourseAssignment, Class, Teacher, Course
-        ).join(
-            Class, CourseAssignment.class_id == Class.id
-        ).join(
-            Teacher, CourseAssignment.teacher_id == Teacher.id
-        ).join(
-            Course, CourseAssignment.course_id == Course.id
-        ).all()
+        # Get one page of existing assignments
+        assignments, next_cursor, list_params = assignment_page(request.args)
         
         now = datetime.now()
         return render_template('courses.html', 
                               form=form, 
                               assignments=assignments,
                               assignment_view=True,
+                              next_cursor=next_cursor,
+                              list_params=list_params,
                               now=now)
 
     @app.route('/assignments/<int:assignment_id>/delete', methods=['POST'])
@@ -301,10 +536,41 @@ def register_routes(app):
     def delete_assignment(assignment_id):
         assignment = CourseAssignment.query.get_or_404(assignment_id)
         db.session.delete(assignment)
+        refresh_class_summary(assignment.class_id)
         db.session.commit()
         flash('Course assignment deleted successfully!', 'success')
         return redirect(url_for('assign_courses'))
 
+    @app.route('/import', methods=['POST'])
+    @login_required
+    def bulk_import():
+        """Bulk import from a JSON body, an uploaded JSON file or one uploaded CSV file per entity type"""
+        try:
+            dry_run = parse_bool(request.values.get('dry_run'))
+        except ValueError as e:
+            return jsonify({'valid': False, 'errors': [f"Invalid dry_run: {str(e)}"]}), 400
+        try:
+            if request.is_json:
+                data = request.get_json()
+                if not isinstance(data, dict):
+                    raise ValueError("JSON import must be an object keyed by entity type")
+            else:
+                data = {}
+                if 'file' in request.files:
+                    data.update(read_json(request.files['file'].stream))
+                for kind in ENTITY_KINDS:
+                    if kind in request.files:
+                        stream = io.TextIOWrapper(request.files[kind].stream, encoding='utf-8-sig', newline='')
+                        data[kind] = read_csv(stream)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return jsonify({'valid': False, 'errors': [f"Could not read import: {str(e)}"]}), 400
+        
+        if not data:
+            return jsonify({'valid': False, 'errors': ['No import data provided']}), 400
+        
+        report = import_data(data, dry_run=dry_run)
+        return jsonify(report), (200 if report['valid'] else 400)
+
     # Timetable generation routes
     @app.route('/timetable', methods=['GET'])
     @login_required
@@ -316,7 +582,6 @@ def register_routes(app):
     @app.route('/generate-timetable/<int:class_id>', methods=['POST'])
     @login_required
     def generate_timetable_for_class(class_id):
-        # Clear existing timetable entries for this class
         class_obj = Class.query.get_or_404(class_id)
         sections = Section.query.filter_by(class_id=class_id).all()
         
@@ -324,137 +589,74 @@ def register_routes(app):
             flash(f'No sections found for {class_obj.name}. Add sections first.', 'danger')
             return redirect(url_for('timetable'))
         
-        section_ids = [section.id for section in sections]
-        existing_entries = TimetableEntry.query.filter(TimetableEntry.section_id.in_(section_ids)).all()
+        # Run the optional local-search pass when requested
+        optimize_seconds = app.config['TIMETABLE_OPTIMIZE_SECONDS'] if request.form.get('optimize') else 0
         
-        for entry in existing_entries:
-            db.session.delete(entry)
-        db.session.commit()
+        # A seed from a preview reproduces the previewed timetable
+        seed = request.form.get('seed', type=int)
         
-        # Generate the timetable
-        success, message = generate_timetable(class_id)
+        # The chosen lecture and lab modes are saved with the timetable they generate
+        lecture_mode = request.form.get('lecture_mode')
+        if lecture_mode in LECTURE_MODES:
+            class_obj.lecture_mode = lecture_mode
+        lab_mode = request.form.get('lab_mode')
+        if lab_mode in LAB_MODES:
+            class_obj.lab_mode = lab_mode
+        
+        # Generate the timetable (replaces the existing entries in one transaction)
+        success, message = generate_timetable(class_id, optimize_seconds=optimize_seconds, seed=seed)
         
         if success:
             flash(f'Timetable for {class_obj.name} generated successfully!', 'success')
+            if lab_mode == 'rotation' and class_obj.lab_mode != 'rotation':
+                flash('Rotating labs would leave more hours unplaced for this class, so its labs are '
+                      'common to all sections.', 'info')
         else:
             flash(f'Failed to generate timetable: {message}', 'danger')
         
         return redirect(url_for('view_timetable', class_id=class_id))
 
+    @app.route('/api/timetable/<int:class_id>/preview', methods=['POST'])
+    @login_required
+    def api_timetable_preview(class_id):
+        """API endpoint to solve a class's timetable in memory and diff it against the published one"""
+        Class.query.get_or_404(class_id)
+        optimize_seconds = app.config['TIMETABLE_OPTIMIZE_SECONDS'] if request.values.get('optimize') else 0
+        seed = request.values.get('seed', type=int)
+        lecture_mode = request.values.get('lecture_mode') or None
+        lab_mode = request.values.get('lab_mode') or None
+        
+        success, result = generate_timetable(class_id, optimize_seconds=optimize_seconds, dry_run=True, seed=seed,
+                                             lecture_mode=lecture_mode, lab_mode=lab_mode)
+        if not success:
+            return jsonify({'error': result}), 400
+        return jsonify(result)
+
     @app.route('/view-timetable/<int:class_id>', methods=['GET'])
     @login_required
     def view_timetable(class_id):
         class_obj = Class.query.get_or_404(class_id)
-        sections = Section.query.filter_by(class_id=class_id).all()
-        days = Day.query.order_by(Day.id).all()
-        time_slots = TimeSlot.query.order_by(TimeSlot.start_time).all()
+        sections = Section.query.filter_by(class_id=class_id).order_by(Section.id).all()
         
-        # Build the timetable data for each section
-        section_timetables = {}
-        
-        for section in sections:
-            timetable_data = {}
-            
-            for day in days:
-                timetable_data[day.id] = {}
-                
-                for slot in time_slots:
-                    # Find the timetable entry for this day and time slot
-                    entry = TimetableEntry.query.filter_by(
-                        section_id=section.id,
-                        day_id=day.id,
-                        time_slot_id=slot.id
-                    ).first()
-                    
-                    if entry and entry.course:
-                        timetable_data[day.id][slot.id] = {
-                            'course': entry.course.name,
-                            'course_code': entry.course.code,
-                            'teacher': entry.teacher.name if entry.teacher else 'N/A',
-                            'is_lab': entry.course.is_lab,
-                            'is_lecture': entry.course.is_lecture
-                        }
-                    else:
-                        timetable_data[day.id][slot.id] = None
-            
-            section_timetables[section.id] = timetable_data
-        
-        # Create a consolidated class timetable that shows both the common lectures and the section-specific labs
-        consolidated_timetable = {}
-        
-        # Initialize the consolidated timetable structure
-        for day in days:
-            consolidated_timetable[day.id] = {}
-            for slot in time_slots:
-                consolidated_timetable[day.id][slot.id] = {
-                    'common': None,  # For lectures and other common entries
-                    'sections': {}   # For section-specific entries like labs
-                }
-                
-                # Check if there's a common entry for all sections at this time slot
-                is_common_entry = True
-                reference_entry = None
-                
-                # Find entries for all sections at this time slot
-                for section in sections:
-                    entry = TimetableEntry.query.filter_by(
-                        section_id=section.id,
-                        day_id=day.id,
-                        time_slot_id=slot.id
-                    ).first()
-                    
-                    if not entry or not entry.course:
-                        is_common_entry = False
-                        break
-                    
-                    if not reference_entry:
-                        reference_entry = entry
-                    elif (entry.course_id != reference_entry.course_id or 
-                          entry.teacher_id != reference_entry.teacher_id):
-                        is_common_entry = False
-                        
-                # If it's a common entry (like lecture), store it in the common field
-                if is_common_entry and reference_entry and reference_entry.course.is_lecture:
-                    consolidated_timetable[day.id][slot.id]['common'] = {
-                        'course': reference_entry.course.name,
-                        'course_code': reference_entry.course.code,
-                        'teacher': reference_entry.teacher.name if reference_entry.teacher else 'N/A',
-                        'is_lecture': True
-                    }
-                else:
-                    # Store section-specific entries (like labs) in the sections field
-                    for section in sections:
-                        entry = TimetableEntry.query.filter_by(
-                            section_id=section.id,
-                            day_id=day.id,
-                            time_slot_id=slot.id
-                        ).first()
-                        
-                        if entry and entry.course and entry.course.is_lab:
-                            consolidated_timetable[day.id][slot.id]['sections'][section.id] = {
-                                'course': entry.course.name,
-                                'course_code': entry.course.code,
-                                'teacher': entry.teacher.name if entry.teacher else 'N/A',
-                                'is_lab': True
-                            }
-                        
+        # The tables are rendered in the browser from the compact payload
+        timetable_data = compact_timetable(class_id)
         now = datetime.now()    
         return render_template('timetable_view.html',
                               class_obj=class_obj,
                               sections=sections,
-                              days=days,
-                              time_slots=time_slots,
-                              section_timetables=section_timetables,
-                              consolidated_timetable=consolidated_timetable,
+                              timetable_data=timetable_data,
                               now=now)
 
     @app.route('/api/timetable/<int:class_id>', methods=['GET'])
     def api_timetable(class_id):
-        """API endpoint to get timetable data for a class in JSON format"""
+        """API endpoint to get timetable data for a class in JSON format (?format=compact for the compact payload)"""
+        if request.args.get('format') == 'compact':
+            return jsonify(compact_timetable(class_id))
+        
         class_obj = Class.query.get_or_404(class_id)
         sections = Section.query.filter_by(class_id=class_id).all()
-        days = Day.query.order_by(Day.id).all()
-        time_slots = TimeSlot.query.order_by(TimeSlot.start_time).all()
+        days = get_days()
+        time_slots = get_time_slots()
         
         # Build the response data
         response = {
@@ -505,4 +707,197 @@ def register_routes(app):
         
         return jsonify(response)
 
+    @app.route('/api/classes', methods=['GET'])
+    @login_required
+    def api_classes():
+        """API endpoint to list classes one keyset page at a time"""
+        items, next_cursor, _ = class_page(request.args)
+        return jsonify({
+            'items': [{'id': c.id, 'name': c.name, 'label': c.name, 'sections': section_count}
+                      for c, section_count in items],
+            'next_cursor': next_cursor
+        })
+
+    @app.route('/api/teachers', methods=['GET'])
+    @login_required
+    def api_teachers():
+        """API endpoint to list teachers one keyset page at a time"""
+        items, next_cursor, _ = teacher_page(request.args)
+        return jsonify({
+            'items': [{'id': t.id, 'name': t.name, 'label': t.name, 'email': t.email, 'department': t.department}
+                      for t in items],
+            'next_cursor': next_cursor
+        })
+
+    @app.route('/api/courses', methods=['GET'])
+    @login_required
+    def api_courses():
+        """API endpoint to list courses one keyset page at a time"""
+        items, next_cursor, _ = course_page(request.args)
+        return jsonify({
+            'items': [{
+                'id': c.id,
+                'name': c.name,
+                'label': f"{c.name} ({c.code})",
+                'code': c.code,
+                'is_lab': c.is_lab,
+                'is_lecture': c.is_lecture,
+                'lab_hours': c.lab_hours,
+                'lecture_hours': c.lecture_hours
+            } for c in items],
+            'next_cursor': next_cursor
+        })
+
+    @app.route('/api/assignments', methods=['GET'])
+    @login_required
+    def api_assignments():
+        """API endpoint to list course assignments one keyset page at a time"""
+        items, next_cursor, _ = assignment_page(request.args)
+        return jsonify({
+            'items': [{
+                'id': assignment.id,
+                'class_id': class_obj.id,
+                'class_name': class_obj.name,
+                'teacher_id': teacher.id,
+                'teacher_name': teacher.name,
+                'course_id': course.id,
+                'course_name': course.name
+            } for assignment, class_obj, teacher, course in items],
+            'next_cursor': next_cursor
+        })
+
+    @app.route('/api/capacity', methods=['GET'])
+    @app.route('/api/capacity/<int:class_id>', methods=['GET'])
+    @login_required
+    def api_capacity(class_id=None):
+        """API endpoint to check whether assigned hours fit in the week"""
+        if class_id is not None:
+            Class.query.get_or_404(class_id)
+        problems = check_capacity(class_id)
+        return jsonify({
+            'feasible': not problems,
+            'problems': problems
+        })
+
+    @app.route('/api/conflicts', methods=['GET'])
+    @login_required
+    def api_conflicts():
+        """API endpoint to find teacher clashes, section clashes and unplaced hours"""
+        class_id = request.args.get('class_id', type=int)
+        teacher_id = request.args.get('teacher_id', type=int)
+        return jsonify(find_conflicts(class_id=class_id, teacher_id=teacher_id))
+
+    @app.route('/api/archives', methods=['GET'])
+    @login_required
+    def api_archives():
+        """API endpoint to list archived timetables (newest first), filtered by class or term"""
+        params = list_args(request.args, {'id': TimetableArchive.id}, 'id')
+        query = TimetableArchive.query
+        class_id = request.args.get('class_id', type=int)
+        if class_id:
+            query = query.filter(TimetableArchive.class_id == class_id)
+        if request.args.get('term'):
+            query = query.filter(TimetableArchive.term == request.args.get('term'))
+        items, next_cursor = keyset_page(query, TimetableArchive.id, TimetableArchive.id,
+                                         key=attribute_key('id'),
+                                         cursor=params['cursor'], limit=params['limit'],
+                                         descending=request.args.get('order') != 'asc')
+        return jsonify({
+            'items': [archive_summary(archive) for archive in items],
+            'next_cursor': next_cursor
+        })
+
+    @app.route('/api/archives', methods=['POST'])
+    @login_required
+    def api_archive_timetables():
+        """API endpoint to archive the published timetable of one class (class_id) or all classes under a term"""
+        term = (request.values.get('term') or '').strip() or None
+        class_id = request.values.get('class_id', type=int)
+        if class_id:
+            Class.query.get_or_404(class_id)
+            class_ids = [class_id]
+        else:
+            class_ids = [c.id for c in Class.query.order_by(Class.id)]
+        archives = [archive for archive in (archive_class(cid, term=term) for cid in class_ids) if archive]
+        db.session.commit()
+        return jsonify({'items': [archive_summary(archive) for archive in archives]}), 201
+
+    @app.route('/api/archives/<int:archive_id>', methods=['GET'])
+    @login_required
+    def api_archive(archive_id):
+        """API endpoint to get an archived timetable with the names it uses"""
+        return jsonify(load_archive(TimetableArchive.query.get_or_404(archive_id)))
+
+    @app.route('/api/archives/<int:archive_id>/diff', methods=['GET'])
+    @login_required
+    def api_archive_diff(archive_id):
+        """API endpoint to diff an archived timetable against a later one (?against=<id>) or the published one"""
+        archive = TimetableArchive.query.get_or_404(archive_id)
+        against = request.args.get('against', type=int)
+        if against:
+            other = TimetableArchive.query.get_or_404(against)
+            new = decompress_snapshot(other.data)
+            target = archive_summary(other)
+        elif archive.class_id is not None:
+            new = build_snapshot(archive.class_id)
+            target = 'current'
+        else:
+            return jsonify({'error': 'The archived class no longer exists; pass ?against=<archive id>'}), 400
+        diff = diff_snapshots(decompress_snapshot(archive.data), new)
+        return jsonify(dict(diff, archive=archive_summary(archive), against=target))
+
+    @app.route('/reports', methods=['GET'])
+    @login_required
+    def reports():
+        class_id = request.args.get('class_id', type=int)
+        report = workload_report(class_id=class_id)
+        classes = Class.query.order_by(Class.name).all()
+        now = datetime.now()
+        return render_template('reports.html', report=report, classes=classes, class_id=class_id, now=now)
+
+    @app.route('/api/reports', methods=['GET'])
+    @login_required
+    def api_reports():
+        """API endpoint to get teacher loads, class fill and course placement from the summary tables"""
+        class_id = request.args.get('class_id', type=int)
+        teacher_id = request.args.get('teacher_id', type=int)
+        return jsonify(workload_report(class_id=class_id, teacher_id=teacher_id))
+
+    def event_stream_response(stream):
+        """
+        Open a Server-Sent Events stream if this worker has a free stream slot.
+
+        At the limit the client gets a 503 with Retry-After and subscribes again later; the slot
+        is given back when the response is closed, i.e. when the client disconnects.
+        """
+        if not acquire_stream():
+            response = jsonify({'error': 'Too many open timetable streams, try again later'})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(BUSY_RETRY_SECONDS)
+            return response
+        # Unbuffered so each event reaches the client (and any proxy) as soon as it is sent
+        response = Response(stream, mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        response.call_on_close(release_stream)
+        return response
+
+    @app.route('/api/timetable/<int:class_id>/events', methods=['GET'])
+    @login_required
+    def api_timetable_events(class_id):
+        """Server-Sent Events stream pushing changes to a class's timetable"""
+        Class.query.get_or_404(class_id)
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        return event_stream_response(
+            class_event_stream(current_app._get_current_object(), class_id, last_event_id, tenant=current_tenant()))
+
+    @app.route('/api/teacher/<int:teacher_id>/events', methods=['GET'])
+    @login_required
+    def api_teacher_events(teacher_id):
+        """Server-Sent Events stream pushing changes to a teacher's timetable"""
+        Teacher.query.get_or_404(teacher_id)
+        return event_stream_response(
+            teacher_event_stream(current_app._get_current_object(), teacher_id, tenant=current_tenant()))
+
     return app
@@ -0,0 +1,58 @@
+import os
+import sqlite3
+
+from sqlalchemy.engine import make_url
+
+# Connection-level settings for file-backed SQLite databases. WAL lets readers keep reading while
+# one writer commits; NORMAL sync is durable across application crashes in WAL mode; the busy
+# timeout makes writers wait for the lock instead of failing with "database is locked".
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == "sqlite"
+
+def is_sqlite_memory(uri):
+    url = make_url(uri)
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+def sqlite_engine_options(uri):
+    """
+    Engine options for SQLite.
+
+    File databases keep a small pool of long-lived connections (SQLite connections are cheap
+    to keep and their page cache is per connection), so recycling and pre-ping are not needed.
+    In-memory databases keep SQLAlchemy's default single-connection pool.
+    """
+    if is_sqlite_memory(uri):
+        return {}
+    return {
+        "pool_size": int(os.environ.get("SQLITE_POOL_SIZE", "5")),
+        "max_overflow": int(os.environ.get("SQLITE_MAX_OVERFLOW", "10")),
+        "pool_timeout": 30,
+        "connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+    }
+
+def configure_sqlite_connection(dbapi_connection):
+    """Apply the SQLite pragmas to a new DBAPI connection"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    # SQLite only enforces foreign keys (and ON DELETE actions) when asked to on each connection
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+
+    # WAL, mmap and cache sizing only make sense for a database file
+    file_backed = any(row[2] for row in cursor.execute("PRAGMA database_list") if row[1] == "main")
+    if file_backed:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        # Negative values are in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
@@ -27,8 +27,44 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize all popovers
     const popoverTriggerList = document.querySelectorAll('[data-bs-toggle="popover"]');
     const popoverList = [...popoverTriggerList].map(popoverTriggerEl => new bootstrap.Popover(popoverTriggerEl));
+
+    // Initialize typeahead search boxes for large select lists
+    document.querySelectorAll('.typeahead').forEach(initTypeahead);
 });
 
+// Load the options of a select on demand from a list API as the user types
+function initTypeahead(input) {
+    const select = document.getElementById(input.dataset.target);
+    const source = input.dataset.source;
+    let timer = null;
+
+    function loadOptions() {
+        const selected = select.value;
+        fetch(`${source}?q=${encodeURIComponent(input.value.trim())}&limit=20`)
+            .then(response => response.json())
+            .then(data => {
+                const keep = [...select.options].find(option => option.value === selected && selected !== '');
+                select.innerHTML = '';
+                if (keep && !data.items.some(item => String(item.id) === selected)) {
+                    select.appendChild(keep);
+                }
+                data.items.forEach(item => {
+                    const option = document.createElement('option');
+                    option.value = item.id;
+                    option.textContent = item.label;
+                    option.selected = String(item.id) === selected;
+                    select.appendChild(option);
+                });
+            });
+    }
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(loadOptions, 250);
+    });
+    loadOptions();
+}
+
 // Confirm delete operation
 function confirmDelete(formId, entityName) {
     if (confirm(`Are you sure you want to delete this ${entityName}? This action cannot be undone.`)) {
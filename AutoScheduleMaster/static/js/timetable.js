@@ -36,6 +36,72 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Add event listener to the Check Conflicts button
+    const conflictsBtn = document.getElementById('check-conflicts');
+    if (conflictsBtn) {
+        conflictsBtn.addEventListener('click', function() {
+            const classId = this.dataset.classId;
+            fetch(`/api/conflicts?class_id=${classId}`)
+                .then(response => response.json())
+                .then(data => showConflictDetails(data.messages))
+                .catch(error => alert(`Could not check conflicts: ${error}`));
+        });
+    }
+
+    // Add event listener to the Preview button
+    const previewBtn = document.getElementById('preview-timetable');
+    if (previewBtn) {
+        previewBtn.addEventListener('click', function() {
+            const body = new URLSearchParams();
+            ['lecture-mode', 'lab-mode'].forEach(id => {
+                const select = document.getElementById(id);
+                if (select) {
+                    body.set(select.name, select.value);
+                }
+            });
+            fetch(this.dataset.previewUrl, { method: 'POST', body: body })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.error) {
+                        alert(data.error);
+                    } else {
+                        showPreviewDetails(data);
+                    }
+                })
+                .catch(error => alert(`Could not preview the timetable: ${error}`));
+        });
+    }
+
+    // Render the timetable tables from the compact payload embedded in the page
+    const dataElement = document.getElementById('timetable-data');
+    if (dataElement) {
+        const timetable = JSON.parse(dataElement.textContent);
+        renderTimetables(timetable);
+
+        // Subscribe to pushed timetable changes, starting from the version rendered above
+        const updatedAlert = document.getElementById('timetable-updated');
+        if (updatedAlert && window.EventSource) {
+            const subscribe = function() {
+                const events = new EventSource(`${updatedAlert.dataset.eventsUrl}?last_event_id=${timetable.version}`);
+                ['change', 'snapshot'].forEach(name => {
+                    events.addEventListener(name, function(e) {
+                        applyTimetableChanges(timetable, JSON.parse(e.data), name === 'snapshot');
+                        renderTimetables(timetable);
+                        updatedAlert.classList.remove('d-none');
+                    });
+                });
+                // EventSource gives up when the server refuses the stream (e.g. 503 when the
+                // server's streams are all in use); subscribe again a little later
+                events.addEventListener('error', function() {
+                    if (events.readyState === EventSource.CLOSED) {
+                        setTimeout(subscribe, 30000 + Math.random() * 30000);
+                    }
+                });
+            };
+            subscribe();
+        }
+    }
+
     // Add event listener to tab changes to ensure timetable is properly rendered
     const timetableTabs = document.querySelectorAll('a[data-bs-toggle="tab"]');
     timetableTabs.forEach(function(tab) {
@@ -47,82 +113,27 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
-// Function to export the timetable as PDF
+// Function to export the timetable as PDF through the browser's print dialog ("Save as PDF")
 function exportTimetableToPDF() {
-    // Get the class ID and name
-    const classSelect = document.getElementById('class-select');
-    const classId = classSelect.value;
-    const className = classSelect.options[classSelect.selectedIndex].text;
-    
-    if (!classId) {
-        alert('Please select a class first');
-        return;
-    }
-    
-    // Create a new jsPDF instance
-    const { jsPDF } = window.jspdf;
-    const doc = new jsPDF('landscape', 'mm', 'a4');
+    const exportBtn = document.getElementById('export-pdf');
+    const className = exportBtn.getAttribute('data-class-name');
     
-    // Set document properties
-    doc.setProperties({
-        title: `Timetable for ${className}`,
-        subject: 'School Timetable',
-        author: 'Timetable Generator',
-        keywords: 'timetable, schedule, school'
+    // Label each tab pane with its tab, since the print stylesheet shows all of them
+    document.querySelectorAll('.nav-link[data-bs-toggle="tab"]').forEach(tab => {
+        const pane = document.getElementById(tab.getAttribute('href').substring(1));
+        if (pane) {
+            pane.setAttribute('data-print-title', `Timetable for ${className} - ${tab.textContent.trim()}`);
+        }
     });
     
-    // Add the document title
-    doc.setFontSize(16);
-    doc.text(`Timetable for ${className}`, 15, 15);
-    
-    // Get all section tabs
-    const sectionTabs = document.querySelectorAll('.nav-link[data-bs-toggle="tab"]');
-    let yOffset = 25;
+    // Browsers suggest the document title as the PDF file name
+    const originalTitle = document.title;
+    document.title = `timetable_${className.replace(/\s+/g, '_')}`;
+    window.addEventListener('afterprint', function() {
+        document.title = originalTitle;
+    }, { once: true });
     
-    // For each section, add its timetable to the PDF
-    sectionTabs.forEach((tab, index) => {
-        const sectionId = tab.getAttribute('href').substring(1);
-        const sectionName = tab.textContent.trim();
-        const timetableElement = document.getElementById(sectionId);
-        
-        // Add a new page if this is not the first section
-        if (index > 0) {
-            doc.addPage();
-            doc.setFontSize(16);
-            doc.text(`Timetable for ${className} - Section ${sectionName}`, 15, 15);
-            yOffset = 25;
-        } else {
-            // Add section title for the first section on the first page
-            doc.setFontSize(14);
-            doc.text(`Section ${sectionName}`, 15, yOffset);
-            yOffset += 10;
-        }
-        
-        // Clone the timetable to avoid styles affecting the real DOM
-        const timetableClone = timetableElement.cloneNode(true);
-        
-        // Get the timetable table
-        const timetableTable = timetableClone.querySelector('table');
-        
-        // Use html2canvas to convert the table to an image
-        html2canvas(timetableTable, {
-            scale: 1,
-            logging: false,
-            useCORS: true
-        }).then(canvas => {
-            // Add the table image to the PDF
-            const imgData = canvas.toDataURL('image/png');
-            const imgWidth = doc.internal.pageSize.getWidth() - 30;
-            const imgHeight = canvas.height * imgWidth / canvas.width;
-            
-            doc.addImage(imgData, 'PNG', 15, yOffset, imgWidth, imgHeight);
-            
-            // If this is the last section, save the PDF
-            if (index === sectionTabs.length - 1) {
-                doc.save(`timetable_${className.replace(/\s+/g, '_')}.pdf`);
-            }
-        });
-    });
+    window.print();
 }
 
 // Function to show conflict details
@@ -154,3 +165,181 @@ function showConflictDetails(conflicts) {
     // Show the modal
     modal.show();
 }
+
+// Function to show a regeneration preview and let the user apply it
+function showPreviewDetails(preview) {
+    const modalElement = document.getElementById('preview-modal');
+    const modal = bootstrap.Modal.getOrCreateInstance(modalElement);
+    const summary = preview.summary;
+
+    let html = '<ul class="list-group mb-3">' +
+        `<li class="list-group-item">Periods added: <strong>${summary.added}</strong></li>` +
+        `<li class="list-group-item">Periods removed: <strong>${summary.removed}</strong></li>` +
+        `<li class="list-group-item">Periods changed: <strong>${summary.changed}</strong></li>` +
+        `<li class="list-group-item">Periods unchanged: <strong>${summary.unchanged}</strong></li>` +
+        '</ul>';
+    if (preview.lab_mode_note) {
+        html += `<div class="alert alert-info">Using common labs: ${escapeHtml(preview.lab_mode_note)}.</div>`;
+    }
+    if (preview.unplaced.length > 0) {
+        html += '<div class="alert alert-warning mb-0"><strong>Could not place:</strong><ul class="mb-0">' +
+            preview.unplaced.map(item =>
+                `<li>${escapeHtml(item.course_name)} ${item.is_lab ? 'lab' : 'lecture'}: ${item.hours} session(s)</li>`
+            ).join('') + '</ul></div>';
+    }
+    modalElement.querySelector('.modal-body').innerHTML = html;
+
+    document.getElementById('apply-preview').onclick = function() {
+        document.getElementById('generate-seed').value = preview.seed;
+        document.getElementById('generate-form').submit();
+    };
+    modal.show();
+}
+
+// Function to escape text for use in HTML
+function escapeHtml(text) {
+    return String(text)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;');
+}
+
+// Function to render the class and section timetables from the compact payload
+function renderTimetables(timetable) {
+    const sections = timetable.sections;
+    const days = timetable.days;
+    const slots = timetable.slots;
+    const cellIndex = (s, d, t) => (s * days.length + d) * slots.length + t;
+    const course = code => timetable.courses[code - 1];
+    const teacherName = code => code ? escapeHtml(timetable.teachers[code - 1][1]) : 'N/A';
+    const roomLine = code => code ?
+        `<div class="room-name"><i class="fas fa-door-open me-1"></i> ${escapeHtml(timetable.rooms[code - 1][1])}</div>` : '';
+    const courseLabel = ([, name, code]) => escapeHtml(name) + (code ? ` (${escapeHtml(code)})` : '');
+
+    const header = '<thead><tr><th>Time / Day</th>' +
+        days.map(day => `<th>${escapeHtml(day[1])}</th>`).join('') + '</tr></thead>';
+
+    function table(renderCell) {
+        const rows = slots.map((slot, t) => {
+            let row = `<tr><td class="time-slot">${escapeHtml(slot[1])}` +
+                (slot[2] ? '<br><span class="badge bg-info">Break</span>' : '') + '</td>';
+            days.forEach((day, d) => {
+                row += slot[2] ? '<td class="break-cell"><em>Break Time</em></td>' : renderCell(d, t);
+            });
+            return row + '</tr>';
+        });
+        return `<table class="table table-bordered timetable">${header}<tbody>${rows.join('')}</tbody></table>`;
+    }
+
+    // Lectures shared by every section show once; otherwise each section's lab teacher, or each
+    // section's own lecture, is listed
+    function consolidatedCell(d, t) {
+        const cells = sections.map((section, s) => cellIndex(s, d, t));
+        const first = cells[0];
+        const isCommon = cells.length > 0 && cells.every(c =>
+            timetable.course[c] && timetable.course[c] === timetable.course[first] &&
+            timetable.teacher[c] === timetable.teacher[first]);
+        if (isCommon && course(timetable.course[first])[4]) {
+            return '<td class="lecture-cell">' +
+                `<div class="course-name">${courseLabel(course(timetable.course[first]))} <span class="badge bg-success">Lecture</span></div>` +
+                `<div class="teacher-name"><i class="fas fa-user-tie me-1"></i> ${teacherName(timetable.teacher[first])}</div>` +
+                roomLine(timetable.room[first]) +
+                '<small class="text-muted">All sections</small></td>';
+        }
+
+        const busy = sections
+            .map((section, s) => [section, cells[s]])
+            .filter(([, c]) => timetable.course[c]);
+        if (busy.length === 0) {
+            return '<td class="empty-cell">-</td>';
+        }
+        const labs = busy.filter(([, c]) => course(timetable.course[c])[3] &&
+            timetable.course[c] === timetable.course[busy[0][1]]);
+        if (labs.length < busy.length) {
+            // Independent lectures or rotating labs: each section's own session
+            const allLabs = busy.every(([, c]) => course(timetable.course[c])[3]);
+            const noLabs = busy.every(([, c]) => !course(timetable.course[c])[3]);
+            const entries = busy.map(([section, c]) =>
+                `<li><small>Section ${escapeHtml(section[1])}: ${courseLabel(course(timetable.course[c]))}, ` +
+                `${teacherName(timetable.teacher[c])}` +
+                (timetable.room[c] ? ` (${escapeHtml(timetable.rooms[timetable.room[c] - 1][1])})` : '') +
+                '</small></li>').join('');
+            const badge = allLabs ? '<span class="badge bg-primary">Labs</span>' :
+                noLabs ? '<span class="badge bg-success">Lectures</span>' :
+                '<span class="badge bg-secondary">By section</span>';
+            return `<td class="${allLabs ? 'lab-cell' : 'lecture-cell'}">` +
+                `<div class="course-name">${badge}</div>` +
+                `<div class="teacher-assignments"><ul class="mb-0 ps-3">${entries}</ul></div></td>`;
+        }
+        const assignments = labs.map(([section, c]) =>
+            `<li><small>Section ${escapeHtml(section[1])}: ${teacherName(timetable.teacher[c])}` +
+            (timetable.room[c] ? ` (${escapeHtml(timetable.rooms[timetable.room[c] - 1][1])})` : '') +
+            '</small></li>').join('');
+        return '<td class="lab-cell">' +
+            `<div class="course-name">${courseLabel(course(timetable.course[labs[0][1]]))} <span class="badge bg-primary">Lab</span></div>` +
+            `<div class="teacher-assignments"><small>Teacher assignments:</small><ul class="mb-0 ps-3">${assignments}</ul></div></td>`;
+    }
+
+    function sectionCell(s, d, t) {
+        const c = cellIndex(s, d, t);
+        if (!timetable.course[c]) {
+            return '<td class="empty-cell">-</td>';
+        }
+        const [, name, , isLab] = course(timetable.course[c]);
+        return `<td class="${isLab ? 'lab-cell' : 'lecture-cell'}">` +
+            `<div class="course-name">${escapeHtml(name)}${isLab ? ' <span class="badge badge-lab">Lab</span>' : ''}</div>` +
+            `<div class="teacher-name"><i class="fas fa-user-tie me-1"></i> ${teacherName(timetable.teacher[c])}</div>` +
+            roomLine(timetable.room[c]) + '</td>';
+    }
+
+    const consolidated = document.querySelector('[data-timetable="consolidated"]');
+    if (consolidated) {
+        consolidated.innerHTML = table(consolidatedCell);
+    }
+    sections.forEach((section, s) => {
+        const container = document.querySelector(`[data-timetable="${section[0]}"]`);
+        if (container) {
+            container.innerHTML = table((d, t) => sectionCell(s, d, t));
+        }
+    });
+}
+
+// Function to find (or add) an entry in a payload dictionary and return its 1-based code
+function dictionaryCode(dictionary, id, values) {
+    let position = dictionary.findIndex(entry => entry[0] === id);
+    if (position === -1) {
+        dictionary.push([id, ...values]);
+        position = dictionary.length - 1;
+    }
+    return position + 1;
+}
+
+// Function to apply a pushed change (or snapshot) event to the compact payload
+function applyTimetableChanges(timetable, payload, replace) {
+    const position = items => Object.fromEntries(items.map((item, i) => [item[0], i]));
+    const sectionIndex = position(timetable.sections);
+    const dayIndex = position(timetable.days);
+    const slotIndex = position(timetable.slots);
+
+    if (replace) {
+        timetable.course.fill(0);
+        timetable.teacher.fill(0);
+        timetable.room.fill(0);
+    }
+    timetable.version = payload.version;
+
+    payload.changes.forEach(([sectionId, dayId, slotId, courseId, teacherId, roomId]) => {
+        if (!(sectionId in sectionIndex) || !(dayId in dayIndex) || !(slotId in slotIndex)) {
+            return;
+        }
+        const cell = (sectionIndex[sectionId] * timetable.days.length + dayIndex[dayId]) *
+            timetable.slots.length + slotIndex[slotId];
+        timetable.course[cell] = courseId === null ? 0 :
+            dictionaryCode(timetable.courses, courseId, payload.courses[courseId]);
+        timetable.teacher[cell] = teacherId === null ? 0 :
+            dictionaryCode(timetable.teachers, teacherId, [payload.teachers[teacherId]]);
+        timetable.room[cell] = roomId === null ? 0 :
+            dictionaryCode(timetable.rooms, roomId, [payload.rooms[roomId]]);
+    });
+}
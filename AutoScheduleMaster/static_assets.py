@@ -0,0 +1,84 @@
+import os
+import re
+import hashlib
+import threading
+
+from flask import current_app, send_from_directory, url_for
+
+# Third-party assets are vendored under static/vendor/<name>-<version>/ and served like any
+# other static file, so pages make no requests to outside hosts. The version is part of the
+# path, so a vendored file never changes in place. Sources:
+#   bootstrap-5.3.0, popper-2.11.8: the Bootstrap 5.3.0 distribution (css/js) and Popper 2.11.8
+#   fontawesome-6.4.0: the Font Awesome Free 6.4.0 web kit (css/all.min.css and webfonts/)
+
+# Fingerprinted and vendored files never change under their URL
+IMMUTABLE_MAX_AGE = int(os.environ.get("STATIC_IMMUTABLE_MAX_AGE", str(365 * 24 * 3600)))
+# Characters of the SHA-256 content hash put in fingerprinted file names
+FINGERPRINT_LENGTH = 12
+
+FINGERPRINT = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$" % FINGERPRINT_LENGTH)
+
+# {filename: (mtime, size, hash)}; files are re-hashed only when they change on disk
+_hashes = {}
+_hashes_lock = threading.Lock()
+
+def file_hash(static_folder, filename):
+    """Content hash of a static file, or None if it does not exist"""
+    path = os.path.join(static_folder, filename)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    cached = _hashes.get(filename)
+    if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()[:FINGERPRINT_LENGTH]
+    with _hashes_lock:
+        _hashes[filename] = (stat.st_mtime, stat.st_size, value)
+    return value
+
+def fingerprinted(filename, value):
+    """css/style.css -> css/style.<hash>.css"""
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{value}{ext}"
+
+def asset_url(filename):
+    """URL of a static file with its content hash in the name, for templates"""
+    value = file_hash(current_app.static_folder, filename)
+    if value is None:
+        return url_for("static", filename=filename)
+    return url_for("static", filename=fingerprinted(filename, value))
+
+def warm_asset_hashes(app):
+    """Hash every static file up front, e.g. in the preloaded gunicorn master"""
+    for root, _, files in os.walk(app.static_folder):
+        for name in files:
+            file_hash(app.static_folder, os.path.relpath(os.path.join(root, name), app.static_folder))
+
+def init_static_assets(app):
+    """Serve fingerprinted file names with immutable caching and add asset_url to templates"""
+    app.jinja_env.globals["asset_url"] = asset_url
+
+    def static(filename):
+        immutable = filename.startswith("vendor/")
+        match = FINGERPRINT.match(filename)
+        if match:
+            original = match.group("stem") + match.group("ext")
+            value = file_hash(app.static_folder, original)
+            if value is not None:
+                # An outdated hash still gets the current file, just without the long cache
+                immutable = value == match.group("hash")
+                filename = original
+        if not immutable:
+            # Revalidated on each use, as Flask serves static files by default
+            return send_from_directory(app.static_folder, filename)
+        response = send_from_directory(app.static_folder, filename, max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions["static"] = static
@@ -0,0 +1,106 @@
+from app import db
+from models import Section, TimetableEntry, TeacherAvailability, TeacherLoadLimit
+from reference_data import get_days, get_time_slots
+
+# Value marking a teacher_schedule slot the teacher is unavailable for. Any value makes a slot busy
+# for placement checks; True marks a period actually taught.
+BLOCKED = 'blocked'
+
+def load_teacher_constraints(teacher_ids, day_ids, exclude_class_id=None):
+    """
+    Load teacher availability, load limits and existing commitments for the solver.
+
+    Everything is read with one query per table, so placement checks during the solve are
+    dictionary lookups.
+
+    Args:
+        teacher_ids: Teachers involved in the solve
+        day_ids: Days being scheduled
+        exclude_class_id: Class being regenerated, whose current entries are ignored
+
+    Returns:
+        (teacher_schedule, teacher_load, limits):
+        - teacher_schedule: {teacher_id: {day_id: {time_slot_id: True or BLOCKED}}} with unavailable
+          periods BLOCKED and periods already taught in other classes True
+        - teacher_load: {teacher_id: {day_id: periods}} already taught in other classes
+        - limits: {teacher_id: (max_periods_per_day, max_periods_per_week)}; either may be None
+    """
+    teacher_ids = set(teacher_ids)
+    teacher_schedule = {teacher_id: {day_id: {} for day_id in day_ids} for teacher_id in teacher_ids}
+    teacher_load = {teacher_id: {day_id: 0 for day_id in day_ids} for teacher_id in teacher_ids}
+    if not teacher_ids:
+        return teacher_schedule, teacher_load, {}
+
+    teaching_slot_ids = [slot.id for slot in get_time_slots(is_break=False)]
+    for row in TeacherAvailability.query.filter(TeacherAvailability.teacher_id.in_(teacher_ids)):
+        day_schedule = teacher_schedule[row.teacher_id].get(row.day_id)
+        if day_schedule is None:
+            continue
+        for slot_id in (teaching_slot_ids if row.time_slot_id is None else [row.time_slot_id]):
+            day_schedule[slot_id] = BLOCKED
+
+    # A period counts once however many sections share it (labs and common lectures)
+    taught = db.session.query(
+        TimetableEntry.teacher_id, TimetableEntry.day_id, TimetableEntry.time_slot_id
+    ).join(Section, TimetableEntry.section_id == Section.id).filter(
+        TimetableEntry.teacher_id.in_(teacher_ids)
+    )
+    if exclude_class_id is not None:
+        taught = taught.filter(Section.class_id != exclude_class_id)
+    for teacher_id, day_id, slot_id in taught.distinct():
+        day_schedule = teacher_schedule[teacher_id].get(day_id)
+        if day_schedule is None or day_schedule.get(slot_id) is True:
+            continue
+        day_schedule[slot_id] = True
+        teacher_load[teacher_id][day_id] += 1
+
+    limits = {
+        limit.teacher_id: (limit.max_periods_per_day, limit.max_periods_per_week)
+        for limit in TeacherLoadLimit.query.filter(TeacherLoadLimit.teacher_id.in_(teacher_ids))
+    }
+    return teacher_schedule, teacher_load, limits
+
+def within_limits(teacher_id, day_id, periods, teacher_load, limits):
+    """Whether a teacher can take `periods` more periods on a day without exceeding their load limits"""
+    limit = limits.get(teacher_id)
+    if limit is None:
+        return True
+    max_per_day, max_per_week = limit
+    day_loads = teacher_load[teacher_id]
+    if max_per_day is not None and day_loads[day_id] + periods > max_per_day:
+        return False
+    if max_per_week is not None and sum(day_loads.values()) + periods > max_per_week:
+        return False
+    return True
+
+def teacher_weekly_capacity(teacher_ids):
+    """
+    Periods per week each constrained teacher can teach, after unavailability and load limits.
+
+    Returns:
+        {teacher_id: periods} for the teachers that have availability or load limit rows
+    """
+    teacher_ids = set(teacher_ids)
+    if not teacher_ids:
+        return {}
+    day_ids = [day.id for day in get_days()]
+    teaching_slot_ids = {slot.id for slot in get_time_slots(is_break=False)}
+
+    blocked = {}  # {teacher_id: {day_id: set of blocked slot IDs}}
+    for row in TeacherAvailability.query.filter(TeacherAvailability.teacher_id.in_(teacher_ids)):
+        day_blocked = blocked.setdefault(row.teacher_id, {}).setdefault(row.day_id, set())
+        day_blocked.update(teaching_slot_ids if row.time_slot_id is None else {row.time_slot_id} & teaching_slot_ids)
+    limits = {
+        limit.teacher_id: (limit.max_periods_per_day, limit.max_periods_per_week)
+        for limit in TeacherLoadLimit.query.filter(TeacherLoadLimit.teacher_id.in_(teacher_ids))
+    }
+
+    capacity = {}
+    for teacher_id in blocked.keys() | limits.keys():
+        max_per_day, max_per_week = limits.get(teacher_id, (None, None))
+        total = 0
+        for day_id in day_ids:
+            free = len(teaching_slot_ids) - len(blocked.get(teacher_id, {}).get(day_id, ()))
+            total += free if max_per_day is None else min(free, max_per_day)
+        capacity[teacher_id] = total if max_per_week is None else min(total, max_per_week)
+    return capacity
@@ -0,0 +1,159 @@
+import os
+import re
+import threading
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import abort, current_app, g, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlite_profile import is_sqlite, sqlite_engine_options
+
+# Schools served by this instance, e.g. "north-high,riverside". Empty means single-tenant: every
+# request uses the configured database.
+TENANTS = [name.strip().lower() for name in os.environ.get("TENANTS", "").split(",") if name.strip()]
+# Database URL per tenant, with a {tenant} placeholder. Unset means a SQLite file per tenant in
+# instance/tenants/ (SQLite) or a schema per tenant in the configured database (PostgreSQL).
+TENANT_DATABASE_URL = os.environ.get("TENANT_DATABASE_URL")
+# Connection pool per tenant on a shared PostgreSQL server, kept small since every tenant has one
+TENANT_POOL_SIZE = int(os.environ.get("TENANT_POOL_SIZE", "2"))
+TENANT_MAX_OVERFLOW = int(os.environ.get("TENANT_MAX_OVERFLOW", "3"))
+
+TENANT_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+_current = ContextVar("tenant", default=None)
+_engines = {}
+_engines_lock = threading.Lock()
+
+for _name in TENANTS:
+    if not TENANT_NAME.match(_name):
+        raise ValueError(f"Invalid tenant name: {_name!r}")
+
+def current_tenant():
+    """Tenant of the current request or tenant_context, or None when single-tenant"""
+    return _current.get()
+
+@contextmanager
+def tenant_context(tenant):
+    """
+    Route database access to a tenant's database for the duration of the block.
+
+    Sessions are scoped to the app context, so switch tenants in a fresh app context rather
+    than inside one that has already queried another tenant.
+    """
+    token = _current.set(tenant)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+class TenantSession(Session):
+    """Session that sends every statement to the current tenant's engine"""
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        tenant = _current.get()
+        if tenant is None or bind is not None:
+            return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        engine = _engines.get(tenant)
+        if engine is None:
+            raise RuntimeError(f"Database for tenant {tenant} has not been opened")
+        return engine
+
+def tenant_schema(tenant):
+    return "tenant_" + tenant.replace("-", "_")
+
+def _tenant_engine_args(app, tenant):
+    base_url = app.config["SQLALCHEMY_DATABASE_URI"]
+    if TENANT_DATABASE_URL:
+        url = TENANT_DATABASE_URL.format(tenant=tenant)
+    elif is_sqlite(base_url):
+        directory = os.path.join(app.instance_path, "tenants")
+        os.makedirs(directory, exist_ok=True)
+        url = "sqlite:///" + os.path.join(directory, f"{tenant}.db")
+    else:
+        url = base_url
+
+    if is_sqlite(url):
+        return url, sqlite_engine_options(url), None
+    options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+                   pool_size=TENANT_POOL_SIZE, max_overflow=TENANT_MAX_OVERFLOW)
+    schema = None
+    if url == base_url and make_url(url).get_backend_name() == "postgresql":
+        # One schema per tenant; unqualified table names resolve to it on every connection
+        schema = tenant_schema(tenant)
+        options["connect_args"] = dict(options.get("connect_args", {}), options=f"-csearch_path={schema}")
+    return url, options, schema
+
+def tenant_engine(tenant):
+    """
+    Engine for a tenant's database, opened on first use in this process.
+
+    Opening creates the database (or schema) if needed, brings it up to date with the models
+    and adds the default days and time slots. Must be called in an app context.
+    """
+    engine = _engines.get(tenant)
+    if engine is not None:
+        return engine
+    with _engines_lock:
+        engine = _engines.get(tenant)
+        if engine is not None:
+            return engine
+
+        from app import db
+        from models import add_missing_columns, upgrade_foreign_keys, create_missing_indexes, init_default_data
+        app = current_app._get_current_object()
+        url, options, schema = _tenant_engine_args(app, tenant)
+        if schema is not None:
+            with db.engine.begin() as conn:
+                conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+        engine = create_engine(url, **options)
+        db.metadata.create_all(engine)
+        add_missing_columns(db, engine)
+        upgrade_foreign_keys(db, engine)
+        create_missing_indexes(db, engine)
+        _engines[tenant] = engine
+        with app.app_context(), tenant_context(tenant):
+            init_default_data(db)
+            from timetable_summary import ensure_summaries
+            ensure_summaries()
+        logging.info(f"Opened database for tenant {tenant}")
+        return engine
+
+def tenant_engines():
+    """{tenant: engine} for every configured tenant, opening any not yet opened"""
+    return {tenant: tenant_engine(tenant) for tenant in TENANTS}
+
+def opened_tenant_engines():
+    """Engines of the tenants opened so far in this process"""
+    return list(_engines.values())
+
+def request_tenant():
+    """Tenant named by the first label of the request's host (north-high.example.org), or None"""
+    name = request.host.split(":")[0].split(".")[0].lower()
+    return name if name in TENANTS else None
+
+def init_tenancy(app):
+    """Select the tenant for every request when TENANTS is configured"""
+    if not TENANTS:
+        return
+
+    @app.before_request
+    def select_tenant():
+        if request.endpoint == "static":
+            return
+        tenant = request_tenant()
+        if tenant is None:
+            abort(404)
+        tenant_engine(tenant)
+        g.tenant_token = _current.set(tenant)
+        # A login belongs to the school it was made at
+        if session.get("tenant") != tenant:
+            session.clear()
+            session["tenant"] = tenant
+
+    @app.teardown_request
+    def reset_tenant(exc=None):
+        token = g.pop("tenant_token", None)
+        if token is not None:
+            _current.reset(token)
@@ -0,0 +1,210 @@
+import os
+import json
+import zlib
+from datetime import date
+
+from sqlalchemy import func
+from app import db
+from models import Class, Section, Course, Teacher, Room, TimetableArchive
+from reference_data import get_days, get_time_slots
+from timetable_events import load_cells
+
+# Term new archives are filed under, e.g. "2026-27 Term 1". Unset means the calendar half-year
+# ("2026-H2"), so snapshots still group sensibly when nobody names the terms.
+TIMETABLE_TERM = os.environ.get("TIMETABLE_TERM")
+# Snapshots kept per class and term of the timetables replaced by regeneration; older ones are
+# dropped. Snapshots taken on purpose (archive_term, the archive API) are always kept.
+ARCHIVE_KEEP_REGENERATED = int(os.environ.get("ARCHIVE_KEEP_REGENERATED", "20"))
+
+ARCHIVE_REASONS = ['regenerated', 'manual']
+# Version of the snapshot layout stored in TimetableArchive.data
+SNAPSHOT_FORMAT = 1
+
+def current_term():
+    """Term that new archives are filed under (see TIMETABLE_TERM)"""
+    if TIMETABLE_TERM:
+        return TIMETABLE_TERM
+    today = date.today()
+    return f"{today.year}-H{1 if today.month <= 6 else 2}"
+
+def compress_snapshot(snapshot):
+    return zlib.compress(json.dumps(snapshot, separators=(',', ':')).encode('utf-8'), 9)
+
+def decompress_snapshot(data):
+    snapshot = json.loads(zlib.decompress(data).decode('utf-8'))
+    # JSON object keys are strings; the cells refer to integer IDs
+    for field in ('sections', 'days', 'time_slots', 'courses', 'teachers', 'rooms'):
+        snapshot[field] = {int(key): value for key, value in snapshot[field].items()}
+    return snapshot
+
+def build_snapshot(class_id, cells=None):
+    """
+    Self-contained copy of a class's published timetable.
+
+    Names are stored with the IDs so an archive still reads correctly after sections, courses,
+    teachers or rooms have been renamed or deleted.
+
+    Args:
+        cells: Cells to store (see timetable_events.load_cells); defaults to the published ones
+
+    Returns:
+        Dict with format, cells as [section_id, day_id, time_slot_id, course_id, teacher_id, room_id]
+        rows, and the names of the sections, days, time slots, courses, teachers and rooms they use
+    """
+    if cells is None:
+        cells = load_cells(class_id=class_id)
+    rows = sorted([*key, *value] for key, value in cells.items())
+
+    course_ids = {row[3] for row in rows if row[3] is not None}
+    teacher_ids = {row[4] for row in rows if row[4] is not None}
+    room_ids = {row[5] for row in rows if row[5] is not None}
+    courses = {}
+    teachers = {}
+    rooms = {}
+    if course_ids:
+        courses = {c.id: [c.name, c.code, c.is_lab] for c in Course.query.filter(Course.id.in_(course_ids))}
+    if teacher_ids:
+        teachers = {t.id: t.name for t in Teacher.query.filter(Teacher.id.in_(teacher_ids))}
+    if room_ids:
+        rooms = {r.id: r.name for r in Room.query.filter(Room.id.in_(room_ids))}
+
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'cells': rows,
+        'sections': {s.id: s.name for s in Section.query.filter_by(class_id=class_id)},
+        'days': {day.id: day.name for day in get_days()},
+        'time_slots': {slot.id: f"{slot.start_time.strftime('%H:%M')}-{slot.end_time.strftime('%H:%M')}"
+                       for slot in get_time_slots(is_break=False)},
+        'courses': courses,
+        'teachers': teachers,
+        'rooms': rooms
+    }
+
+def archive_class(class_id, term=None, reason='manual', cells=None):
+    """
+    Store a compressed snapshot of a class's published timetable in the archive table.
+
+    Adds the archive to the session without committing, so it can share the transaction that
+    replaces the timetable. Nothing is stored when the class has no timetable.
+
+    Args:
+        term: Term to file it under; defaults to current_term()
+        reason: One of ARCHIVE_REASONS
+        cells: Cells to store instead of the published ones (see build_snapshot)
+
+    Returns:
+        The new TimetableArchive, or None
+    """
+    if reason not in ARCHIVE_REASONS:
+        raise ValueError(f"Unknown archive reason: {reason}")
+    class_obj = db.session.get(Class, class_id)
+    snapshot = build_snapshot(class_id, cells)
+    if class_obj is None or not snapshot['cells']:
+        return None
+    term = term or current_term()
+
+    latest = db.session.query(func.max(TimetableArchive.version)).filter(
+        TimetableArchive.class_id == class_id, TimetableArchive.term == term).scalar()
+    archive = TimetableArchive()
+    archive.term = term
+    archive.version = (latest or 0) + 1
+    archive.class_id = class_id
+    archive.class_name = class_obj.name
+    archive.reason = reason
+    archive.cell_count = len(snapshot['cells'])
+    archive.data = compress_snapshot(snapshot)
+    archive.data_size = len(archive.data)
+    db.session.add(archive)
+
+    if reason == 'regenerated':
+        prune_archives(class_id, term)
+    return archive
+
+def prune_archives(class_id, term, keep=None):
+    """Drop all but the newest `keep` regeneration snapshots of a class in a term (not committed)"""
+    keep = ARCHIVE_KEEP_REGENERATED if keep is None else keep
+    stale = TimetableArchive.query.filter_by(
+        class_id=class_id, term=term, reason='regenerated'
+    ).order_by(TimetableArchive.version.desc()).offset(keep).all()
+    for archive in stale:
+        db.session.delete(archive)
+
+def archive_term(term=None):
+    """
+    Archive the published timetable of every class under a term, e.g. when the term ends.
+
+    Returns:
+        List of the archives made (classes without a timetable are skipped)
+    """
+    archives = []
+    for class_obj in Class.query.order_by(Class.id):
+        archive = archive_class(class_obj.id, term=term)
+        if archive is not None:
+            archives.append(archive)
+    db.session.commit()
+    return archives
+
+def archive_summary(archive):
+    """Archive metadata for listings, without the snapshot"""
+    return {
+        'id': archive.id,
+        'term': archive.term,
+        'version': archive.version,
+        'class_id': archive.class_id,
+        'class_name': archive.class_name,
+        'reason': archive.reason,
+        'cells': archive.cell_count,
+        'bytes': archive.data_size,
+        'created_at': archive.created_at.isoformat() if archive.created_at else None
+    }
+
+def load_archive(archive):
+    """Archive metadata plus its decompressed snapshot"""
+    return dict(archive_summary(archive), snapshot=decompress_snapshot(archive.data))
+
+def _cells(snapshot):
+    return {tuple(row[:3]): tuple(row[3:]) for row in snapshot['cells']}
+
+def _merge_names(old, new):
+    return {field: {**old[field], **new[field]}
+            for field in ('sections', 'days', 'time_slots', 'courses', 'teachers', 'rooms')}
+
+def diff_snapshots(old, new):
+    """
+    Cell-by-cell difference between two snapshots.
+
+    Returns:
+        Dict with a list of [section_id, day_id, time_slot_id, old, new] rows, where old and new are
+        [course_id, teacher_id, room_id] or null for an empty cell, counts of added, removed and
+        changed cells, and the names of everything the rows mention
+    """
+    old_cells = _cells(old)
+    new_cells = _cells(new)
+    changes = []
+    for key in old_cells.keys() | new_cells.keys():
+        before = old_cells.get(key)
+        after = new_cells.get(key)
+        if before != after:
+            changes.append([*key, list(before) if before else None, list(after) if after else None])
+    changes.sort(key=lambda row: row[:3])
+
+    added = len(new_cells.keys() - old_cells.keys())
+    removed = len(old_cells.keys() - new_cells.keys())
+    return dict(_merge_names(old, new), changes=changes, summary={
+        'added': added,
+        'removed': removed,
+        'changed': len(changes) - added - removed,
+        'unchanged': len(new_cells) - len(changes) + removed
+    })
+
+if __name__ == "__main__":
+    import argparse
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Archive every class's published timetable under a term.")
+    parser.add_argument("--term", help="Term name (default: TIMETABLE_TERM or the current half-year)")
+    args = parser.parse_args()
+    with app.app_context():
+        for archive in archive_term(args.term):
+            print(archive.class_name, archive.term, f"v{archive.version}", archive.cell_count, "cells",
+                  len(archive.data), "bytes")
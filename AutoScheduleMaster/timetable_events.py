@@ -0,0 +1,216 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from app import db
+from models import Section, Teacher, Course, Room, TimetableEntry, TimetableVersion
+from tenancy import tenant_context
+
+# How often each worker process checks the version table for changes
+POLL_SECONDS = float(os.environ.get("TIMETABLE_EVENTS_POLL_SECONDS", "2"))
+# Idle streams send a comment this often so proxies keep the connection open
+HEARTBEAT_SECONDS = 25
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 5000
+# Open streams allowed per worker process. With threaded workers each stream holds a thread for
+# as long as its display is connected, so this must stay below GUNICORN_THREADS to leave threads
+# for other requests; async workers (see gunicorn.conf.py) can allow many more.
+MAX_STREAMS = int(os.environ.get("TIMETABLE_EVENTS_MAX_STREAMS", "8"))
+# Seconds a client turned away at the limit is asked to wait before trying again
+BUSY_RETRY_SECONDS = int(os.environ.get("TIMETABLE_EVENTS_BUSY_RETRY_SECONDS", "30"))
+
+# Per tenant (None when single-tenant): the latest {class_id: version} seen by this process,
+# shared by every open stream of that tenant, and the condition and watcher thread behind it
+_versions = {}
+_conditions = {}
+_watcher_lock = threading.Lock()
+_watchers = {}
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+def acquire_stream():
+    """Reserve one of this process's MAX_STREAMS stream slots; returns False if all are in use"""
+    return _stream_slots.acquire(blocking=False)
+
+def release_stream():
+    """Give back a slot reserved with acquire_stream, once its stream has closed"""
+    _stream_slots.release()
+
+def publish_change(class_id):
+    """
+    Record that a class's published timetable changed.
+
+    Call inside the transaction that writes the entries, so subscribers only see the change
+    once it is committed.
+    """
+    updated = TimetableVersion.query.filter_by(class_id=class_id).update({
+        TimetableVersion.version: TimetableVersion.version + 1,
+        TimetableVersion.updated_at: datetime.now()
+    }, synchronize_session=False)
+    if not updated:
+        version = TimetableVersion()
+        version.class_id = class_id
+        version.version = 1
+        db.session.add(version)
+
+def classes_using(teacher_id=None, course_id=None, room_id=None):
+    """IDs of the classes whose timetables mention a teacher, course or room"""
+    query = db.session.query(Section.class_id).join(
+        TimetableEntry, TimetableEntry.section_id == Section.id
+    )
+    if teacher_id is not None:
+        query = query.filter(TimetableEntry.teacher_id == teacher_id)
+    if course_id is not None:
+        query = query.filter(TimetableEntry.course_id == course_id)
+    if room_id is not None:
+        query = query.filter(TimetableEntry.room_id == room_id)
+    return [class_id for (class_id,) in query.distinct()]
+
+def _poll_versions(app, tenant):
+    with app.app_context(), tenant_context(tenant):
+        try:
+            versions = dict(db.session.query(TimetableVersion.class_id, TimetableVersion.version).all())
+        except Exception as e:
+            logging.error(f"Error polling timetable versions: {str(e)}")
+            return
+        finally:
+            db.session.remove()
+    if versions != _versions.get(tenant):
+        condition = _conditions[tenant]
+        with condition:
+            _versions[tenant] = versions
+            condition.notify_all()
+
+def _watch(app, tenant):
+    while True:
+        time.sleep(POLL_SECONDS)
+        _poll_versions(app, tenant)
+
+def _ensure_watcher(app, tenant):
+    """Start a tenant's version watcher on first use (one query per interval for all its streams)"""
+    with _watcher_lock:
+        if tenant not in _watchers:
+            _conditions[tenant] = threading.Condition()
+            _poll_versions(app, tenant)
+            _watchers[tenant] = threading.Thread(target=_watch, args=(app, tenant), daemon=True,
+                                                 name=f"timetable-events-{tenant}" if tenant else "timetable-events")
+            _watchers[tenant].start()
+
+def _wait_for(tenant, predicate, timeout):
+    """Block until predicate(versions) holds or the timeout passes; returns a copy of the versions or None"""
+    condition = _conditions[tenant]
+    with condition:
+        if condition.wait_for(lambda: predicate(_versions.get(tenant, {})), timeout):
+            return dict(_versions.get(tenant, {}))
+    return None
+
+def load_cells(class_id=None, teacher_id=None):
+    """Published cells as {(section_id, day_id, time_slot_id): (course_id, teacher_id, room_id)}"""
+    query = db.session.query(
+        TimetableEntry.section_id, TimetableEntry.day_id, TimetableEntry.time_slot_id,
+        TimetableEntry.course_id, TimetableEntry.teacher_id, TimetableEntry.room_id
+    ).filter(TimetableEntry.course_id.isnot(None))
+    if class_id is not None:
+        query = query.join(Section, TimetableEntry.section_id == Section.id).filter(Section.class_id == class_id)
+    if teacher_id is not None:
+        query = query.filter(TimetableEntry.teacher_id == teacher_id)
+    return {(section_id, day_id, slot_id): (course_id, entry_teacher_id, room_id)
+            for section_id, day_id, slot_id, course_id, entry_teacher_id, room_id in query}
+
+def diff_cells(old_cells, new_cells):
+    """
+    Compact diff between two cell maps.
+
+    Returns a dict with a list of [section_id, day_id, time_slot_id, course_id, teacher_id, room_id]
+    rows (course_id, teacher_id and room_id are null for cleared cells) plus the names of the
+    courses, teachers and rooms they mention.
+    """
+    changes = []
+    for key in old_cells.keys() | new_cells.keys():
+        if old_cells.get(key) != new_cells.get(key):
+            changes.append([*key, *new_cells.get(key, (None, None, None))])
+    changes.sort()
+
+    course_ids = {row[3] for row in changes if row[3] is not None}
+    teacher_ids = {row[4] for row in changes if row[4] is not None}
+    room_ids = {row[5] for row in changes if row[5] is not None}
+    courses = {}
+    teachers = {}
+    rooms = {}
+    if course_ids:
+        courses = {c.id: [c.name, c.code, c.is_lab, c.is_lecture] for c in Course.query.filter(Course.id.in_(course_ids))}
+    if teacher_ids:
+        teachers = {t.id: t.name for t in Teacher.query.filter(Teacher.id.in_(teacher_ids))}
+    if room_ids:
+        rooms = {r.id: r.name for r in Room.query.filter(Room.id.in_(room_ids))}
+    return {'changes': changes, 'courses': courses, 'teachers': teachers, 'rooms': rooms}
+
+def _event(name, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {name}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+def class_event_stream(app, class_id, last_event_id=None, tenant=None):
+    """
+    Server-Sent Events stream of changes to one class's published timetable.
+
+    Sends a 'change' event with a compact diff each time the timetable is regenerated. Event
+    IDs are timetable versions; a client reconnecting with an older Last-Event-ID gets the
+    full timetable as a 'snapshot' event first. The stream runs after the request has ended, so
+    the tenant (see tenancy.current_tenant) is passed in.
+    """
+    _ensure_watcher(app, tenant)
+    version = _versions.get(tenant, {}).get(class_id, 0)
+    with app.app_context(), tenant_context(tenant):
+        cells = load_cells(class_id=class_id)
+        snapshot = None
+        if last_event_id is not None and last_event_id != str(version):
+            snapshot = diff_cells({}, cells)
+        db.session.remove()
+
+    yield f"retry: {RETRY_MS}\n\n"
+    if snapshot is not None:
+        yield _event('snapshot', dict(snapshot, class_id=class_id, version=version), event_id=version)
+
+    while True:
+        versions = _wait_for(tenant, lambda current: current.get(class_id, 0) != version, HEARTBEAT_SECONDS)
+        if versions is None:
+            yield ": keepalive\n\n"
+            continue
+        version = versions.get(class_id, 0)
+        with app.app_context(), tenant_context(tenant):
+            new_cells = load_cells(class_id=class_id)
+            payload = diff_cells(cells, new_cells)
+            db.session.remove()
+        cells = new_cells
+        if payload['changes']:
+            yield _event('change', dict(payload, class_id=class_id, version=version), event_id=version)
+
+def teacher_event_stream(app, teacher_id, tenant=None):
+    """Server-Sent Events stream of changes to one teacher's timetable across all classes"""
+    _ensure_watcher(app, tenant)
+    versions = dict(_versions.get(tenant, {}))
+    with app.app_context(), tenant_context(tenant):
+        cells = load_cells(teacher_id=teacher_id)
+        db.session.remove()
+
+    yield f"retry: {RETRY_MS}\n\n"
+    while True:
+        seen = versions
+        new_versions = _wait_for(tenant, lambda current: current != seen, HEARTBEAT_SECONDS)
+        if new_versions is None:
+            yield ": keepalive\n\n"
+            continue
+        versions = new_versions
+        with app.app_context(), tenant_context(tenant):
+            new_cells = load_cells(teacher_id=teacher_id)
+            payload = diff_cells(cells, new_cells)
+            db.session.remove()
+        cells = new_cells
+        if payload['changes']:
+            yield _event('change', dict(payload, teacher_id=teacher_id))
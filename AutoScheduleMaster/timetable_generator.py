@@ -1,24 +1,62 @@
 from app import db
-from models import Class, Section, Teacher, Course, CourseAssignment, TimeSlot, Day, TimetableEntry
+from models import Class, Section, Teacher, Course, CourseAssignment, TimetableEntry
+from timetable_optimizer import optimize_timetable
+from capacity_check import check_capacity
+from timetable_events import publish_change, load_cells, diff_cells
+from teacher_constraints import load_teacher_constraints, within_limits
+from room_allocation import load_rooms, free_room, allocate_lab_rooms
+from reference_data import get_days, get_time_slots
+from lab_rotation import schedule_lab_rotation
+from timetable_archive import archive_class
+from timetable_summary import refresh_class_summary
+import copy
 import random
 from datetime import time
 import logging
 
-def generate_timetable(class_id):
+# 'common': one lecture per hour shared by all sections; 'independent': sections taught by
+# different teachers of a course are scheduled separately
+LECTURE_MODES = ['common', 'independent']
+# 'common': every section takes the same lab at the same time; 'rotation': sections take
+# different labs in parallel in the same block (see lab_rotation.py), used only when it leaves
+# no more hours unplaced than common labs
+LAB_MODES = ['common', 'rotation']
+
+def generate_timetable(class_id, optimize_seconds=0, dry_run=False, seed=None, lecture_mode=None, lab_mode=None):
     """
     Generate a timetable for all sections of a class based on available courses, teachers, and constraints.
     
+    The whole schedule is built in memory and written in a single transaction at the end.
+    
     Args:
         class_id: ID of the class to generate timetable for
+        optimize_seconds: Time budget for the local-search optimization pass (0 disables it)
+        dry_run: Only solve and return a preview of the changes; nothing is written
+        seed: Random seed; the same seed and data give the same timetable (unless optimizing,
+              which is time-bounded)
+        lecture_mode: One of LECTURE_MODES; defaults to the class's lecture_mode
+        lab_mode: One of LAB_MODES; defaults to the class's lab_mode. Rotating labs fall back to
+                  common labs when those leave fewer hours unplaced (the class's lab_mode is then
+                  saved as 'common', and the preview's lab_mode_note says why)
         
     Returns:
-        (success, message): Tuple with success boolean and message string
+        (success, message): Tuple with success boolean and message string. With dry_run, a
+        successful run returns the preview dict from build_preview instead of a message.
     """
+    if seed is None:
+        seed = random.randrange(2 ** 31)
     try:
         # Get all necessary data
         class_obj = Class.query.get(class_id)
         if not class_obj:
             return False, "Class not found"
+        
+        lecture_mode = lecture_mode or class_obj.lecture_mode or 'common'
+        if lecture_mode not in LECTURE_MODES:
+            return False, f"Unknown lecture mode: {lecture_mode}"
+        lab_mode = lab_mode or class_obj.lab_mode or 'common'
+        if lab_mode not in LAB_MODES:
+            return False, f"Unknown lab mode: {lab_mode}"
             
         sections = Section.query.filter_by(class_id=class_id).all()
         if not sections:
@@ -29,19 +67,32 @@ def generate_timetable(class_id):
         if not assignments:
             return False, "No courses assigned to this class"
             
-        days = Day.query.order_by(Day.id).all()
+        days = get_days()
         if not days:
             return False, "No days defined in the system"
+        
+        # Reject inputs that cannot fit in the week before doing any work
+        problems = check_capacity(class_id, lecture_mode=lecture_mode, lab_mode=lab_mode)
+        if problems:
+            return False, "Over capacity: " + "; ".join(problem['message'] for problem in problems)
             
         # Get all time slots, excluding breaks
-        time_slots = TimeSlot.query.filter_by(is_break=False).order_by(TimeSlot.start_time).all()
-        breaks = TimeSlot.query.filter_by(is_break=True).all()
+        time_slots = get_time_slots(is_break=False)
+        breaks = get_time_slots(is_break=True)
         
-        # Create a dictionary to track teacher schedules across all sections
-        teacher_schedule = {}  # {teacher_id: {day_id: {time_slot_id: True}}}
-        for assignment in assignments:
-            if assignment.teacher_id not in teacher_schedule:
-                teacher_schedule[assignment.teacher_id] = {day.id: {} for day in days}
+        # Track teacher schedules across all sections, starting from each teacher's unavailable
+        # periods and the periods they already teach in other classes
+        # teacher_schedule: {teacher_id: {day_id: {time_slot_id: True or BLOCKED}}}
+        # teacher_load: {teacher_id: {day_id: periods}}, checked against the teacher's load limits
+        teacher_schedule, teacher_load, limits = load_teacher_constraints(
+            [assignment.teacher_id for assignment in assignments],
+            [day.id for day in days],
+            exclude_class_id=class_id
+        )
+        
+        # Rooms by type, best fit first, and the periods other classes already use them
+        # (a room type with no rooms defined is not allocated)
+        rooms, room_schedule = load_rooms([day.id for day in days], exclude_class_id=class_id)
                 
         # Create lists for lecture and lab assignments
         lecture_assignments = []
@@ -72,247 +123,398 @@ def generate_timetable(class_id):
                     'hours': course.lecture_hours
                 })
         
-        # First, delete any existing timetable entries to avoid unique constraint violations
-        existing_entries = []
-        for section in sections:
-            section_entries = TimetableEntry.query.filter_by(section_id=section.id).all()
-            existing_entries.extend(section_entries)
+        def solve(mode):
+            """Place everything with the given lab mode, from a copy of the loaded schedules and the run's seed"""
+            state = copy.deepcopy((teacher_schedule, teacher_load, room_schedule))
+            placed = place_sessions(class_id, sections, days, time_slots, lab_assignments, lecture_assignments,
+                                    state[0], state[1], limits, rooms, state[2], lecture_mode, mode,
+                                    random.Random(seed))
+            return placed, state
         
-        for entry in existing_entries:
-            db.session.delete(entry)
+        (sessions, unplaced, section_schedules), state = solve(lab_mode)
         
-        db.session.commit()
+        # Rotating labs must not cost hours that common labs would place: a section sitting out a
+        # rotation block cannot take a lecture shared with the others, so with fewer lab courses
+        # (or lab teachers) than sections a rotation blocks more of the class's week than common
+        # labs do. Keep the rotation only if it leaves no more lab sessions unplaced and, with
+        # those equal, no more lecture hours.
+        lab_mode_note = None
+        if lab_mode == 'rotation':
+            common, common_state = solve('common')
+            if unplaced_hours(common[1]) < unplaced_hours(unplaced):
+                (sessions, unplaced, section_schedules), state = common, common_state
+                lab_mode = 'common'
+                lab_mode_note = "rotating labs would leave more hours unplaced, so labs are common to all sections"
+                logging.info(f"Class {class_id}: {lab_mode_note}")
+        teacher_schedule, teacher_load, room_schedule = state
         
-        # Create a class-wide schedule to track all occupied slots
-        class_schedule = {day.id: {} for day in days}
+        # Improve the greedy result in memory before anything is written
+        if optimize_seconds and sessions:
+            initial_cost, final_cost = optimize_timetable(
+                sessions,
+                [day.id for day in days],
+                [slot.id for slot in time_slots],
+                [i for i in range(len(time_slots) - 1)
+                 if time_slots[i].end_time == time_slots[i+1].start_time],
+                section_schedules,
+                teacher_schedule,
+                teacher_load=teacher_load,
+                limits=limits,
+                room_schedule=room_schedule,
+                time_budget=optimize_seconds,
+                seed=seed
+            )
+            logging.info(f"Optimized timetable for class {class_id}: cost {initial_cost:.1f} -> {final_cost:.1f}")
         
-        # Track section-specific schedules
-        section_schedules = {}
-        for section in sections:
-            section_schedules[section.id] = {day.id: {} for day in days}
+        if dry_run:
+            preview = build_preview(class_id, sessions, unplaced, seed, lecture_mode, lab_mode)
+            preview['lab_mode_note'] = lab_mode_note
+            return True, preview
         
-        # Randomize the assignments for better distribution
-        random.shuffle(lab_assignments)
-        random.shuffle(lecture_assignments)
-            
-        # First, group lab assignments by course
-        labs_by_course = {}
-        for lab_assignment in lab_assignments:
-            course_id = lab_assignment['course_id']
-            if course_id not in labs_by_course:
-                labs_by_course[course_id] = []
-            labs_by_course[course_id].append(lab_assignment)
+        # Build the final entries, including breaks
+        entries = []
+        for session in sessions:
+            for section_id, teacher_id in session['teachers'].items():
+                for slot_id in session['slot_ids']:
+                    entry = TimetableEntry()
+                    entry.section_id = section_id
+                    entry.day_id = session['day_id']
+                    entry.time_slot_id = slot_id
+                    entry.course_id = session['course_id']
+                    entry.teacher_id = teacher_id
+                    entry.room_id = session['rooms'].get(section_id)
+                    entries.append(entry)
+        
+        for day in days:
+            for break_slot in breaks:
+                for section in sections:
+                    entry = TimetableEntry()
+                    entry.section_id = section.id
+                    entry.day_id = day.id
+                    entry.time_slot_id = break_slot.id
+                    entry.course_id = None
+                    entry.teacher_id = None
+                    entries.append(entry)
+        
+        # Replace the existing timetable in a single transaction, archiving the one it replaces
+        archive_class(class_id, reason='regenerated')
+        if lab_mode_note:
+            # The saved lab mode describes the published timetable
+            class_obj.lab_mode = lab_mode
+        section_ids = [section.id for section in sections]
+        TimetableEntry.query.filter(TimetableEntry.section_id.in_(section_ids)).delete(synchronize_session=False)
+        db.session.add_all(entries)
+        refresh_class_summary(class_id)
+        publish_change(class_id)
+        db.session.commit()
+        if lab_mode_note:
+            return True, f"Timetable generated successfully; {lab_mode_note}"
+        return True, "Timetable generated successfully"
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error generating timetable: {str(e)}")
+        return False, f"Error: {str(e)}"
+
+def place_sessions(class_id, sections, days, time_slots, lab_assignments, lecture_assignments,
+                   teacher_schedule, teacher_load, limits, rooms, room_schedule, lecture_mode, lab_mode, rng):
+    """
+    Greedily place a class's labs, then its lectures, in memory.
+    
+    Labs come first because they need double periods. The teacher schedule, teacher load and
+    room schedule are updated in place.
+    
+    Returns:
+        (sessions, unplaced, section_schedules): Placed sessions (see generate_timetable), hours that
+        could not be placed as [{'course_id', 'course_name', 'is_lab', 'hours'}] and
+        {section_id: {day_id: {time_slot_id: True}}}
+    """
+    lab_assignments = list(lab_assignments)
+    lecture_assignments = list(lecture_assignments)
+    
+    # Placed sessions, kept in memory until the final write
+    # Each session: {'course_id', 'is_lab', 'day_id', 'slot_ids', 'teachers': {section_id: teacher_id},
+    #                'rooms': {section_id: room_id}}
+    # A session occupies the sections in its 'teachers' map
+    sessions = []
+    # Hours that could not be placed: [{'course_id', 'course_name', 'is_lab', 'hours'}]
+    unplaced = []
+    
+    # Track section-specific schedules (labs occupy every section, lectures their group)
+    section_schedules = {}
+    for section in sections:
+        section_schedules[section.id] = {day.id: {} for day in days}
+    
+    # Randomize the assignments for better distribution
+    rng.shuffle(lab_assignments)
+    rng.shuffle(lecture_assignments)
         
-        # Schedule labs - same time for all sections, but different teacher assignments
-        for course_id, course_assignments in labs_by_course.items():
+    # First, group lab assignments by course
+    labs_by_course = {}
+    for lab_assignment in lab_assignments:
+        course_id = lab_assignment['course_id']
+        if course_id not in labs_by_course:
+            labs_by_course[course_id] = []
+        labs_by_course[course_id].append(lab_assignment)
+    
+    # Rotating labs: sections take different labs in the same block
+    common_labs = labs_by_course
+    if lab_mode == 'rotation':
+        common_labs = {}
+        lab_sessions, missing = schedule_lab_rotation(
+            sections, labs_by_course, days, time_slots, section_schedules,
+            teacher_schedule, teacher_load, limits, rooms, room_schedule
+        )
+        sessions.extend(lab_sessions)
+        for course_id, hours in missing.items():
             course = Course.query.get(course_id)
-            if not course or not course.is_lab:
-                continue
-                
-            # Get first assignment to determine hours needed
-            if not course_assignments:
-                continue
-                
-            sample_assignment = course_assignments[0]
-            remaining_hours = sample_assignment['hours']
+            unplaced.append({'course_id': course_id, 'course_name': course.name, 'is_lab': True, 'hours': hours})
+            logging.warning(f"Could not place all lab sessions for course {course_id} for class {class_id}")
+    
+    # Schedule labs - same time for all sections, but different teacher assignments
+    for course_id, course_assignments in common_labs.items():
+        course = Course.query.get(course_id)
+        if not course or not course.is_lab:
+            continue
             
-            # Each lab session requires two consecutive periods
-            while remaining_hours > 0:
-                # Find a suitable day and time slot for the lab
-                placed = False
-                for day in days:
-                    # We need to find two consecutive non-break periods for labs
-                    for i in range(len(time_slots) - 1):
-                        # Check if these are consecutive time slots without a break in between
-                        if time_slots[i].end_time != time_slots[i+1].start_time:
-                            continue
-                            
-                        # Check if both time slots are available in the class schedule
-                        slot1_free = (day.id not in class_schedule or 
-                                     time_slots[i].id not in class_schedule[day.id])
-                        slot2_free = (day.id not in class_schedule or 
-                                     time_slots[i+1].id not in class_schedule[day.id])
+        # Get first assignment to determine hours needed
+        if not course_assignments:
+            continue
+            
+        sample_assignment = course_assignments[0]
+        remaining_hours = sample_assignment['hours']
+        
+        # Each lab session requires two consecutive periods
+        while remaining_hours > 0:
+            # Find a suitable day and time slot for the lab
+            placed = False
+            for day in days:
+                # We need to find two consecutive non-break periods for labs
+                for i in range(len(time_slots) - 1):
+                    # Check if these are consecutive time slots without a break in between
+                    if time_slots[i].end_time != time_slots[i+1].start_time:
+                        continue
                         
-                        # Check teacher availability for all teachers in this course
-                        teachers_available = True
-                        for assignment in course_assignments:
-                            teacher_id = assignment['teacher_id']
-                            slot1_free_for_teacher = (time_slots[i].id not in 
-                                                     teacher_schedule[teacher_id][day.id])
-                            slot2_free_for_teacher = (time_slots[i+1].id not in 
-                                                     teacher_schedule[teacher_id][day.id])
-                            
-                            if not (slot1_free_for_teacher and slot2_free_for_teacher):
-                                teachers_available = False
-                                break
+                    # Check if both time slots are available for every section
+                    slot1_free = all(time_slots[i].id not in section_schedules[section.id][day.id]
+                                     for section in sections)
+                    slot2_free = all(time_slots[i+1].id not in section_schedules[section.id][day.id]
+                                     for section in sections)
+                    
+                    # Check teacher availability for all teachers in this course
+                    teachers_available = True
+                    for assignment in course_assignments:
+                        teacher_id = assignment['teacher_id']
+                        slot1_free_for_teacher = (time_slots[i].id not in 
+                                                 teacher_schedule[teacher_id][day.id])
+                        slot2_free_for_teacher = (time_slots[i+1].id not in 
+                                                 teacher_schedule[teacher_id][day.id])
                         
-                        if slot1_free and slot2_free and teachers_available:
-                            # Found a suitable slot for labs - allocate different teachers to different sections
-                            # but at the same time
+                        if not (slot1_free_for_teacher and slot2_free_for_teacher and
+                                within_limits(teacher_id, day.id, 2, teacher_load, limits)):
+                            teachers_available = False
+                            break
+                    
+                    # Every section needs its own lab room for the block
+                    lab_slot_ids = [time_slots[i].id, time_slots[i+1].id]
+                    lab_rooms = {}
+                    if slot1_free and slot2_free and teachers_available and rooms['lab']:
+                        lab_rooms = allocate_lab_rooms(rooms['lab'], room_schedule, day.id, lab_slot_ids, sections)
+                    
+                    if slot1_free and slot2_free and teachers_available and lab_rooms is not None:
+                        # Found a suitable slot for labs - allocate different teachers to different sections
+                        # but at the same time
+                        
+                        # Assign different lab teachers to different sections
+                        section_teachers = {}
+                        section_index = 0
+                        for section in sections:
+                            # Get the teacher assignment (rotate if needed)
+                            assignment = course_assignments[section_index % len(course_assignments)]
+                            section_index += 1
                             
-                            # Update class schedule first - block this time for all sections
-                            if day.id not in class_schedule:
-                                class_schedule[day.id] = {}
-                            class_schedule[day.id][time_slots[i].id] = True
-                            class_schedule[day.id][time_slots[i+1].id] = True
+                            teacher_id = assignment['teacher_id']
+                            section_teachers[section.id] = teacher_id
                             
-                            # Assign different lab teachers to different sections
-                            section_index = 0
-                            for section in sections:
-                                # Get the teacher assignment (rotate if needed)
-                                assignment = course_assignments[section_index % len(course_assignments)]
-                                section_index += 1
-                                
-                                teacher_id = assignment['teacher_id']
-                                
-                                # Update teacher schedule
-                                teacher_schedule[teacher_id][day.id][time_slots[i].id] = True
-                                teacher_schedule[teacher_id][day.id][time_slots[i+1].id] = True
-                                
-                                # Update section schedule
-                                if day.id not in section_schedules[section.id]:
-                                    section_schedules[section.id][day.id] = {}
-                                section_schedules[section.id][day.id][time_slots[i].id] = True
-                                section_schedules[section.id][day.id][time_slots[i+1].id] = True
-                                
-                                # First slot
-                                entry1 = TimetableEntry()
-                                entry1.section_id = section.id
-                                entry1.day_id = day.id
-                                entry1.time_slot_id = time_slots[i].id
-                                entry1.course_id = course_id
-                                entry1.teacher_id = teacher_id
-                                db.session.add(entry1)
-                                
-                                # Second slot
-                                entry2 = TimetableEntry()
-                                entry2.section_id = section.id
-                                entry2.day_id = day.id
-                                entry2.time_slot_id = time_slots[i+1].id
-                                entry2.course_id = course_id
-                                entry2.teacher_id = teacher_id
-                                db.session.add(entry2)
+                            # Update teacher schedule
+                            teacher_schedule[teacher_id][day.id][time_slots[i].id] = True
+                            teacher_schedule[teacher_id][day.id][time_slots[i+1].id] = True
                             
-                            db.session.commit()
-                            placed = True
-                            remaining_hours -= 1  # Count as 1 lab session placed
-                            break
-                    
-                    if placed:
+                            # Update section schedule - block this time for all sections
+                            section_schedules[section.id][day.id][time_slots[i].id] = True
+                            section_schedules[section.id][day.id][time_slots[i+1].id] = True
+                        
+                        for teacher_id in set(section_teachers.values()):
+                            teacher_load[teacher_id][day.id] += 2
+                        
+                        for room_id in lab_rooms.values():
+                            for slot_id in lab_slot_ids:
+                                room_schedule[room_id][day.id][slot_id] = True
+                        
+                        sessions.append({
+                            'course_id': course_id,
+                            'is_lab': True,
+                            'day_id': day.id,
+                            'slot_ids': lab_slot_ids,
+                            'teachers': section_teachers,
+                            'rooms': lab_rooms
+                        })
+                        placed = True
+                        remaining_hours -= 1  # Count as 1 lab session placed
                         break
                 
-                # If we couldn't place the lab or no more hours, move on
-                if not placed or remaining_hours <= 0:
+                if placed:
                     break
             
-            if remaining_hours > 0:
-                # Could not place all lab hours
-                logging.warning(f"Could not place all lab sessions for course {course_id} for class {class_id}")
+            # If we couldn't place the lab or no more hours, move on
+            if not placed or remaining_hours <= 0:
+                break
         
-        # Group lecture assignments by course
-        lectures_by_course = {}
-        for lecture_assignment in lecture_assignments:
-            course_id = lecture_assignment['course_id']
-            if course_id not in lectures_by_course:
-                lectures_by_course[course_id] = []
-            lectures_by_course[course_id].append(lecture_assignment)
+        if remaining_hours > 0:
+            # Could not place all lab hours
+            unplaced.append({'course_id': course_id, 'course_name': course.name, 'is_lab': True, 'hours': remaining_hours})
+            logging.warning(f"Could not place all lab sessions for course {course_id} for class {class_id}")
+    
+    # Group lecture assignments by course
+    lectures_by_course = {}
+    for lecture_assignment in lecture_assignments:
+        course_id = lecture_assignment['course_id']
+        if course_id not in lectures_by_course:
+            lectures_by_course[course_id] = []
+        lectures_by_course[course_id].append(lecture_assignment)
+    
+    # Schedule lectures - each group of sections attends the same lecture with the same teacher
+    for course_id, course_assignments in lectures_by_course.items():
+        course = Course.query.get(course_id)
+        if not course or not course.is_lecture:
+            continue
+            
+        # Get first assignment to determine hours needed
+        if not course_assignments:
+            continue
         
-        # Schedule lectures - same for all sections with the same teacher
-        for course_id, course_assignments in lectures_by_course.items():
-            course = Course.query.get(course_id)
-            if not course or not course.is_lecture:
-                continue
-                
-            # Get first assignment to determine hours needed
-            if not course_assignments:
-                continue
-                
+        if lecture_mode == 'independent':
+            # Rotate sections over the course's teachers like labs; each teacher's sections
+            # get their own lectures, placed independently of the other sections
+            groups = {}
+            for section_index, section in enumerate(sections):
+                assignment = course_assignments[section_index % len(course_assignments)]
+                groups.setdefault(assignment['teacher_id'], []).append(section)
+            lecture_groups = list(groups.items())
+        else:
             # Use the first teacher assignment for this course for all sections
             # This ensures lectures are identical across sections
-            main_assignment = course_assignments[0]
-            teacher_id = main_assignment['teacher_id']
-            remaining_hours = main_assignment['hours']
+            lecture_groups = [(course_assignments[0]['teacher_id'], sections)]
+        
+        course_unplaced = 0
+        for teacher_id, group_sections in lecture_groups:
+            remaining_hours = course_assignments[0]['hours']
+            # A lecture room must seat every section in the group
+            group_students = sum(section.student_count or 0 for section in group_sections) or None
             
             while remaining_hours > 0:
                 placed = False
-                for attempt in range(10):  # Try harder to place lectures
-                    day = random.choice(days)
-                    time_slot = random.choice(time_slots)
-                    
+                # Try every period, in random order for better distribution
+                candidates = [(day, time_slot) for day in days for time_slot in time_slots]
+                rng.shuffle(candidates)
+                for day, time_slot in candidates:
                     # Skip break slots
                     if time_slot.is_break:
                         continue
                     
-                    # Check if this slot is free in the class schedule
-                    slot_free = (day.id not in class_schedule or 
-                                time_slot.id not in class_schedule[day.id])
+                    # Check if this slot is free for every section in the group
+                    slot_free = all(time_slot.id not in section_schedules[section.id][day.id]
+                                    for section in group_sections)
                     
                     # Check teacher availability
                     teacher_slot_free = (time_slot.id not in 
-                                        teacher_schedule[teacher_id][day.id])
+                                        teacher_schedule[teacher_id][day.id] and
+                                        within_limits(teacher_id, day.id, 1, teacher_load, limits))
+                    
+                    # Find a lecture room that seats the group
+                    room_id = None
+                    if slot_free and teacher_slot_free and rooms['lecture']:
+                        room_id = free_room(rooms['lecture'], room_schedule, day.id, [time_slot.id], group_students)
+                        if room_id is None:
+                            continue
                     
                     if slot_free and teacher_slot_free:
-                        # Update class schedule
-                        if day.id not in class_schedule:
-                            class_schedule[day.id] = {}
-                        class_schedule[day.id][time_slot.id] = True
-                        
                         # Update teacher schedule
                         teacher_schedule[teacher_id][day.id][time_slot.id] = True
+                        teacher_load[teacher_id][day.id] += 1
                         
-                        # Add the lecture to all sections at the same time with the same teacher
-                        for section in sections:
-                            # Update section schedule
-                            if day.id not in section_schedules[section.id]:
-                                section_schedules[section.id][day.id] = {}
+                        if room_id is not None:
+                            room_schedule[room_id][day.id][time_slot.id] = True
+                        
+                        # Add the lecture to every section in the group at the same time with the same teacher
+                        for section in group_sections:
                             section_schedules[section.id][day.id][time_slot.id] = True
-                            
-                            # Add the timetable entry
-                            entry = TimetableEntry()
-                            entry.section_id = section.id
-                            entry.day_id = day.id
-                            entry.time_slot_id = time_slot.id
-                            entry.course_id = course_id
-                            entry.teacher_id = teacher_id  # Use the same teacher for all sections
-                            db.session.add(entry)
                         
-                        db.session.commit()
+                        sessions.append({
+                            'course_id': course_id,
+                            'is_lab': False,
+                            'day_id': day.id,
+                            'slot_ids': [time_slot.id],
+                            'teachers': {section.id: teacher_id for section in group_sections},
+                            'rooms': {section.id: room_id for section in group_sections} if room_id is not None else {}
+                        })
                         remaining_hours -= 1
                         placed = True
                         break
                 
-                # If we couldn't place it after multiple attempts or no more hours, move on
+                # If no period is free or no more hours, move on
                 if not placed or remaining_hours <= 0:
                     break
             
-            if remaining_hours > 0:
-                logging.warning(f"Could not place all lecture sessions for course {course_id} for class {class_id}")
-        
-        # Add entries for breaks
-        for day in days:
-            for break_slot in breaks:
-                for section in sections:
-                    # Check if entry already exists
-                    existing = TimetableEntry.query.filter_by(
-                        section_id=section.id,
-                        day_id=day.id,
-                        time_slot_id=break_slot.id
-                    ).first()
-                    
-                    if not existing:
-                        entry = TimetableEntry()
-                        entry.section_id = section.id
-                        entry.day_id = day.id
-                        entry.time_slot_id = break_slot.id
-                        entry.course_id = None
-                        entry.teacher_id = None
-                        db.session.add(entry)
-        
-        # Commit any remaining changes
-        db.session.commit()
-        return True, "Timetable generated successfully"
+            course_unplaced += remaining_hours
         
-    except Exception as e:
-        db.session.rollback()
-        logging.error(f"Error generating timetable: {str(e)}")
-        return False, f"Error: {str(e)}"
+        if course_unplaced > 0:
+            unplaced.append({'course_id': course_id, 'course_name': course.name, 'is_lab': False, 'hours': course_unplaced})
+            logging.warning(f"Could not place all lecture sessions for course {course_id} for class {class_id}")
+    
+    return sessions, unplaced, section_schedules
+
+def unplaced_hours(unplaced):
+    """(lab sessions, lecture hours) left unplaced, compared as a tuple: labs first, then lectures"""
+    return (sum(item['hours'] for item in unplaced if item['is_lab']),
+            sum(item['hours'] for item in unplaced if not item['is_lab']))
+
+def build_preview(class_id, sessions, unplaced, seed, lecture_mode, lab_mode):
+    """
+    Describe a solved timetable against the one currently published, without writing anything.
+    
+    Returns:
+        Dict with the proposed placements as [section_id, day_id, time_slot_id, course_id, teacher_id,
+        room_id] rows, the cell diff against the current timetable (see timetable_events.diff_cells), counts
+        of added, removed and changed cells, the unplaced hours, and the seed and lecture and lab
+        modes that reproduce it
+    """
+    proposed = {}
+    for session in sessions:
+        for section_id, teacher_id in session['teachers'].items():
+            for slot_id in session['slot_ids']:
+                proposed[(section_id, session['day_id'], slot_id)] = (
+                    session['course_id'], teacher_id, session['rooms'].get(section_id))
+    
+    current = load_cells(class_id=class_id)
+    diff = diff_cells(current, proposed)
+    added = len(proposed.keys() - current.keys())
+    removed = len(current.keys() - proposed.keys())
+    changed = len(diff['changes']) - added - removed
+    
+    return {
+        'class_id': class_id,
+        'dry_run': True,
+        'seed': seed,
+        'lecture_mode': lecture_mode,
+        'lab_mode': lab_mode,
+        'placements': sorted([*key, *value] for key, value in proposed.items()),
+        'diff': diff,
+        'summary': {
+            'added': added,
+            'removed': removed,
+            'changed': changed,
+            'unchanged': len(proposed) - added - changed
+        },
+        'unplaced': unplaced
+    }
@@ -0,0 +1,242 @@
+import math
+import random
+import time
+import logging
+
+from teacher_constraints import within_limits
+
+# Relative weight of each soft constraint in the cost function
+DEFAULT_WEIGHTS = {
+    'teacher_gap': 1.0,     # Idle periods between a teacher's first and last period of a day
+    'course_repeat': 3.0,   # Extra sessions of the same course on one day
+    'daily_load': 0.5,      # Squared deviation of a day's load from the weekly average
+}
+
+def optimize_timetable(sessions, day_ids, slot_ids, lab_starts, section_schedules, teacher_schedule,
+                       teacher_load=None, limits=None, room_schedule=None, time_budget=2.0,
+                       max_iterations=None, weights=None, seed=None):
+    """
+    Improve a generated timetable with simulated annealing over move and swap neighborhoods.
+
+    Works purely on the in-memory occupancy state built by the generator. Hard constraints
+    (no section slot used twice, no teacher or room double-booked, no teacher scheduled while
+    unavailable, teacher load limits, labs on consecutive periods) are
+    checked before every change, and each candidate is scored by re-evaluating only the
+    cost terms of the days, teachers and courses it touches.
+
+    Args:
+        sessions: Placed sessions as built by generate_timetable; updated in place
+        day_ids: Ordered list of day IDs
+        slot_ids: Ordered list of non-break time slot IDs
+        lab_starts: Indices into slot_ids where a double (lab) period may start
+        section_schedules: {section_id: {day_id: {time_slot_id: True}}}; a session occupies the
+            sections in its 'teachers' map; updated in place
+        teacher_schedule: {teacher_id: {day_id: {time_slot_id: True or BLOCKED}}}; updated in place
+        teacher_load: Optional {teacher_id: {day_id: periods}} checked against limits; updated in place
+        limits: Optional {teacher_id: (max_periods_per_day, max_periods_per_week)}
+        room_schedule: Optional {room_id: {day_id: {time_slot_id: True}}}; sessions keep their rooms
+            when they move; updated in place
+        time_budget: Maximum number of seconds to search
+        max_iterations: Optional cap on the number of candidate moves
+        weights: Optional overrides for DEFAULT_WEIGHTS
+        seed: Optional random seed for reproducible runs
+
+    Returns:
+        (initial_cost, final_cost): Cost of the timetable before and after optimization
+    """
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    limits = limits or {}
+    rng = random.Random(seed)
+    slot_index = {slot_id: index for index, slot_id in enumerate(slot_ids)}
+
+    # Occupied section periods per day, averaged over sections, for the load balance term
+    section_count = len(section_schedules) or 1
+    day_load = {day_id: sum(len(section_schedules[section_id][day_id]) for section_id in section_schedules) / section_count
+                for day_id in day_ids}
+    mean_load = sum(day_load.values()) / len(day_ids) if day_ids else 0
+
+    # Sessions per (course, day), kept up to date as sessions move
+    course_days = {}
+    for session in sessions:
+        key = (session['course_id'], session['day_id'])
+        course_days[key] = course_days.get(key, 0) + 1
+
+    def teacher_gap_cost(teacher_id, day_id):
+        # Blocked (unavailable) periods are not taught, so they do not close a gap
+        occupied = [slot_index[slot_id] for slot_id, taught in teacher_schedule[teacher_id][day_id].items()
+                    if taught is True and slot_id in slot_index]
+        if len(occupied) < 2:
+            return 0
+        return max(occupied) - min(occupied) + 1 - len(occupied)
+
+    def local_cost(teacher_ids, day_ids_touched, course_ids):
+        """Cost restricted to the teacher-days, course-days and days touched by a change"""
+        cost = 0.0
+        for day_id in day_ids_touched:
+            for teacher_id in teacher_ids:
+                cost += weights['teacher_gap'] * teacher_gap_cost(teacher_id, day_id)
+            for course_id in course_ids:
+                cost += weights['course_repeat'] * max(0, course_days.get((course_id, day_id), 0) - 1)
+            cost += weights['daily_load'] * (day_load[day_id] - mean_load) ** 2
+        return cost
+
+    def total_cost():
+        teacher_ids = set(teacher_schedule)
+        course_ids = {session['course_id'] for session in sessions}
+        return local_cost(teacher_ids, day_ids, course_ids)
+
+    def remove(session):
+        day_id = session['day_id']
+        for slot_id in session['slot_ids']:
+            for section_id in session['teachers']:
+                del section_schedules[section_id][day_id][slot_id]
+            for teacher_id in set(session['teachers'].values()):
+                del teacher_schedule[teacher_id][day_id][slot_id]
+            if room_schedule is not None:
+                for room_id in set(session['rooms'].values()):
+                    del room_schedule[room_id][day_id][slot_id]
+        if teacher_load is not None:
+            for teacher_id in set(session['teachers'].values()):
+                teacher_load[teacher_id][day_id] -= len(session['slot_ids'])
+        day_load[day_id] -= len(session['slot_ids']) * len(session['teachers']) / section_count
+        course_days[(session['course_id'], day_id)] -= 1
+
+    def place(session, day_id, new_slot_ids):
+        session['day_id'] = day_id
+        session['slot_ids'] = list(new_slot_ids)
+        for slot_id in new_slot_ids:
+            for section_id in session['teachers']:
+                section_schedules[section_id][day_id][slot_id] = True
+            for teacher_id in set(session['teachers'].values()):
+                teacher_schedule[teacher_id][day_id][slot_id] = True
+            if room_schedule is not None:
+                for room_id in set(session['rooms'].values()):
+                    room_schedule[room_id][day_id][slot_id] = True
+        if teacher_load is not None:
+            for teacher_id in set(session['teachers'].values()):
+                teacher_load[teacher_id][day_id] += len(new_slot_ids)
+        day_load[day_id] += len(new_slot_ids) * len(session['teachers']) / section_count
+        key = (session['course_id'], day_id)
+        course_days[key] = course_days.get(key, 0) + 1
+
+    def fits(session, day_id, new_slot_ids):
+        for slot_id in new_slot_ids:
+            for section_id in session['teachers']:
+                if slot_id in section_schedules[section_id][day_id]:
+                    return False
+            for teacher_id in set(session['teachers'].values()):
+                if slot_id in teacher_schedule[teacher_id][day_id]:
+                    return False
+            if room_schedule is not None:
+                for room_id in set(session['rooms'].values()):
+                    if slot_id in room_schedule[room_id][day_id]:
+                        return False
+        if teacher_load is not None:
+            for teacher_id in set(session['teachers'].values()):
+                if not within_limits(teacher_id, day_id, len(new_slot_ids), teacher_load, limits):
+                    return False
+        return True
+
+    def random_position(session):
+        day_id = rng.choice(day_ids)
+        if len(session['slot_ids']) == 2:
+            if not lab_starts:
+                return None
+            start = rng.choice(lab_starts)
+            return day_id, [slot_ids[start], slot_ids[start + 1]]
+        return day_id, [rng.choice(slot_ids)]
+
+    def touched(changed):
+        teacher_ids = set()
+        touched_days = set()
+        course_ids = set()
+        for session, day_id in changed:
+            teacher_ids.update(session['teachers'].values())
+            touched_days.add(session['day_id'])
+            touched_days.add(day_id)
+            course_ids.add(session['course_id'])
+        return teacher_ids, touched_days, course_ids
+
+    current_cost = total_cost()
+    initial_cost = current_cost
+    best_cost = current_cost
+    best_positions = [(session['day_id'], list(session['slot_ids'])) for session in sessions]
+
+    if not sessions or not day_ids or not slot_ids:
+        return initial_cost, current_cost
+
+    # Temperature falls geometrically from start_temp to end_temp over the time budget
+    start_temp = max(1.0, weights['course_repeat'])
+    end_temp = 0.01
+    started = time.perf_counter()
+    iterations = 0
+
+    while True:
+        elapsed = time.perf_counter() - started
+        if elapsed >= time_budget or (max_iterations is not None and iterations >= max_iterations):
+            break
+        iterations += 1
+        temperature = start_temp * (end_temp / start_temp) ** (elapsed / time_budget)
+
+        session = rng.choice(sessions)
+        old_position = (session['day_id'], list(session['slot_ids']))
+
+        if rng.random() < 0.5:
+            # Move: relocate one session to a free position
+            position = random_position(session)
+            if position is None or position == old_position:
+                continue
+            day_id, new_slot_ids = position
+            teacher_ids, touched_days, course_ids = touched([(session, day_id)])
+            before = local_cost(teacher_ids, touched_days, course_ids)
+            remove(session)
+            if not fits(session, day_id, new_slot_ids):
+                place(session, *old_position)
+                continue
+            place(session, day_id, new_slot_ids)
+            delta = local_cost(teacher_ids, touched_days, course_ids) - before
+
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                current_cost += delta
+            else:
+                remove(session)
+                place(session, *old_position)
+        else:
+            # Swap: exchange the positions of two sessions of the same length
+            other = rng.choice(sessions)
+            if other is session or len(other['slot_ids']) != len(session['slot_ids']):
+                continue
+            other_position = (other['day_id'], list(other['slot_ids']))
+            teacher_ids, touched_days, course_ids = touched([(session, other_position[0]),
+                                                             (other, old_position[0])])
+            before = local_cost(teacher_ids, touched_days, course_ids)
+            remove(session)
+            remove(other)
+            if not (fits(session, *other_position) and fits(other, *old_position)):
+                place(session, *old_position)
+                place(other, *other_position)
+                continue
+            place(session, *other_position)
+            place(other, *old_position)
+            delta = local_cost(teacher_ids, touched_days, course_ids) - before
+
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                current_cost += delta
+            else:
+                remove(session)
+                remove(other)
+                place(session, *old_position)
+                place(other, *other_position)
+
+        if current_cost < best_cost - 1e-9:
+            best_cost = current_cost
+            best_positions = [(s['day_id'], list(s['slot_ids'])) for s in sessions]
+
+    # Restore the best timetable seen during the search
+    for session in sessions:
+        remove(session)
+    for session, (day_id, best_slot_ids) in zip(sessions, best_positions):
+        place(session, day_id, best_slot_ids)
+
+    logging.debug(f"Local search ran {iterations} iterations in {time.perf_counter() - started:.2f}s")
+    return initial_cost, best_cost
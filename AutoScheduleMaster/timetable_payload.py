@@ -0,0 +1,73 @@
+from app import db
+from models import Class, Section, Teacher, Course, Room, TimetableEntry, TimetableVersion
+from reference_data import get_days, get_time_slots
+
+def compact_timetable(class_id):
+    """
+    Build the compact timetable payload for a class.
+
+    Names are sent once, in course, teacher and room dictionaries, and the timetable itself is
+    three integer grids of len(sections) * len(days) * len(slots) cells, ordered by section, then
+    day, then slot. A cell holds the 1-based position of its course (teacher, room) in the
+    dictionary, or 0 when empty. The page renders its tables from this in static/js/timetable.js.
+
+    Returns:
+        Dict with class, version, sections, days, slots, courses, teachers, rooms, course, teacher
+        and room keys
+    """
+    class_obj = Class.query.get_or_404(class_id)
+    sections = Section.query.filter_by(class_id=class_id).order_by(Section.id).all()
+    days = get_days()
+    time_slots = get_time_slots()
+    version = db.session.query(TimetableVersion.version).filter_by(class_id=class_id).scalar() or 0
+
+    section_index = {section.id: i for i, section in enumerate(sections)}
+    day_index = {day.id: i for i, day in enumerate(days)}
+    slot_index = {slot.id: i for i, slot in enumerate(time_slots)}
+
+    rows = db.session.query(
+        TimetableEntry.section_id, TimetableEntry.day_id, TimetableEntry.time_slot_id,
+        TimetableEntry.course_id, TimetableEntry.teacher_id, TimetableEntry.room_id
+    ).join(Section, TimetableEntry.section_id == Section.id).filter(
+        Section.class_id == class_id,
+        TimetableEntry.course_id.isnot(None)
+    ).all()
+
+    course_ids = sorted({row.course_id for row in rows})
+    teacher_ids = sorted({row.teacher_id for row in rows if row.teacher_id is not None})
+    room_ids = sorted({row.room_id for row in rows if row.room_id is not None})
+    courses = Course.query.filter(Course.id.in_(course_ids)).order_by(Course.id).all() if course_ids else []
+    teachers = Teacher.query.filter(Teacher.id.in_(teacher_ids)).order_by(Teacher.id).all() if teacher_ids else []
+    rooms = Room.query.filter(Room.id.in_(room_ids)).order_by(Room.id).all() if room_ids else []
+    course_code = {course.id: i + 1 for i, course in enumerate(courses)}
+    teacher_code = {teacher.id: i + 1 for i, teacher in enumerate(teachers)}
+    room_code = {room.id: i + 1 for i, room in enumerate(rooms)}
+
+    cell_count = len(sections) * len(days) * len(time_slots)
+    course_grid = [0] * cell_count
+    teacher_grid = [0] * cell_count
+    room_grid = [0] * cell_count
+    for row in rows:
+        if row.day_id not in day_index or row.time_slot_id not in slot_index:
+            continue
+        cell = ((section_index[row.section_id] * len(days) + day_index[row.day_id]) * len(time_slots)
+                + slot_index[row.time_slot_id])
+        course_grid[cell] = course_code[row.course_id]
+        teacher_grid[cell] = teacher_code.get(row.teacher_id, 0)
+        room_grid[cell] = room_code.get(row.room_id, 0)
+
+    return {
+        'class': [class_obj.id, class_obj.name],
+        'version': version,
+        'sections': [[section.id, section.name] for section in sections],
+        'days': [[day.id, day.name] for day in days],
+        'slots': [[slot.id,
+                   f"{slot.start_time.strftime('%I:%M %p')} - {slot.end_time.strftime('%I:%M %p')}",
+                   slot.is_break] for slot in time_slots],
+        'courses': [[course.id, course.name, course.code, course.is_lab, course.is_lecture] for course in courses],
+        'teachers': [[teacher.id, teacher.name] for teacher in teachers],
+        'rooms': [[room.id, room.name] for room in rooms],
+        'course': course_grid,
+        'teacher': teacher_grid,
+        'room': room_grid
+    }
@@ -0,0 +1,174 @@
+from sqlalchemy import func
+from app import db
+from models import (Class, Section, Teacher, Course, CourseAssignment, TimetableEntry, TeacherLoadLimit,
+                    TeacherDayLoad, ClassDayFill, CoursePlacement)
+from reference_data import get_days, get_time_slots
+
+def refresh_class_summary(class_id):
+    """
+    Recompute the summary rows of one class from its published timetable.
+
+    Reads only the class's own entries, so it is cheap enough to run in every transaction that
+    changes them or the class's sections, assignments or course hours. Not committed.
+    """
+    TeacherDayLoad.query.filter_by(class_id=class_id).delete()
+    ClassDayFill.query.filter_by(class_id=class_id).delete()
+    CoursePlacement.query.filter_by(class_id=class_id).delete()
+
+    section_ids = [section_id for (section_id,) in
+                   db.session.query(Section.id).filter(Section.class_id == class_id)]
+    if not section_ids or TimetableEntry.query.filter(
+            TimetableEntry.section_id.in_(section_ids), TimetableEntry.course_id.isnot(None)).first() is None:
+        return
+    rows = []
+
+    # A lecture given to several sections at once is one period for its teacher
+    teacher_days = db.session.query(
+        TimetableEntry.teacher_id, TimetableEntry.day_id,
+        func.count(func.distinct(TimetableEntry.time_slot_id))
+    ).filter(
+        TimetableEntry.section_id.in_(section_ids),
+        TimetableEntry.course_id.isnot(None),
+        TimetableEntry.teacher_id.isnot(None)
+    ).group_by(TimetableEntry.teacher_id, TimetableEntry.day_id)
+    for teacher_id, day_id, periods in teacher_days:
+        row = TeacherDayLoad()
+        row.teacher_id = teacher_id
+        row.class_id = class_id
+        row.day_id = day_id
+        row.periods = periods
+        rows.append(row)
+
+    day_fill = dict(db.session.query(
+        TimetableEntry.day_id, func.count()
+    ).filter(
+        TimetableEntry.section_id.in_(section_ids),
+        TimetableEntry.course_id.isnot(None)
+    ).group_by(TimetableEntry.day_id).all())
+    capacity = len(section_ids) * len(get_time_slots(is_break=False))
+    for day in get_days():
+        row = ClassDayFill()
+        row.class_id = class_id
+        row.day_id = day.id
+        row.filled = day_fill.get(day.id, 0)
+        row.capacity = capacity
+        rows.append(row)
+
+    placed = {}
+    for section_id, course_id, periods in db.session.query(
+        TimetableEntry.section_id, TimetableEntry.course_id, func.count()
+    ).filter(
+        TimetableEntry.section_id.in_(section_ids),
+        TimetableEntry.course_id.isnot(None)
+    ).group_by(TimetableEntry.section_id, TimetableEntry.course_id):
+        placed[(section_id, course_id)] = periods
+    courses = Course.query.filter(Course.id.in_(
+        db.session.query(CourseAssignment.course_id).filter(CourseAssignment.class_id == class_id)))
+    for course in courses:
+        # Same rule as conflict_check's unplaced hours
+        required = ((course.lecture_hours or 0) if course.is_lecture else 0) + \
+                   (2 * (course.lab_hours or 0) if course.is_lab else 0)
+        section_placed = [placed.get((section_id, course.id), 0) for section_id in section_ids]
+        row = CoursePlacement()
+        row.class_id = class_id
+        row.course_id = course.id
+        row.required = required * len(section_ids)
+        row.placed = sum(section_placed)
+        row.short_sections = sum(1 for periods in section_placed if periods < required)
+        rows.append(row)
+
+    db.session.add_all(rows)
+
+def rebuild_summaries():
+    """Recompute every class's summary rows, e.g. for a database created before they existed"""
+    for (class_id,) in db.session.query(Class.id).order_by(Class.id):
+        refresh_class_summary(class_id)
+    db.session.commit()
+
+def ensure_summaries():
+    """Fill the summary tables on first start with a database that already has timetables"""
+    if ClassDayFill.query.first() is None and \
+            TimetableEntry.query.filter(TimetableEntry.course_id.isnot(None)).first() is not None:
+        rebuild_summaries()
+
+def workload_report(class_id=None, teacher_id=None):
+    """
+    Teacher load, class fill and course placement, read from the summary tables.
+
+    Args:
+        class_id: Optional class to restrict the report to
+        teacher_id: Optional teacher to restrict the teacher loads to
+
+    Returns:
+        Dict with days, teachers (periods per day and week, with their limits), classes (filled and
+        available periods per day) and courses (required and placed periods per class)
+    """
+    days = get_days()
+
+    load_query = db.session.query(
+        TeacherDayLoad.teacher_id, TeacherDayLoad.day_id, func.sum(TeacherDayLoad.periods)
+    ).group_by(TeacherDayLoad.teacher_id, TeacherDayLoad.day_id)
+    if class_id is not None:
+        load_query = load_query.filter(TeacherDayLoad.class_id == class_id)
+    if teacher_id is not None:
+        load_query = load_query.filter(TeacherDayLoad.teacher_id == teacher_id)
+    loads = {}
+    for row_teacher_id, day_id, periods in load_query:
+        loads.setdefault(row_teacher_id, {})[day_id] = int(periods)
+
+    teachers = []
+    if loads:
+        limits = {limit.teacher_id: limit for limit in
+                  TeacherLoadLimit.query.filter(TeacherLoadLimit.teacher_id.in_(loads))}
+        for teacher in Teacher.query.filter(Teacher.id.in_(loads)).order_by(Teacher.name):
+            limit = limits.get(teacher.id)
+            teachers.append({
+                'id': teacher.id,
+                'name': teacher.name,
+                'days': {day.id: loads[teacher.id].get(day.id, 0) for day in days},
+                'week': sum(loads[teacher.id].values()),
+                'max_per_day': limit.max_periods_per_day if limit else None,
+                'max_per_week': limit.max_periods_per_week if limit else None
+            })
+
+    fill_query = db.session.query(ClassDayFill, Class.name).join(Class, ClassDayFill.class_id == Class.id)
+    course_query = db.session.query(CoursePlacement, Class.name, Course.name, Course.code).join(
+        Class, CoursePlacement.class_id == Class.id).join(Course, CoursePlacement.course_id == Course.id)
+    if class_id is not None:
+        fill_query = fill_query.filter(ClassDayFill.class_id == class_id)
+        course_query = course_query.filter(CoursePlacement.class_id == class_id)
+
+    classes = {}
+    for fill, class_name in fill_query.order_by(Class.name):
+        entry = classes.setdefault(fill.class_id, {'id': fill.class_id, 'name': class_name, 'days': {},
+                                                   'filled': 0, 'capacity': 0})
+        entry['days'][fill.day_id] = {'filled': fill.filled, 'capacity': fill.capacity}
+        entry['filled'] += fill.filled
+        entry['capacity'] += fill.capacity
+
+    courses = []
+    for placement, class_name, course_name, course_code in course_query.order_by(Class.name, Course.name):
+        courses.append({
+            'class_id': placement.class_id,
+            'class_name': class_name,
+            'course_id': placement.course_id,
+            'course_name': course_name,
+            'course_code': course_code,
+            'required': placement.required,
+            'placed': placement.placed,
+            'short_sections': placement.short_sections
+        })
+
+    return {
+        'days': [{'id': day.id, 'name': day.name} for day in days],
+        'teachers': teachers,
+        'classes': list(classes.values()),
+        'courses': courses
+    }
+
+if __name__ == "__main__":
+    from app import app
+
+    with app.app_context():
+        rebuild_summaries()
+        print("Summary tables rebuilt")
@@ -0,0 +1,30 @@
+"""
+Production WSGI entrypoint: gunicorn -c gunicorn.conf.py wsgi:app
+
+With the app preloaded, importing this module in the gunicorn master creates and upgrades the
+tables once, then warms everything the workers can share copy-on-write after fork.
+"""
+from app import app, db
+from reference_data import load_reference_data
+from tenancy import TENANTS, tenant_context, tenant_engine, opened_tenant_engines
+from static_assets import warm_asset_hashes
+
+def warm_up():
+    """Load shared read-only state in the master before workers are forked"""
+    with app.app_context():
+        # Days and time slots are cached per process; loaded here, every worker inherits them
+        load_reference_data()
+        for tenant in TENANTS:
+            with app.app_context(), tenant_context(tenant):
+                tenant_engine(tenant)
+                load_reference_data()
+        # Compile every template once instead of on each worker's first request
+        for name in app.jinja_env.list_templates(extensions=["html"]):
+            app.jinja_env.get_template(name)
+        # Content hashes for the fingerprinted static URLs
+        warm_asset_hashes(app)
+        # Database connections must not be shared with the forked workers
+        for engine in list(db.engines.values()) + opened_tenant_engines():
+            engine.dispose()
+
+warm_up()